@@ -2,14 +2,17 @@
 import streamlit as st
 import pandas as pd
 import os
-import time
+import uuid
 from policy_engine import PolicyAgent
+from audit_runner import AuditJob, submit, get_job, release
 
 st.set_page_config(page_title="AI Audit Agent", page_icon="🛡️", layout="wide")
 
-@st.cache_resource
-def load_agent():
-    return PolicyAgent()
+def session_key():
+    """Stable id for this browser session (survives reruns)."""
+    if "session_key" not in st.session_state:
+        st.session_state["session_key"] = uuid.uuid4().hex
+    return st.session_state["session_key"]
 
 st.title("🛡️ AI Internal Audit Agent")
 
@@ -21,37 +24,67 @@ with st.sidebar:
     if api_key:
         os.environ["GOOGLE_API_KEY"] = api_key
         st.success("✅ API Key Active")
+    use_cache = not st.checkbox("Bypass verdict cache", help="Always ask the AI again instead of reusing stored verdicts")
+    batch_size = st.number_input("Rows per AI call", min_value=1, max_value=50, value=1,
+                                 help="Batch mode: audit several transactions in one request (1 = off)")
 
 uploaded_file = st.file_uploader("📂 Upload Ledger (CSV)", type=["csv"])
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
+    # Only the first rows are parsed for the preview; the audit streams the file in chunks
+    preview = pd.read_csv(uploaded_file, nrows=5)
     st.subheader("1. Preview Data")
-    st.dataframe(df.head())
+    st.dataframe(preview)
     
     if st.button("🚀 Run AI Audit", type="primary"):
         if not api_key:
             st.error("Please provide an API Key!")
         else:
-            agent = load_agent()
-            with st.spinner("🧠 Reading Policy..."):
-                status = agent.ingest_policy()
-                st.toast(status)
-
-            results = []
-            log_container = st.container(height=300)
-            
-            for index, row in df.iterrows():
-                query = f"Audit: ID {row['TransactionID']}, Approver {row['Approver']}, Amount ${row['Amount']}, Description: {row['Description']}"
-                try:
-                    decision = agent.check_policy(query)
-                    is_flagged = "VIOLATION" in decision.upper()
-                    status_icon = "🔴" if is_flagged else "🟢"
-                    with log_container:
-                        st.markdown(f"**{row['TransactionID']}** {status_icon}: {decision}")
-                    results.append({"TransactionID": row['TransactionID'], "Status": "FLAGGED" if is_flagged else "PASSED", "Reasoning": decision})
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                time.sleep(0.1)
-
-            st.dataframe(pd.DataFrame(results))
+            # The audit runs on a background thread; this script only starts it and shows progress.
+            # Each job gets its own agent: its chains, tier stats and policy index are not thread-safe
+            # (the policy text and the verdicts are still shared through their on-disk caches)
+            job = AuditJob(PolicyAgent(), uploaded_file.getvalue(), batch_size=batch_size, use_cache=use_cache)
+            submit(session_key(), job)
+            st.session_state.pop("finished_audit", None)
+            st.toast(f"🧠 Audit {job.job_id} started")
+
+def show_results(progress, results, tier_stats=None):
+    st.subheader("2. Audit Results")
+    total = progress["total"] or 1
+    st.progress(min(1.0, progress["done"] / total),
+                text=f"{progress['status'].title()}: {progress['done']} / {progress['total']} rows "
+                     f"in {progress['elapsed']:.0f}s")
+    if progress["error"]:
+        st.error(f"Error: {progress['error']}")
+    st.dataframe(pd.DataFrame(results, columns=["TransactionID", "Status", "Reasoning"]))
+    if tier_stats is not None:
+        # Which model tier answered how much (cheap tier first, escalations above it)
+        st.caption("Model tiers")
+        st.dataframe(pd.DataFrame(tier_stats))
+
+job = get_job(session_key())
+if job is not None:
+    polling = job.running
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def show_audit():
+        progress = job.progress()
+        results = job.results()
+        st.session_state["audit_results"] = results
+
+        if job.running:
+            show_results(progress, results)
+            if st.button("⏹️ Cancel audit"):
+                job.cancel()
+                st.toast("Cancelling... requests already sent will still finish")
+            return
+        # Finished: keep the results in the session and let the job (and its agent) go
+        st.session_state["finished_audit"] = (progress, results, job.agent.tier_stats())
+        release(session_key(), job)
+        if polling:
+            st.rerun()  # stop polling once the run is over
+        show_results(*st.session_state["finished_audit"])
+
+    show_audit()
+elif "finished_audit" in st.session_state:
+    show_results(*st.session_state["finished_audit"])
@@ -0,0 +1,271 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from policy_engine import BATCH_MAX_ROUNDS, DEFAULT_BATCH_SIZE, verdict_from_text
+from metrics import METRICS, estimate_tokens
+
+# --- CONFIGURATION ---
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# Answer for a row that was still waiting when `cancel` was set (an error, so it is retried on --resume)
+CANCELLED_RESPONSE = "Error: cancelled before the row was audited"
+
+# Substrings that identify a throttling / quota error from the Gemini API
+RATE_LIMIT_MARKERS = ("429", "RESOURCE_EXHAUSTED", "RESOURCEEXHAUSTED", "QUOTA", "RATE LIMIT", "TOO MANY REQUESTS")
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True if the exception looks like a 429 / quota exhaustion error."""
+    for attr in ("status_code", "code"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    text = f"{type(exc).__name__} {exc}".upper()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """
+    Two token buckets (requests and tokens) refilled continuously per minute.
+    `rate_scale` shrinks when the API throttles us and slowly recovers afterwards (AIMD).
+    """
+
+    MIN_SCALE = 0.05
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.rate_scale = 1.0
+        self._clock = clock
+        self._requests = self.requests_per_minute
+        self._tokens = self.tokens_per_minute
+        self._last = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.requests_per_minute,
+                             self._requests + elapsed * self.requests_per_minute * self.rate_scale / 60)
+        self._tokens = min(self.tokens_per_minute,
+                           self._tokens + elapsed * self.tokens_per_minute * self.rate_scale / 60)
+
+    async def acquire(self, tokens: int = 1):
+        """Waits until one request and `tokens` tokens are available, then takes them."""
+        # A single oversized prompt must not wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                request_wait = (1 - self._requests) * 60 / (self.requests_per_minute * self.rate_scale)
+                token_wait = (tokens - self._tokens) * 60 / (self.tokens_per_minute * self.rate_scale)
+                await asyncio.sleep(max(request_wait, token_wait, 0.001))
+
+    def penalize(self):
+        """Halve the refill rate after a 429 / quota error."""
+        self.rate_scale = max(self.MIN_SCALE, self.rate_scale * 0.5)
+
+    def reward(self):
+        """Creep back towards the configured rate after a successful call."""
+        self.rate_scale = min(1.0, self.rate_scale + 0.05)
+
+
+class AuditExecutor:
+    """
+    Runs PolicyAgent.acheck_policy over many queries with a bounded number of
+    requests in flight, a token-bucket limiter and adaptive backoff on throttling.
+    Results are always returned in the same order as the input queries
+    (CANCELLED_RESPONSE for anything skipped after `cancel` was set).
+    """
+
+    def __init__(self, agent, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = MAX_RETRIES,
+                 base_backoff: float = BASE_BACKOFF_SECONDS,
+                 max_backoff: float = MAX_BACKOFF_SECONDS,
+                 use_cache: bool = True,
+                 cancel: Optional[threading.Event] = None):
+        self.agent = agent
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.use_cache = use_cache
+        # Set from another thread to stop handing out work; requests in flight still finish
+        self.cancel = cancel or threading.Event()
+        self.stats: Dict[str, int] = {"calls": 0, "cached": 0, "throttled": 0, "errors": 0}
+
+    async def _audit_one(self, bucket: TokenBucket, query: str) -> str:
+        # Cache hits cost no API quota, so answer them before touching the limiter
+        cached = self.agent.cached_verdict(query) if self.use_cache else None
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached
+
+        tokens = estimate_tokens(self.agent.policy_context(query)) + estimate_tokens(query)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire(tokens)
+            self.stats["calls"] += 1
+            try:
+                decision = await self.agent.acheck_policy(query, use_cache=False)
+                bucket.reward()
+                return decision
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    self.stats["errors"] += 1
+                    METRICS.count("llm_errors")
+                    return f"Error: {e}"
+                self.stats["throttled"] += 1
+                METRICS.count("llm_retries")
+                bucket.penalize()
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def arun(self, queries: List[str],
+                   on_result: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Audits every query; `on_result(index, decision)` fires as each one completes."""
+        # Read the policy once up front instead of racing on it from every worker
+        if not self.agent.policy_text:
+            self.agent.ingest_policy()
+
+        bucket = TokenBucket(self.requests_per_minute, self.tokens_per_minute)
+        results: List[Optional[str]] = [None] * len(queries)
+        pending = iter(enumerate(queries))
+
+        async def worker():
+            for index, query in pending:
+                if self.cancel.is_set():
+                    return
+                results[index] = await self._audit_one(bucket, query)
+                if on_result:
+                    on_result(index, results[index])
+
+        workers = min(self.max_concurrency, len(queries))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = CANCELLED_RESPONSE
+                if on_result:
+                    on_result(index, results[index])
+        return results
+
+    def run(self, queries: List[str],
+            on_result: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """Blocking wrapper around arun() for scripts like main.py."""
+        return asyncio.run(self.arun(queries, on_result))
+
+    # --- Batch mode (PolicyAgent.check_policy_batch semantics, run concurrently) ---
+
+    async def _audit_batch(self, bucket: TokenBucket, batch: List[dict], deliver) -> List[dict]:
+        """Sends one batch; delivers the valid verdicts and returns the rows to re-queue."""
+        question = self.agent._batch_question(batch)
+        tokens = estimate_tokens(self.agent.policy_context([t["query"] for t in batch])) + estimate_tokens(question)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire(tokens)
+            self.stats["calls"] += 1
+            try:
+                verdicts, missing = await self.agent.abatch_round(batch)
+                bucket.reward()
+                for verdict in verdicts.values():
+                    deliver(verdict)
+                return missing
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    self.stats["errors"] += 1
+                    METRICS.count("llm_errors")
+                    print(f"[!] Batch request failed, re-queueing {len(batch)} rows: {e}")
+                    return batch
+                self.stats["throttled"] += 1
+                METRICS.count("llm_retries")
+                bucket.penalize()
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def arun_batches(self, transactions: List[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                           max_rounds: int = BATCH_MAX_ROUNDS,
+                           on_result: Optional[Callable[[int, dict], None]] = None) -> List[dict]:
+        """
+        Audits `transactions` ({"TransactionID", "query"} dicts) K rows per request.
+        Returns structured verdicts in input order. Rows the model skipped or
+        garbled are re-queued; after `max_rounds` they fall back to single-row calls.
+        A TransactionID that occurs more than once (a duplicate payment) is sent as
+        "TXN-7#2", "TXN-7#3" ..., so every verdict maps back to exactly one row.
+        """
+        if not self.agent.policy_text:
+            self.agent.ingest_policy()
+
+        bucket = TokenBucket(self.requests_per_minute, self.tokens_per_minute)
+        results: List[Optional[dict]] = [None] * len(transactions)
+        records, positions = [], {}  # batch ID -> input position
+        for i, t in enumerate(transactions):
+            batch_id, n = str(t["TransactionID"]), 1
+            while batch_id in positions:
+                n += 1
+                batch_id = f"{t['TransactionID']}#{n}"
+            positions[batch_id] = i
+            records.append(dict(t, TransactionID=batch_id))
+
+        def deliver(verdict):
+            i = positions.get(verdict["TransactionID"])
+            if i is None or results[i] is not None:
+                return
+            results[i] = dict(verdict, TransactionID=str(transactions[i]["TransactionID"]))
+            if on_result:
+                on_result(i, results[i])
+
+        pending = []
+        for t in records:
+            cached = self.agent.cached_batch_verdict(t) if self.use_cache else None
+            if cached is not None:
+                self.stats["cached"] += 1
+                deliver(dict(cached, TransactionID=t["TransactionID"]))
+            else:
+                pending.append(t)
+
+        batch_size = max(1, int(batch_size))
+        queue = deque((pending[i:i + batch_size], 0) for i in range(0, len(pending), batch_size))
+
+        async def worker():
+            while queue and not self.cancel.is_set():
+                batch, round_no = queue.popleft()
+                missing = await self._audit_batch(bucket, batch, deliver)
+                if not missing:
+                    continue
+                if round_no + 1 < max_rounds:
+                    queue.append((missing, round_no + 1))
+                    continue
+                # Give up on batching for these rows and ask one at a time
+                for t in missing:
+                    if self.cancel.is_set():
+                        return
+                    txn_id = str(t["TransactionID"])
+                    deliver(verdict_from_text(txn_id, await self._audit_one(bucket, t["query"])))
+
+        workers = min(self.max_concurrency, len(queue))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for t in records:
+            deliver(verdict_from_text(t["TransactionID"], CANCELLED_RESPONSE))  # rows skipped by `cancel`
+        return results
+
+    def run_batches(self, transactions: List[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                    max_rounds: int = BATCH_MAX_ROUNDS,
+                    on_result: Optional[Callable[[int, dict], None]] = None) -> List[dict]:
+        """Blocking wrapper around arun_batches()."""
+        return asyncio.run(self.arun_batches(transactions, batch_size, max_rounds, on_result))
@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# --- CONFIGURATION ---
+HISTORY_PATH = os.path.join("data", "audit_history.sqlite")
+SECTION_PATTERN = re.compile(r"Section\s+(\d+(?:\.\d+)*)", re.IGNORECASE)
+STATUSES = ("FLAG", "PASS", "ERROR")
+
+SCHEMA = [
+    # Verdicts refer to their run by the small integer key, not the run_id text
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id INTEGER PRIMARY KEY, run_id TEXT NOT NULL UNIQUE, started REAL NOT NULL, finished REAL, source TEXT,"
+    " ledger_path TEXT, rows INTEGER, flagged INTEGER)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started)",
+    # Identical decision texts (re-used verdicts, pre-screen answers) are stored once
+    "CREATE TABLE IF NOT EXISTS decisions (id INTEGER PRIMARY KEY, text TEXT NOT NULL)",
+    # Keyed by the row's place in the ledger (row number; the line's byte offset for watch runs),
+    # so a TransactionID booked twice keeps both verdicts
+    "CREATE TABLE IF NOT EXISTS verdicts ("
+    " run INTEGER NOT NULL, position INTEGER NOT NULL, txn_id TEXT NOT NULL, status TEXT NOT NULL, section TEXT,"
+    " approver TEXT, vendor TEXT, amount REAL, duplicate_cluster TEXT,"
+    " decision_id INTEGER NOT NULL, decided REAL NOT NULL, sections TEXT,"
+    " PRIMARY KEY (run, position)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_verdicts_txn ON verdicts(txn_id, run)",
+    "CREATE INDEX IF NOT EXISTS idx_verdicts_status ON verdicts(run, status, section, approver)",
+    "CREATE INDEX IF NOT EXISTS idx_verdicts_section ON verdicts(section, run)",
+]
+VERDICT_COLUMNS = ("run", "position", "txn_id", "status", "section", "approver", "vendor", "amount", "duplicate_cluster",
+                   "decision_id", "decided", "sections")
+
+
+def plain_status(status: str) -> str:
+    """'🔴 FLAG' -> 'FLAG' (the report's labels carry an emoji)."""
+    upper = str(status).upper()
+    for name in STATUSES:
+        if name in upper:
+            return name
+    return upper.strip()
+
+
+def cited_section(decision: str) -> Optional[str]:
+    """First policy section a decision cites ('VIOLATION: Section 1.2 - ...' -> '1.2')."""
+    match = SECTION_PATTERN.search(decision or "")
+    return match.group(1) if match else None
+
+
+def decision_id(text: str) -> int:
+    """64-bit content id of a decision text."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def parse_when(value: str) -> float:
+    """
+    '2026-07-01' or '2026-07-01T12:00' as a Unix timestamp. Times are UTC, as
+    displayed by the report; an explicit offset ('+02:00') is honoured.
+    """
+    when = datetime.fromisoformat(value)
+    return (when if when.tzinfo else when.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class AuditHistory:
+    """
+    Verdicts of every audit run in one indexed SQLite file (WAL mode), keyed by
+    (run, ledger position). Status, cited section, approver and amount are
+    columns with their own indexes, so cross-run questions are index lookups
+    instead of re-reading old report CSVs.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._connect(), params=params)
+
+    # --- Writing ---
+
+    def start_run(self, run_id: str, source: str = "main", ledger_path: str = "", started: Optional[float] = None):
+        """Registers a run (a resumed run keeps its original start time)."""
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR IGNORE INTO runs (run_id, started, source, ledger_path) VALUES (?, ?, ?, ?)",
+                (run_id, started or time.time(), source, ledger_path),
+            )
+
+    def _run_key(self, run_id: str) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown run: {run_id} (call start_run first)")
+        return row[0]
+
+    def record(self, run_id: str, ledger: pd.DataFrame, results: List[dict], positions: Optional[List[int]] = None):
+        """
+        Stores one chunk of report rows; `results` are in the same order as the
+        `ledger` rows. `positions` place them in the ledger (default: the ledger
+        index, which pandas keeps counting across the chunks of one read); a
+        verdict recorded again for the same position replaces the earlier one.
+        """
+        run = self._run_key(run_id)
+        now = time.time()
+        n = len(results)
+        positions = ledger.index.tolist() if positions is None else list(positions)
+        approvers = ledger["Approver"].tolist() if "Approver" in ledger else [None] * n
+        vendors = ledger["Vendor"].tolist() if "Vendor" in ledger else [None] * n
+        amounts = pd.to_numeric(ledger["Amount"], errors="coerce").tolist() if "Amount" in ledger else [None] * n
+        decisions: Dict[int, str] = {}
+        ids: Dict[str, int] = {}
+        rows = []
+        for result, position, approver, vendor, amount in zip(results, positions, approvers, vendors, amounts):
+            text = str(result["AI_Decision"])
+            did = ids.get(text)
+            if did is None:
+                did = ids[text] = decision_id(text)
+                decisions[did] = text
+            rows.append((run, int(position), str(result["TransactionID"]), plain_status(result["Status"]), cited_section(text),
+                         approver, vendor, None if pd.isna(amount) else amount,
+                         result.get("Duplicate_Cluster") or None, did, now, result.get("Policy_Sections") or None))
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR IGNORE INTO decisions (id, text) VALUES (?, ?)", decisions.items())
+            conn.executemany(f"INSERT OR REPLACE INTO verdicts ({', '.join(VERDICT_COLUMNS)})"
+                             f" VALUES ({', '.join('?' * len(VERDICT_COLUMNS))})", rows)
+            conn.execute("COMMIT")
+
+    def finish_run(self, run_id: str):
+        with self._lock:
+            conn = self._connect()
+            rows, flagged = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(v.status = 'FLAG'), 0) FROM verdicts v"
+                " JOIN runs r ON r.id = v.run WHERE r.run_id = ?", (run_id,)
+            ).fetchone()
+            conn.execute("UPDATE runs SET finished = ?, rows = ?, flagged = ? WHERE run_id = ?",
+                         (time.time(), rows, flagged, run_id))
+
+    def import_report(self, report_path: str, run_id: Optional[str] = None, ledger_path: Optional[str] = None,
+                      source: str = "import", chunk_size: int = 50_000) -> str:
+        """
+        Loads a final_audit_report.csv (e.g. from before the history existed, or a
+        sharded run). With `ledger_path` the approver / vendor / amount columns are filled in.
+        """
+        run_id = run_id or "import-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(os.path.getmtime(report_path)))
+        self.start_run(run_id, source=source, ledger_path=ledger_path or "", started=os.path.getmtime(report_path))
+        ledger = None
+        if ledger_path:
+            ledger = pd.read_csv(ledger_path, usecols=lambda c: c.strip() in ("TransactionID", "Approver", "Vendor", "Amount"))
+            ledger.columns = [c.strip() for c in ledger.columns]
+            ledger = ledger.assign(TransactionID=ledger["TransactionID"].astype(str)).drop_duplicates("TransactionID")
+            ledger = ledger.set_index("TransactionID")
+        for chunk in pd.read_csv(report_path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            details = (ledger.reindex(chunk["TransactionID"]).reset_index() if ledger is not None
+                       else pd.DataFrame(index=range(len(chunk))))
+            self.record(run_id, details, chunk.to_dict("records"), positions=chunk.index)
+        self.finish_run(run_id)
+        return run_id
+
+    # --- Queries ---
+
+    def runs(self, limit: Optional[int] = None) -> pd.DataFrame:
+        sql = "SELECT run_id, started, finished, source, ledger_path, rows, flagged FROM runs ORDER BY started DESC" + (" LIMIT ?" if limit else "")
+        return self._query(sql, (limit,) if limit else ())
+
+    def resolve_run(self, ref: Optional[str] = "latest") -> Optional[str]:
+        """
+        A run id (or unique prefix), 'latest', 'previous', or a date: the last
+        run started before that date ('2026-07-01' = as of the start of Q3).
+        """
+        ref = ref or "latest"
+        if ref in ("latest", "previous"):
+            found = self._query("SELECT run_id FROM runs ORDER BY started DESC LIMIT 1 OFFSET ?",
+                                (0 if ref == "latest" else 1,))
+        else:
+            found = self._query("SELECT run_id FROM runs WHERE run_id = ? OR run_id LIKE ? ORDER BY started DESC",
+                                (ref, ref + "%"))
+            if found.empty:
+                try:
+                    when = parse_when(ref)
+                except ValueError:
+                    return None
+                found = self._query("SELECT run_id FROM runs WHERE started < ? ORDER BY started DESC LIMIT 1",
+                                    (when,))
+            elif len(found) > 1 and ref not in set(found["run_id"]):
+                raise ValueError(f"Run prefix {ref!r} is ambiguous ({len(found)} runs)")
+        return None if found.empty else found["run_id"].iloc[0]
+
+    def verdicts(self, run: Optional[str] = "latest", txn_id: Optional[str] = None, status: Optional[str] = None,
+                 section: Optional[str] = None, approver: Optional[str] = None, since: Optional[str] = None,
+                 limit: Optional[int] = None) -> pd.DataFrame:
+        """Verdicts matching every given filter. run=None (with since=DATE) searches all runs."""
+        where, params = [], []
+        if run is not None:
+            where.append("r.run_id = ?")
+            params.append(self.resolve_run(run))
+        for column, value in (("v.txn_id", txn_id), ("v.status", status and plain_status(status)),
+                              ("v.section", section), ("v.approver", approver)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("r.started >= ?")
+            params.append(parse_when(since))
+        sql = ("SELECT r.run_id, r.started AS run_started, v.txn_id AS TransactionID, v.status AS Status,"
+               " v.section AS Section, v.approver AS Approver, v.vendor AS Vendor, v.amount AS Amount,"
+               " v.duplicate_cluster AS Duplicate_Cluster, v.decided AS Decided, d.text AS AI_Decision"
+               " FROM verdicts v JOIN runs r ON r.id = v.run JOIN decisions d ON d.id = v.decision_id"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY r.started, v.txn_id, v.position" + (" LIMIT ?" if limit else ""))
+        return self._query(sql, params + ([limit] if limit else []))
+
+    def transaction(self, txn_id: str) -> pd.DataFrame:
+        """One transaction across every run, oldest first."""
+        return self.verdicts(run=None, txn_id=txn_id)
+
+    def diff(self, old: str = "previous", new: str = "latest", from_status: Optional[str] = None,
+             to_status: Optional[str] = None) -> pd.DataFrame:
+        """
+        Transactions whose status changed between two runs (Old_Status is empty
+        for transactions that are new in the later run). e.g. diff("2026-07-01",
+        "latest", "PASS", "FLAG") = flipped from PASS to FLAG since the start of Q3.
+        A TransactionID booked more than once is compared occurrence by occurrence.
+        """
+        old_id, new_id = self.resolve_run(old), self.resolve_run(new)
+        if old_id is None or new_id is None:
+            raise ValueError(f"Unknown run: {old if old_id is None else new}")
+        where = ["(o.status IS NULL OR o.status != n.status)"]
+        params = [old_id, new_id]
+        if to_status:
+            where.append("n.status = ?")
+            params.append(plain_status(to_status))
+        if from_status:
+            where.append("o.status = ?")
+            params.append(plain_status(from_status))
+        occurrences = ("SELECT *, ROW_NUMBER() OVER (PARTITION BY txn_id ORDER BY position) AS occurrence"
+                       " FROM verdicts WHERE run = (SELECT id FROM runs WHERE run_id = ?)")
+        sql = (f"WITH o AS ({occurrences}), n AS ({occurrences})"
+               " SELECT n.txn_id AS TransactionID, o.status AS Old_Status, n.status AS New_Status,"
+               " o.section AS Old_Section, n.section AS New_Section, n.approver AS Approver, n.amount AS Amount,"
+               " d.text AS AI_Decision"
+               " FROM n LEFT JOIN o ON o.txn_id = n.txn_id AND o.occurrence = n.occurrence"
+               " JOIN decisions d ON d.id = n.decision_id"
+               " WHERE " + " AND ".join(where) + " ORDER BY n.txn_id, n.position")
+        return self._query(sql, params)
+
+    def relied_on(self, sections: List[str], run: Optional[str] = "latest") -> pd.DataFrame:
+        """TransactionID and Policy_Sections of the run's verdicts that depended on any of `sections` (or on unknown ones)."""
+        run_id = self.resolve_run(run)
+        if run_id is None or not sections:
+            return pd.DataFrame(columns=["TransactionID", "Policy_Sections"])
+        matches = " OR ".join(["(',' || v.sections || ',') LIKE ?"] * len(sections))
+        sql = ("SELECT v.txn_id AS TransactionID, v.sections AS Policy_Sections"
+               " FROM verdicts v WHERE v.run = (SELECT id FROM runs WHERE run_id = ?)"
+               f" AND (v.sections IS NULL OR {matches}) ORDER BY v.txn_id")
+        return self._query(sql, [run_id] + [f"%,{s},%" for s in sections])
+
+    def count(self, by: str = "approver", run: Optional[str] = "latest", status: Optional[str] = "FLAG",
+              section: Optional[str] = None) -> pd.DataFrame:
+        """Verdict counts grouped by approver, vendor, section or status (e.g. Section 1.2 violations by approver)."""
+        if by not in ("approver", "vendor", "section", "status", "run_id"):
+            raise ValueError(f"Cannot group by {by!r}")
+        where, params = [], []
+        for column, value in (("r.run_id", run and self.resolve_run(run)), ("v.status", status and plain_status(status)),
+                              ("v.section", section)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        group = "r.run_id" if by == "run_id" else f"v.{by}"
+        sql = (f"SELECT {group} AS {by}, COUNT(*) AS verdicts, SUM(v.amount) AS amount"
+               " FROM verdicts v JOIN runs r ON r.id = v.run"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f" GROUP BY {group} ORDER BY verdicts DESC")
+        return self._query(sql, params)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the verdicts of past audit runs.")
+    parser.add_argument("--db", default=HISTORY_PATH)
+    parser.add_argument("--out", help="write the result to this CSV file instead of printing it")
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("runs", help="list runs, newest first")
+    r.add_argument("--limit", type=int, default=20)
+    s = sub.add_parser("show", help="verdicts matching the filters")
+    s.add_argument("--run", default="latest", help="run id, 'latest', 'previous', a date (UTC), or 'all'")
+    s.add_argument("--status")
+    s.add_argument("--section")
+    s.add_argument("--approver")
+    s.add_argument("--since", help="only runs started on/after this date, UTC (with --run all)")
+    s.add_argument("--limit", type=int)
+    t = sub.add_parser("txn", help="one transaction across every run")
+    t.add_argument("txn_id")
+    d = sub.add_parser("diff", help="transactions whose status changed between two runs")
+    d.add_argument("old", nargs="?", default="previous")
+    d.add_argument("new", nargs="?", default="latest")
+    d.add_argument("--from", dest="from_status")
+    d.add_argument("--to", dest="to_status")
+    c = sub.add_parser("count", help="verdict counts grouped by a column")
+    c.add_argument("--by", default="approver", choices=["approver", "vendor", "section", "status", "run_id"])
+    c.add_argument("--run", default="latest", help="run id, 'latest', 'previous', a date (UTC), or 'all'")
+    c.add_argument("--status", default="FLAG", help="'all' for every status")
+    c.add_argument("--section")
+    i = sub.add_parser("import", help="load an existing report CSV as a run")
+    i.add_argument("report")
+    i.add_argument("--ledger", help="ledger CSV the report was made from (adds approver / vendor / amount)")
+    i.add_argument("--run-id")
+    args = parser.parse_args(argv)
+
+    history = AuditHistory(args.db)
+    start = time.perf_counter()
+    if args.command == "runs":
+        result = history.runs(args.limit)
+    elif args.command == "show":
+        result = history.verdicts(None if args.run == "all" else args.run, status=args.status, section=args.section,
+                                  approver=args.approver, since=args.since, limit=args.limit)
+    elif args.command == "txn":
+        result = history.transaction(args.txn_id)
+    elif args.command == "diff":
+        result = history.diff(args.old, args.new, args.from_status, args.to_status)
+    elif args.command == "count":
+        result = history.count(args.by, None if args.run == "all" else args.run,
+                               None if args.status == "all" else args.status, args.section)
+    else:
+        print(f"[SUCCESS] Imported {args.report} as run {history.import_report(args.report, args.run_id, args.ledger)}")
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    history.close()
+
+    for column in ("started", "finished", "run_started", "Decided"):
+        if column in result:
+            result[column] = pd.to_datetime(result[column], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+    if args.out:
+        result.to_csv(args.out, index=False)
+        print(f"[SUCCESS] {len(result):,} rows saved to: {args.out}")
+    else:
+        with pd.option_context("display.max_rows", 100, "display.max_colwidth", 80, "display.width", 200):
+            print(result.to_string(index=False) if len(result) else "(no rows)")
+    print(f"[*] {len(result):,} rows in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
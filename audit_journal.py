@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from policy_engine import file_sha256
+
+# --- CONFIGURATION ---
+JOURNAL_FILE = os.path.join("data", "audit_journal.jsonl")
+MISSING_INVOICE_HASH = "MISSING"
+
+
+def canonical_value(value) -> str:
+    """
+    One spelling per ledger value, whatever type pandas inferred for its chunk:
+    4500, 4500.0 and "4500.00" are the same amount, a missing value is "".
+    """
+    try:
+        if value is None or value != value:
+            return ""
+    except TypeError:  # pd.NA
+        return ""
+    text = str(value).strip()
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return text
+    return format(number.normalize(), "f") if number.is_finite() else text
+
+
+def row_input_hash(row: dict, invoice_hash: str) -> str:
+    """Identity of one audit input: the ledger row's content plus the invoice file's content."""
+    h = hashlib.sha256()
+    canonical = {str(column).strip(): canonical_value(value) for column, value in row.items()}
+    h.update(json.dumps(canonical, sort_keys=True).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(invoice_hash.encode("utf-8"))
+    return h.hexdigest()
+
+
+def invoice_file_hash(pdf_path: str) -> str:
+    return file_sha256(pdf_path) if os.path.exists(pdf_path) else MISSING_INVOICE_HASH
+
+
+class AuditJournal:
+    """
+    Append-only JSON-lines log of audit verdicts.
+    Every verdict is flushed and fsync'ed as soon as it is decided, so a crash,
+    quota exhaustion or Ctrl-C loses at most the request that was in flight.
+
+    Events: {"event": "run_started" | "verdict" | "run_finished", "run_id": ..., ...}
+    A run records the hash of the policy it audited against, so a verdict is
+    only re-used under the policy it was made with.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self._file = None
+
+    def _events(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+
+    def _append(self, event: dict):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        event.setdefault("ts", time.time())
+        self._file.write(json.dumps(event, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_incremental(self, run_id: str) -> bool:
+        """Whether the run was started with incremental=True (it journals only what it decided itself)."""
+        return any(e.get("event") == "run_started" and e["run_id"] == run_id and e.get("incremental")
+                   for e in self._events())
+
+    def last_unfinished_run(self) -> Optional[str]:
+        started, finished = [], set()
+        for event in self._events():
+            if event.get("event") == "run_started":
+                started.append(event["run_id"])
+            elif event.get("event") == "run_finished":
+                finished.add(event["run_id"])
+        for run_id in reversed(started):
+            if run_id not in finished:
+                return run_id
+        return None
+
+    def start_run(self, resume: bool = False, incremental: bool = False,
+                  policy_hash: Optional[str] = None) -> Tuple[str, bool]:
+        """Returns (run_id, resumed). With resume=True the last unfinished run is continued."""
+        if resume:
+            run_id = self.last_unfinished_run()
+            if run_id:
+                return run_id, True
+        run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self._append({"event": "run_started", "run_id": run_id, "incremental": incremental,
+                      "policy_hash": policy_hash})
+        return run_id, False
+
+    def verdicts(self, run_id: Optional[str] = None, policy_hash: Optional[str] = None) -> Dict[str, dict]:
+        """
+        input_hash -> latest verdict event (of one run, or of all runs), with the
+        "policy_hash" of its run. Given a policy_hash, only verdicts of runs under that policy.
+        """
+        found, policies = {}, {}
+        for event in self._events():
+            kind = event.get("event")
+            if kind == "run_started":
+                policies[event["run_id"]] = event.get("policy_hash")
+            elif kind == "verdict" and (run_id is None or event["run_id"] == run_id):
+                event["policy_hash"] = policies.get(event["run_id"])
+                if policy_hash is None or event["policy_hash"] == policy_hash:
+                    found[event["input_hash"]] = event
+        return found
+
+    def record(self, run_id: str, txn_id: str, input_hash: str, response: str,
+               verdict_status: Optional[str] = None, retrieved: Optional[List[str]] = None):
+        event = {
+            "event": "verdict",
+            "run_id": run_id,
+            "TransactionID": txn_id,
+            "input_hash": input_hash,
+            "response": response,
+            "verdict_status": verdict_status,
+        }
+        if retrieved:
+            event["retrieved"] = retrieved  # policy sections the model was shown (for policy_impact)
+        self._append(event)
+
+    def finish_run(self, run_id: str):
+        self._append({"event": "run_finished", "run_id": run_id})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
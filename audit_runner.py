@@ -0,0 +1,175 @@
+import io
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from audit_executor import AuditExecutor
+from doa_rules import compile_doa_rules, prescreen, doa_decision, DOA_COMPLIANT, DOA_VIOLATION
+from ingestion import LEDGER_CHUNK_SIZE
+from policy_engine import format_verdict
+
+# --- CONFIGURATION ---
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+
+def build_query(row, screen_row=None) -> str:
+    query = f"Audit: ID {row.TransactionID}, Approver {row.Approver}, Amount ${row.Amount}, Description: {row.Description}"
+    if screen_row is not None and screen_row.DoA_Status == DOA_COMPLIANT:
+        # The approval limit is settled; the model still checks the row against every other clause
+        query += f" | DoA pre-screen: {doa_decision(row.Approver, row.Amount, screen_row)}"
+    return query
+
+
+class AuditJob:
+    """
+    One ledger audit running on a background thread.
+    The UI only reads snapshots (progress(), results()), so reruns of the
+    Streamlit script never block on, or kill, the audit itself.
+    `agent` belongs to this job alone; never hand one PolicyAgent to two jobs.
+    """
+
+    def __init__(self, agent, ledger_bytes: bytes, batch_size: int = 1, use_cache: bool = True,
+                 chunk_size: int = LEDGER_CHUNK_SIZE):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.agent = agent
+        self.ledger_bytes = ledger_bytes
+        self.batch_size = batch_size
+        self.use_cache = use_cache
+        self.chunk_size = chunk_size
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.total = 0
+        self.started = self.finished = None
+        self._results: Dict[int, dict] = {}  # ledger position -> report row
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"audit-{self.job_id}", daemon=True)
+
+    # --- Called from the UI thread ---
+
+    def start(self) -> "AuditJob":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def progress(self) -> dict:
+        with self._lock:
+            done = len(self._results)
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {"status": self.status, "done": done, "total": self.total, "elapsed": elapsed, "error": self.error}
+
+    def results(self) -> List[dict]:
+        """Verdicts so far, in ledger order."""
+        with self._lock:
+            return [self._results[i] for i in sorted(self._results)]
+
+    # --- Background thread ---
+
+    def _publish(self, position: int, row, decision: str, status: Optional[str] = None):
+        if status is None:
+            status = "ERROR" if decision.startswith(("Error:", "⚠️")) else (
+                "VIOLATION" if "VIOLATION" in decision.upper() else "COMPLIANT")
+        label = {"VIOLATION": "FLAGGED", "ERROR": "ERROR"}.get(status, "PASSED")
+        with self._lock:
+            self._results[position] = {"TransactionID": row.TransactionID, "Status": label, "Reasoning": decision}
+
+    def _chunks(self, **kwargs):
+        return pd.read_csv(io.BytesIO(self.ledger_bytes), chunksize=self.chunk_size, **kwargs)
+
+    def _run(self):
+        self.status, self.started = RUNNING, time.time()
+        try:
+            self.total = sum(len(c) for c in self._chunks(usecols=[0]))
+            self.agent.ingest_policy()
+            doa_rules = compile_doa_rules(self.agent.policy_text)
+            executor = AuditExecutor(self.agent, use_cache=self.use_cache, cancel=self._cancel)
+
+            offset = 0
+            for df in self._chunks():
+                if self._cancel.is_set():
+                    break
+                self._audit_chunk(df, offset, doa_rules, executor)
+                offset += len(df)
+            self.status = CANCELLED if self._cancel.is_set() else DONE
+        except Exception as e:
+            self.error = str(e)
+            self.status = FAILED
+        finally:
+            self.finished = time.time()
+            self.ledger_bytes = b""  # the upload is not needed any more
+
+    def _audit_chunk(self, df, offset, doa_rules, executor):
+        # Clear approval-limit breaches are decided without the LLM (as in main.py); a compliant
+        # limit only settles Section 1, so those rows still go to the model with the pre-screen result
+        screen = prescreen(df, doa_rules)
+        rows = list(df.itertuples(index=False))
+        screen_rows = list(screen.itertuples(index=False))
+        llm_positions = []
+        for i, (row, screen_row) in enumerate(zip(rows, screen_rows)):
+            if screen_row.DoA_Status == DOA_VIOLATION:
+                self._publish(offset + i, row, doa_decision(row.Approver, row.Amount, screen_row))
+            else:
+                llm_positions.append(i)
+        if not llm_positions:
+            return
+
+        # Everything else goes through the concurrent (optionally batched) LLM path
+        if self.batch_size > 1:
+            transactions = [{"TransactionID": str(rows[i].TransactionID), "query": build_query(rows[i], screen_rows[i])}
+                            for i in llm_positions]
+
+            def on_verdict(index, verdict):
+                i = llm_positions[index]
+                self._publish(offset + i, rows[i], format_verdict(verdict), verdict["status"])
+
+            executor.run_batches(transactions, batch_size=self.batch_size, on_result=on_verdict)
+        else:
+            def on_result(index, decision):
+                i = llm_positions[index]
+                self._publish(offset + i, rows[i], decision)
+
+            executor.run([build_query(rows[i], screen_rows[i]) for i in llm_positions], on_result=on_result)
+
+
+# Jobs by browser session, so a rerun (or a second tab of the same session) finds its audit again.
+# A job is dropped once its session has collected the results (release); finished jobs of sessions
+# that never come back are dropped oldest first beyond MAX_FINISHED_JOBS
+MAX_FINISHED_JOBS = 16
+_JOBS: Dict[str, AuditJob] = {}
+_JOBS_LOCK = threading.Lock()
+
+
+def submit(session_key: str, job: AuditJob) -> AuditJob:
+    """Starts `job` for this session, cancelling the session's previous run if it is still going."""
+    with _JOBS_LOCK:
+        previous = _JOBS.pop(session_key, None)
+        if previous is not None and previous.running:
+            previous.cancel()
+        _JOBS[session_key] = job  # newest last
+        finished = [key for key, j in _JOBS.items() if not j.running and key != session_key]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _JOBS[key]
+    return job.start()
+
+
+def get_job(session_key: str) -> Optional[AuditJob]:
+    with _JOBS_LOCK:
+        return _JOBS.get(session_key)
+
+
+def release(session_key: str, job: AuditJob) -> bool:
+    """Forgets the session's job once it has finished and its results were collected. False if it is still running."""
+    with _JOBS_LOCK:
+        if job.running or _JOBS.get(session_key) is not job:
+            return False
+        del _JOBS[session_key]
+        return True
@@ -0,0 +1,105 @@
+"""
+Duplicate payment benchmark: duplicate_detector.find_duplicates over synthetic
+ledgers of growing size, with exact and near duplicates planted at known rows.
+
+    python benchmarks/bench_duplicates.py --rows 250000 500000 1000000 2000000
+
+Time per row should stay roughly flat as the ledger grows (hash indexes and
+sorts, no pairwise scan). --check-rows also runs the naive O(n^2) pairwise scan
+on a small ledger and compares the two results.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from duplicate_detector import (find_duplicates, normalize_vendor, DATE_TOLERANCE_DAYS,  # noqa: E402
+                                AMOUNT_TOLERANCE_CENTS, EXACT_DUPLICATE, NEAR_DUPLICATE)
+
+SPELLINGS = ["{} Inc.", "{} INC", "{}", "{} Ltd", "{} llc"]
+
+
+def make_ledger(rows, vendors=2000, duplicate_rate=0.01, near_rate=0.01, seed=0):
+    """Unique payments plus planted copies; returns (ledger, planted exact ids, planted near ids)."""
+    rng = np.random.default_rng(seed)
+    base = rows - int(rows * duplicate_rate) - int(rows * near_rate)
+    names = np.array([f"Vendor {i:05d}" for i in range(vendors)], dtype=object)
+    vendor = rng.integers(0, vendors, base)
+    ledger = pd.DataFrame({
+        "TransactionID": np.char.add("TXN-", np.arange(base).astype(str)),
+        "Vendor": names[vendor],
+        "Amount": np.round(rng.uniform(10, 50000, base), 2),
+        "Date": (np.datetime64("2020-01-01") + rng.integers(0, 4 * 365, base)).astype(str),
+        "Description": rng.choice(["Consulting", "Freight", "Hardware", "Licences", "Travel"], base),
+    })
+
+    exact = ledger.sample(int(rows * duplicate_rate), random_state=seed).copy()
+    exact["TransactionID"] = exact["TransactionID"] + "-DUP"
+    near = ledger.sample(int(rows * near_rate), random_state=seed + 1).copy()
+    near["TransactionID"] = near["TransactionID"] + "-NEAR"
+    # Same payee spelled differently, paid again a few days later
+    near["Vendor"] = [SPELLINGS[i % len(SPELLINGS)].format(v) for i, v in enumerate(near["Vendor"])]
+    shift = rng.integers(1, DATE_TOLERANCE_DAYS + 1, len(near)).astype("timedelta64[D]")
+    near["Date"] = (pd.to_datetime(near["Date"]).to_numpy().astype("datetime64[D]") + shift).astype(str)
+
+    ledger = pd.concat([ledger, exact, near]).sample(frac=1, random_state=seed + 2).reset_index(drop=True)
+    return ledger, set(exact["TransactionID"]), set(near["TransactionID"])
+
+
+def naive_pairs(ledger):
+    """Reference O(n^2) scan: every pair of rows that is an exact or near duplicate."""
+    rows = list(zip(ledger["TransactionID"], [normalize_vendor(v) for v in ledger["Vendor"]],
+                    np.rint(ledger["Amount"].to_numpy() * 100).astype(np.int64),
+                    pd.to_datetime(ledger["Date"]).to_numpy().astype("datetime64[D]").astype(np.int64)))
+    flagged = set()
+    for x in range(len(rows)):
+        for y in range(x + 1, len(rows)):
+            if (rows[x][1] == rows[y][1] and abs(rows[x][2] - rows[y][2]) <= AMOUNT_TOLERANCE_CENTS
+                    and abs(rows[x][3] - rows[y][3]) <= DATE_TOLERANCE_DAYS):
+                flagged.update((rows[x][0], rows[y][0]))
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[250_000, 500_000, 1_000_000, 2_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check-rows", type=int, default=3000, help="ledger size for the naive comparison (0 = skip)")
+    args = parser.parse_args()
+
+    if args.check_rows:
+        ledger, _, _ = make_ledger(args.check_rows, vendors=50)
+        start = time.perf_counter()
+        expected = naive_pairs(ledger)
+        naive_s = time.perf_counter() - start
+        start = time.perf_counter()
+        found = set(find_duplicates(ledger)["TransactionID"])
+        fast_s = time.perf_counter() - start
+        print(f"[*] {args.check_rows:,} rows: naive pairwise scan {naive_s:.2f}s, find_duplicates {fast_s:.3f}s | "
+              f"flagged {len(found)} vs {len(expected)} (missed {len(expected - found)}, "
+              f"extra {len(found - expected)})")
+
+    print(f"\n{'ROWS':>10} | {'BEST S':>7} | {'US/ROW':>7} | {'CLUSTERS':>8} | {'EXACT RECALL':>12} | {'NEAR RECALL':>11}")
+    print("-" * 72)
+    for rows in args.rows:
+        ledger, exact, near = make_ledger(rows)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            dups = find_duplicates(ledger)
+            best = min(best, time.perf_counter() - start)
+        kinds = dict(zip(dups["TransactionID"], dups["Duplicate_Kind"]))
+        exact_recall = sum(kinds.get(t) == EXACT_DUPLICATE for t in exact) / max(1, len(exact))
+        near_recall = sum(kinds.get(t) in (EXACT_DUPLICATE, NEAR_DUPLICATE) for t in near) / max(1, len(near))
+        print(f"{rows:>10,} | {best:>7.2f} | {best / rows * 1e6:>7.2f} | {dups['Duplicate_Cluster'].nunique():>8,} | "
+              f"{exact_recall:>12.1%} | {near_recall:>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
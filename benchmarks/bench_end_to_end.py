@@ -0,0 +1,190 @@
+"""
+End-to-end offline benchmark: generated ledger + invoices -> IngestionAgent
+-> main.py audit, with fake_llm.FakeAuditLLM standing in for Gemini.
+
+    python benchmarks/bench_end_to_end.py --rows 2000 --latency 0.05 --error-rate 0.01
+
+The corpus comes from generate_data.py (known DoA violations, amount
+mismatches and missing invoices) and the fake model answers with
+fake_llm.oracle_responder, so the accuracy figures measure the pipeline
+(pre-screen, batching, retries, parsing), not a real model.
+Each pipeline runs in its own subprocess so peak RSS is measured independently.
+Pass --output results.jsonl to append every run for run-to-run comparison.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def run_ingest(args):
+    """IngestionAgent.run_pipeline over the generated invoices."""
+    import pandas as pd
+    from ingestion import IngestionAgent
+
+    truth = pd.read_csv(os.path.join("data", "ground_truth.csv")).set_index("TransactionID")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results = IngestionAgent().run_pipeline(workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    correct = sum(
+        1 for r in results
+        if abs(r["extracted_amount"] - truth.at[r["source_file"][:-len(".pdf")], "InvoiceAmount"]) < 0.005
+    )
+    return {
+        "pipeline": "ingest",
+        "rows": len(results),
+        "seconds": elapsed,
+        "rows_per_sec": len(results) / elapsed if elapsed else 0.0,
+        "p50_ms": None, "p95_ms": None, "p99_ms": None,
+        "accuracy": correct / len(results) if results else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_audit(args):
+    """main.main() with the oracle fake model; per-row latency is measured from the start of its chunk."""
+    import pandas as pd
+    import main
+    from fake_llm import FakeAuditLLM, oracle_responder
+    from policy_engine import PolicyAgent
+    from verdict_cache import VerdictCache
+
+    chunk_started = [0.0]
+    latencies = []
+    original_chunk = main.AuditRun.audit_chunk
+
+    def timed_chunk(self, df):
+        chunk_started[0] = time.perf_counter()
+        return original_chunk(self, df)
+
+    def timed_print_row(row, response, verdict_status=None):
+        # print_row fires exactly once per row, the moment its verdict is decided
+        latencies.append(time.perf_counter() - chunk_started[0])
+
+    main.AuditRun.audit_chunk = timed_chunk
+    main.print_row = timed_print_row
+
+    llm = FakeAuditLLM(latency=args.latency, error_rate=args.error_rate, seed=args.seed,
+                       responder=oracle_responder)
+    agent = PolicyAgent(llm=llm, cache=VerdictCache(enabled=False))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        main.main(agent, stream=args.chunk_size > 0, chunk_size=args.chunk_size or main.LEDGER_CHUNK_SIZE)
+    elapsed = time.perf_counter() - start
+
+    report = pd.read_csv(main.REPORT_FILE)
+    truth = pd.read_csv(os.path.join("data", "ground_truth.csv"))
+    merged = truth.merge(report, on="TransactionID", how="left")
+    flagged = merged["Status"].fillna("").str.contains("FLAG")
+    expected = merged["Expected"] == "FLAG"
+    recall = {
+        kind: float(flagged[merged[kind]].mean()) if merged[kind].any() else None
+        for kind in ("DoAViolation", "AmountMismatch", "MissingInvoice")
+    }
+    return {
+        "pipeline": "audit",
+        "rows": len(report),
+        "seconds": elapsed,
+        "rows_per_sec": len(report) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "accuracy": float((flagged == expected).mean()),
+        "recall": recall,
+        "false_positives": int((flagged & ~expected).sum()),
+        "llm_calls": llm.calls,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--doa-rate", type=float, default=0.1)
+    parser.add_argument("--mismatch-rate", type=float, default=0.1)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for invoice generation and ingestion")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake LLM calls failing with 429")
+    parser.add_argument("--concurrency", type=int, default=8, help="AUDIT_MAX_CONCURRENCY")
+    parser.add_argument("--batch-size", type=int, default=0, help="AUDIT_BATCH_SIZE (0 = one row per call)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="main.py --stream chunk size (0 = whole ledger)")
+    parser.add_argument("--output", help="append the results as JSON lines to this file")
+    parser.add_argument("--worker", choices=["ingest", "audit"])
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_ingest(args) if args.worker == "ingest" else run_audit(args)
+        print(json.dumps(result))
+        return
+
+    from generate_data import generate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"[*] Generating {args.rows:,} ledger rows and invoices...")
+        start = time.perf_counter()
+        generate(args.rows, data_dir=os.path.join(tmp, "data"), doa_rate=args.doa_rate,
+                 mismatch_rate=args.mismatch_rate, missing_rate=args.missing_rate,
+                 workers=args.workers, seed=args.seed, verbose=False)
+        subprocess.run([sys.executable, os.path.join(ROOT, "create_policy.py")], cwd=tmp,
+                       capture_output=True, check=True)
+        print(f"[*] Corpus ready in {time.perf_counter() - start:.1f}s")
+
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+                   AUDIT_MAX_CONCURRENCY=str(args.concurrency), AUDIT_BATCH_SIZE=str(args.batch_size),
+                   AUDIT_REQUESTS_PER_MINUTE="1000000", AUDIT_TOKENS_PER_MINUTE="1000000000",
+                   AUDIT_CACHE_BYPASS="1")
+        results = []
+        for pipeline in ("ingest", "audit"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", pipeline] + sys.argv[1:],
+                cwd=tmp, env=env, capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            results.append(json.loads(out))
+
+    print(f"\n{'PIPELINE':<8} | {'ROWS':>7} | {'ROWS/SEC':>9} | {'P50 MS':>8} | {'P95 MS':>8} | "
+          f"{'P99 MS':>8} | {'PEAK MB':>8} | {'ACCURACY':>8}")
+    print("-" * 86)
+    for r in results:
+        lat = [f"{r[k]:>8.1f}" if r[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{r['pipeline']:<8} | {r['rows']:>7,} | {r['rows_per_sec']:>9,.1f} | {' | '.join(lat)} | "
+              f"{r['peak_rss_mb']:>8.1f} | {r['accuracy']:>8.1%}")
+    audit = results[-1]
+    print(f"\n[*] Audit recall by defect: {audit['recall']} | false positives: {audit['false_positives']} "
+          f"| LLM calls: {audit['llm_calls']}")
+
+    if args.output:
+        params = {k: v for k, v in vars(args).items() if k not in ("output", "worker")}
+        with open(args.output, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(dict(r, params=params, ts=time.time())) + "\n")
+        print(f"[*] Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
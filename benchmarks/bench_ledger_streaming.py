@@ -0,0 +1,103 @@
+"""
+Ledger path benchmark: whole-file load + iterrows (the original main.py path)
+vs. chunked streaming + incremental report writing (main.py --stream).
+
+    python benchmarks/bench_ledger_streaming.py --rows 1000000
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+The LLM is left out on purpose: this measures the data path only.
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APPROVERS = ["Bob Director", "Charlie Manager", "Alice VP", "Dana CFO"]
+VENDORS = ["TechCorp Solutions", "Global Consultants", "Office Supplies Co"]
+
+
+def make_ledger(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["TransactionID", "Date", "Vendor", "Amount", "Currency", "Approver", "Description"])
+        for i in range(rows):
+            w.writerow([f"TXN-{1000 + i}", "2026-02-05", rng.choice(VENDORS), round(rng.uniform(10, 20000), 2),
+                        "USD", rng.choice(APPROVERS), "Benchmark line item"])
+
+
+def fake_status(amount):
+    return "🔴 FLAG" if amount > 5000 else "🟢 PASS"
+
+
+def run_baseline(ledger, out):
+    import pandas as pd
+    df = pd.read_csv(ledger)
+    results = []
+    for index, row in df.iterrows():
+        results.append({"TransactionID": row["TransactionID"], "Status": fake_status(row["Amount"]),
+                        "AI_Decision": f"{row['Approver']} / {row['Amount']}"})
+    pd.DataFrame(results).to_csv(out, index=False)
+    return len(results)
+
+
+def run_stream(ledger, out, chunk_size):
+    from ingestion import IngestionAgent
+    from report_writer import ReportWriter
+    count = 0
+    with ReportWriter(out) as writer:
+        for chunk in IngestionAgent().iter_ledger(chunksize=chunk_size, path=ledger):
+            writer.write_rows([{"TransactionID": r.TransactionID, "Status": fake_status(r.Amount),
+                                "AI_Decision": f"{r.Approver} / {r.Amount}"}
+                               for r in chunk.itertuples(index=False)])
+            count += len(chunk)
+    return count
+
+
+def worker(mode, ledger, out, chunk_size):
+    start = time.perf_counter()
+    rows = run_baseline(ledger, out) if mode == "baseline" else run_stream(ledger, out, chunk_size)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+    print(f"{rows},{elapsed},{peak_kb}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--worker", choices=["baseline", "stream"])
+    parser.add_argument("--ledger")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.ledger, args.out, args.chunk_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = os.path.join(tmp, "ledger.csv")
+        print(f"[*] Generating {args.rows:,} ledger rows...")
+        make_ledger(ledger, args.rows)
+        print(f"\n{'MODE':<10} | {'ROWS/SEC':>12} | {'PEAK RSS (MB)':>14}")
+        print("-" * 42)
+        for mode in ("baseline", "stream"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", mode, "--ledger", ledger,
+                 "--out", os.path.join(tmp, f"report_{mode}.csv"), "--chunk-size", str(args.chunk_size)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            rows, elapsed, peak_kb = out.split(",")
+            print(f"{mode:<10} | {int(rows) / float(elapsed):>12,.0f} | {int(peak_kb) / 1024:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Three-way match benchmark: match_engine.three_way_match over a synthetic
+ledger and invoice set (no PDFs involved, this times the join + classification).
+
+    python benchmarks/bench_match_engine.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from match_engine import three_way_match  # noqa: E402
+
+
+def make_inputs(rows, mismatch_rate=0.05, missing_rate=0.02, orphan_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.char.add("TXN-", np.arange(1000, 1000 + rows).astype(str))
+    amounts = np.round(rng.uniform(10, 20000, rows), 2)
+    ledger = pd.DataFrame({"TransactionID": ids, "Amount": amounts})
+
+    invoice_amounts = amounts.copy()
+    roll = rng.random(rows)
+    mismatch = roll < mismatch_rate
+    invoice_amounts[mismatch] += np.round(rng.uniform(1, 500, int(mismatch.sum())), 2)
+    tolerated = (roll >= mismatch_rate) & (roll < mismatch_rate + 0.01)
+    invoice_amounts[tolerated] += 0.01
+    keep = rng.random(rows) >= missing_rate
+
+    n_orphans = int(rows * orphan_rate)
+    invoices = pd.DataFrame({
+        "TransactionID": np.concatenate([ids[keep], np.char.add("ORPHAN-", np.arange(n_orphans).astype(str))]),
+        "invoice_id": np.concatenate([np.char.replace(ids[keep], "TXN", "INV"),
+                                      np.char.add("INV-X", np.arange(n_orphans).astype(str))]),
+        "extracted_amount": np.concatenate([invoice_amounts[keep], rng.uniform(10, 100, n_orphans)]),
+    })
+    return ledger, invoices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ledger, invoices = make_inputs(args.rows)
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        match = three_way_match(ledger, invoices)
+        best = min(best, time.perf_counter() - start)
+    print(f"[*] {args.rows:,} ledger rows, {len(invoices):,} invoices: best of {args.repeat} = {best:.2f}s "
+          f"({args.rows / best:,.0f} rows/sec)")
+    print(f"[*] {match['Match_Status'].value_counts().to_dict()}")
+
+
+if __name__ == "__main__":
+    main()
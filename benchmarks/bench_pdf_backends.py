@@ -0,0 +1,110 @@
+"""
+Head-to-head benchmark of the invoice extraction backends in pdf_extract.py.
+
+    python benchmarks/bench_pdf_backends.py --invoices 50 --pages 8
+
+Generates invoice corpora with FPDF (same look as generate_data.py) in three
+layouts, then runs every backend over each corpus and reports throughput,
+peak Python memory and how often IngestionAgent.parse_invoice recovers the
+true total from the extracted text. The "template" backend reads only the
+field boxes it learned from the first invoice of each corpus.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fpdf import FPDF  # noqa: E402
+
+from ingestion import IngestionAgent  # noqa: E402
+from pdf_extract import BACKENDS, get_backend  # noqa: E402
+
+LAYOUTS = ("single-page", "total-last", "summary-first")
+
+
+def write_invoice(path, number, pages, layout, rng):
+    """One invoice; returns its true total."""
+    items = [(f"Line item {n}", round(rng.uniform(5, 900), 2)) for n in range(max(1, pages) * 20)]
+    total = round(sum(amount for _, amount in items), 2)
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(200, 10, txt="INVOICE - Benchmark Vendor Ltd", ln=1, align='C')
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"Invoice ID: INV-{number}", ln=1)
+    pdf.cell(200, 10, txt="Date: 2026-02-05", ln=1)
+    if layout == "summary-first":
+        pdf.cell(200, 10, txt=f"Total Amount: ${total:,.2f}", ln=1)
+    if layout != "single-page":
+        for n, (desc, amount) in enumerate(items):
+            if n and n % 20 == 0:
+                pdf.add_page()
+            pdf.cell(200, 10, txt=f"{desc} ........ ${amount:,.2f}", ln=1)
+    if layout != "summary-first":
+        pdf.cell(200, 10, txt=f"Total Amount: ${total:,.2f}", ln=1)
+    pdf.cell(200, 10, txt="Payment due within 30 days.", ln=1)
+    pdf.output(path)
+    return total
+
+
+def make_corpus(folder, invoices, pages, layout, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    corpus = []
+    for i in range(invoices):
+        path = os.path.join(folder, f"TXN-{1000 + i}.pdf")
+        corpus.append((path, write_invoice(path, 1000 + i, pages, layout, rng)))
+    return corpus
+
+
+def count_pages(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def run_backend(name, corpus):
+    backend = get_backend(name)
+    parser = IngestionAgent()
+    correct = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for path, total in corpus:
+        text = backend.extract(path)
+        if abs(parser.parse_invoice(text, os.path.basename(path))["extracted_amount"] - total) < 0.005:
+            correct += 1
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=30, help="invoices per corpus")
+    parser.add_argument("--pages", type=int, default=5, help="pages per multi-page invoice")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The template backend learns each corpus's layout from its first invoice, in a throwaway registry
+        os.environ["AUDIT_TEMPLATE_REGISTRY"] = os.path.join(tmp, "invoice_templates.json")
+        print(f"{'LAYOUT':<14} | {'BACKEND':<11} | {'PAGES/SEC':>10} | {'DOCS/SEC':>9} | {'PEAK MB':>8} | {'AMOUNT ACCURACY':>15}")
+        print("-" * 82)
+        for layout in LAYOUTS:
+            corpus = make_corpus(os.path.join(tmp, layout), args.invoices, args.pages, layout)
+            pages = sum(count_pages(path) for path, _ in corpus)
+            for name in args.backends:
+                elapsed, peak, correct = run_backend(name, corpus)
+                print(f"{layout:<14} | {name:<11} | {pages / elapsed:>10,.1f} | {len(corpus) / elapsed:>9,.1f} | "
+                      f"{peak / 2**20:>8.1f} | {correct / len(corpus):>14.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start benchmark of the cli.py subcommands, from `python -X importtime`.
+
+    python benchmarks/bench_startup.py --repeat 5 --output startup.jsonl
+
+For each subcommand a fresh interpreter runs `cli.load(<command>)`, i.e. all
+the imports the command needs before it does any work. Reported per command:
+process wall time, total import time (the sum over top-level imports in the
+-X importtime trace) and the heaviest top-level modules. "--help" is the
+bare CLI. Pass --output to append the results as JSON lines and compare
+runs over time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cli import COMMANDS  # noqa: E402
+
+BASELINE = "--help"
+
+
+def parse_importtime(stderr: str) -> dict:
+    """module -> cumulative microseconds, for the top-level imports of a -X importtime trace."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        if name.startswith(" ") and not name.startswith("  "):  # one space = top level
+            modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative)
+    return modules
+
+
+def measure(command: str) -> dict:
+    code = "import cli" if command == BASELINE else f"import cli; cli.load({command!r})"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    modules = parse_importtime(proc.stderr)
+    return {"wall_ms": wall * 1000, "import_ms": sum(modules.values()) / 1000, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per command (median is reported)")
+    parser.add_argument("--top", type=int, default=3, help="heaviest top-level imports to show")
+    parser.add_argument("--output", help="append the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    results = []
+    for command in [BASELINE] + list(COMMANDS):
+        runs = [measure(command) for _ in range(args.repeat)]
+        heaviest = sorted(runs[-1]["modules"].items(), key=lambda kv: -kv[1])[:args.top]
+        results.append({
+            "command": command,
+            "wall_ms": statistics.median(r["wall_ms"] for r in runs),
+            "import_ms": statistics.median(r["import_ms"] for r in runs),
+            "heaviest": {name: us / 1000 for name, us in heaviest},
+        })
+
+    print(f"\n{'COMMAND':<8} | {'WALL MS':>8} | {'IMPORT MS':>9} | HEAVIEST TOP-LEVEL IMPORTS (ms)")
+    print("-" * 90)
+    for r in results:
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in r["heaviest"].items())
+        print(f"{r['command']:<8} | {r['wall_ms']:>8.1f} | {r['import_ms']:>9.1f} | {heaviest}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(dict(r, python=sys.version.split()[0], ts=time.time())) + "\n")
+        print(f"[*] Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
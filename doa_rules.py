@@ -0,0 +1,139 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+# Amounts within this fraction of an approval limit are "borderline" and go to the LLM
+BORDERLINE_MARGIN = 0.01
+
+DOA_COMPLIANT = "COMPLIANT"
+DOA_VIOLATION = "VIOLATION"
+DOA_AMBIGUOUS = "AMBIGUOUS"
+
+# e.g. "1.2 Directors are authorized to approve expenses up to $5,000 USD."
+LIMIT_RULE = re.compile(
+    r"(?P<section>\d+\.\d+)\s+(?P<role>[A-Za-z][A-Za-z\- ]*?)\s*(?:\((?P<alias>[^)]+)\))?\s+"
+    r"(?:is|are)\s+authori[sz]ed\s+to\s+approve\s+[a-z ]*?up\s+to\s+\$(?P<limit>[\d,]+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+# e.g. "1.4 Any expense above $10,000 USD requires C-Level approval."
+ABOVE_RULE = re.compile(
+    r"(?P<section>\d+\.\d+)\s+Any\s+[a-z ]*?above\s+\$(?P<limit>[\d,]+(?:\.\d+)?)\s*(?:USD\s+)?"
+    r"requires\s+(?P<role>[A-Za-z][A-Za-z\-]*)\s+approval",
+    re.IGNORECASE,
+)
+
+# Job titles that the policy text does not spell out but which map onto its roles
+TITLE_ALIASES = {
+    "vice president": "vp",
+    "vp": "vice president",
+    "ceo": "c-level",
+    "cfo": "c-level",
+    "coo": "c-level",
+    "cto": "c-level",
+    "cio": "c-level",
+    "chief": "c-level",
+}
+
+
+def normalize_role(name: str) -> str:
+    """'Vice Presidents' -> 'vice president', 'VPs' -> 'vp', 'Managers' -> 'manager'."""
+    words = name.strip().lower().split()
+    if words and len(words[-1]) > 2 and words[-1].endswith("s"):
+        words[-1] = words[-1][:-1]
+    return " ".join(words)
+
+
+@dataclass
+class DoARules:
+    """Approval limits compiled from Section 1 (Delegation of Authority) of the policy."""
+    limits: Dict[str, float] = field(default_factory=dict)    # canonical role -> max approvable amount
+    sections: Dict[str, str] = field(default_factory=dict)    # canonical role -> policy section
+    aliases: Dict[str, str] = field(default_factory=dict)     # any spelling -> canonical role
+
+    def __bool__(self):
+        return bool(self.limits)
+
+    def role_pattern(self) -> str:
+        """Regex alternation of every known role spelling (longest first)."""
+        names = sorted(self.aliases, key=len, reverse=True)
+        return r"\b(" + "|".join(re.escape(n) for n in names) + r")s?\b"
+
+
+def compile_doa_rules(policy_text: str) -> DoARules:
+    """Pulls the numeric approval limits out of the text returned by PolicyAgent.ingest_policy."""
+    rules = DoARules()
+    text = " ".join(policy_text.split())  # PDF line breaks can fall anywhere
+
+    for m in LIMIT_RULE.finditer(text):
+        role = normalize_role(m.group("role"))
+        rules.limits[role] = float(m.group("limit").replace(",", ""))
+        rules.sections[role] = m.group("section")
+        rules.aliases[role] = role
+        if m.group("alias"):
+            rules.aliases[normalize_role(m.group("alias"))] = role
+
+    for m in ABOVE_RULE.finditer(text):
+        role = normalize_role(m.group("role"))
+        rules.limits[role] = np.inf
+        rules.sections[role] = m.group("section")
+        rules.aliases[role] = role
+
+    for alias, role in TITLE_ALIASES.items():
+        if role in rules.aliases:
+            rules.aliases.setdefault(alias, rules.aliases[role])
+
+    return rules
+
+
+def prescreen(df: pd.DataFrame, rules: DoARules, margin: float = BORDERLINE_MARGIN) -> pd.DataFrame:
+    """
+    Evaluates every ledger row against the DoA limits in one vectorized pass.
+    Returns a frame aligned with `df` holding DoA_Role, DoA_Limit, DoA_Section
+    and DoA_Status (COMPLIANT / VIOLATION / AMBIGUOUS).
+    Unknown roles, unparsable amounts and amounts near a limit are AMBIGUOUS.
+    """
+    out = pd.DataFrame(index=df.index)
+    if not rules or df.empty:
+        out["DoA_Role"] = None
+        out["DoA_Limit"] = np.nan
+        out["DoA_Section"] = None
+        out["DoA_Status"] = DOA_AMBIGUOUS
+        return out
+
+    # A ledger has few distinct approvers: parse each name once, then broadcast.
+    # A missing approver has code -1 (no role), and a chunk may have no approver at all
+    codes, approvers = pd.factorize(df["Approver"])
+    spelled = pd.Series(approvers.astype(str).str.lower()).str.extract(rules.role_pattern(), expand=False)
+    unique_roles = spelled.map(rules.aliases).to_numpy(dtype=object)
+    roles = np.full(len(codes), None, dtype=object)
+    named = codes >= 0
+    roles[named] = unique_roles[codes[named]]
+
+    limits = pd.Series(roles).map(rules.limits).to_numpy(dtype=float)
+    amounts = pd.to_numeric(df["Amount"], errors="coerce").to_numpy(dtype=float)
+
+    known = ~np.isnan(limits) & ~np.isnan(amounts)
+    band = np.where(np.isfinite(limits), limits * margin, 0.0)
+    with np.errstate(invalid="ignore"):
+        violation = known & (amounts > limits + band)
+        compliant = known & (amounts < limits - band)
+
+    out["DoA_Role"] = roles
+    out["DoA_Limit"] = limits
+    out["DoA_Section"] = pd.Series(roles, index=df.index).map(rules.sections)
+    out["DoA_Status"] = np.select([violation, compliant], [DOA_VIOLATION, DOA_COMPLIANT], DOA_AMBIGUOUS)
+    return out
+
+
+def doa_decision(approver: str, amount: float, screen_row) -> str:
+    """Human-readable verdict for a row that prescreen() resolved (same style as the LLM answers)."""
+    limit = screen_row.DoA_Limit
+    limit_text = f"${limit:,.2f}" if np.isfinite(limit) else "any amount"
+    head = f"Section {screen_row.DoA_Section} - {approver} ({screen_row.DoA_Role}) may approve up to {limit_text}"
+    if screen_row.DoA_Status == DOA_VIOLATION:
+        return f"{DOA_VIOLATION}: {head}, but the amount is ${float(amount):,.2f}."
+    return f"{DOA_COMPLIANT}: {head}; the amount of ${float(amount):,.2f} is within the limit."
@@ -0,0 +1,237 @@
+import argparse
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ingestion import IngestionAgent, INGEST_WORKERS
+from match_engine import to_cents, invoice_frame, TOLERANCE_CENTS
+
+# --- CONFIGURATION ---
+DUPLICATE_REPORT_FILE = os.path.join("data", "duplicate_report.csv")
+# Near-duplicates: same (normalized) vendor, amounts within the rounding tolerance, dates this close
+DATE_TOLERANCE_DAYS = int(os.environ.get("AUDIT_DUP_DATE_DAYS", 7))
+AMOUNT_TOLERANCE_CENTS = int(os.environ.get("AUDIT_DUP_AMOUNT_CENTS", TOLERANCE_CENTS))
+# Neighbours compared per row in each sorted pass (sorted-neighbourhood window)
+WINDOW = int(os.environ.get("AUDIT_DUP_WINDOW", 8))
+MAX_LISTED = 5  # other cluster members named in a finding
+
+DUPLICATE_INVOICE = "DUPLICATE_INVOICE"  # the same invoice number behind two ledger rows
+EXACT_DUPLICATE = "EXACT_DUPLICATE"      # same vendor, amount, date and description
+NEAR_DUPLICATE = "NEAR_DUPLICATE"        # same vendor, ~same amount, a few days apart
+# Findings that are reported as violations on their own; near-duplicates are leads to review
+DUPLICATE_FAILURES = (DUPLICATE_INVOICE, EXACT_DUPLICATE)
+
+# Only these ledger columns are read for the scan
+LEDGER_COLUMNS = ["TransactionID", "Date", "Vendor", "Amount", "Description"]
+DUPLICATE_COLUMNS = ["Duplicate_Cluster", "Duplicate_Kind", "Cluster_Size", "TransactionID", "Vendor",
+                     "Amount", "Date", "Invoice_ID", "Duplicate_Of"]
+
+LEGAL_SUFFIXES = {"inc", "incorporated", "ltd", "limited", "llc", "llp", "plc", "co", "corp",
+                  "corporation", "company", "gmbh", "sa", "ag", "bv", "pvt"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def missing_columns(columns) -> List[str]:
+    """LEDGER_COLUMNS a ledger lacks (the scan is skipped without them)."""
+    present = set(columns)
+    return [c for c in LEDGER_COLUMNS if c not in present]
+
+
+def normalize_vendor(name) -> str:
+    """'Office Supplies Co.' and 'OFFICE SUPPLIES' are the same payee."""
+    tokens = _NON_ALNUM.sub(" ", str(name).lower().replace("&", " and ")).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def vendor_codes(values) -> np.ndarray:
+    """Integer code per row for the normalized vendor (-1 = blank); each distinct spelling is normalized once."""
+    series = pd.Series(values, dtype=object)
+    codes, spellings = pd.factorize(series)
+    if not len(spellings):
+        return np.full(len(series), -1, dtype=np.int64)
+    normalized = pd.Series([normalize_vendor(s) for s in spellings], dtype=object)
+    norm_codes, _ = pd.factorize(normalized.where(normalized != ""))
+    return np.where(codes >= 0, norm_codes[np.maximum(codes, 0)], -1)
+
+
+def to_days(values) -> tuple:
+    """(int64 day numbers, valid mask) for a column of dates."""
+    dates = pd.to_datetime(pd.Series(values), errors="coerce")
+    valid = dates.notna().to_numpy()
+    days = np.zeros(len(dates), dtype=np.int64)
+    days[valid] = dates[valid].to_numpy().astype("datetime64[D]").astype(np.int64)
+    return days, valid
+
+
+def group_links(keys: pd.DataFrame, eligible: np.ndarray) -> tuple:
+    """
+    Hash-index pass: (a, b) edges joining every row to the first row with the same key.
+    Rows outside `eligible` never match.
+    """
+    group = keys.groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+    group = np.where(eligible, group, -1)
+    rows = np.flatnonzero(group >= 0)
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    first = np.full(group.max() + 1, -1, dtype=np.int64)
+    # Reversed assignment leaves the first occurrence of each group in place
+    first[group[rows][::-1]] = rows[::-1]
+    head = first[group[rows]]
+    linked = head != rows
+    return rows[linked], head[linked]
+
+
+def window_links(order, vendor, cents, days, window, amount_tolerance, date_tolerance) -> tuple:
+    """
+    Sort-and-window pass: compares each row of `order` with its next `window`
+    neighbours, so the cost is O(n * window) instead of O(n^2).
+    """
+    a_parts, b_parts = [], []
+    for k in range(1, min(window, len(order) - 1) + 1):
+        i, j = order[:-k], order[k:]
+        close = ((vendor[i] == vendor[j])
+                 & (np.abs(cents[i] - cents[j]) <= amount_tolerance)
+                 & (np.abs(days[i] - days[j]) <= date_tolerance))
+        a_parts.append(i[close])
+        b_parts.append(j[close])
+    if not a_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(a_parts), np.concatenate(b_parts)
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Component label (smallest member position) of each of `n` rows, given the edges a[k] - b[k]."""
+    labels = np.arange(n)
+    while len(a):
+        low = np.minimum(labels[a], labels[b])
+        np.minimum.at(labels, labels[a], low)
+        np.minimum.at(labels, labels[b], low)
+        # Pointer jumping until every row points at its root
+        while True:
+            parent = labels[labels]
+            if np.array_equal(parent, labels):
+                break
+            labels = parent
+        if np.array_equal(labels[a], labels[b]):
+            break
+    return labels
+
+
+def find_duplicates(ledger: pd.DataFrame, invoices=None, date_tolerance_days: int = DATE_TOLERANCE_DAYS,
+                    amount_tolerance_cents: int = AMOUNT_TOLERANCE_CENTS, window: int = WINDOW) -> pd.DataFrame:
+    """
+    Duplicate payment clusters of a ledger (LEDGER_COLUMNS), optionally with the
+    invoice numbers read by IngestionAgent.parse_invoice (same inputs as
+    match_engine.three_way_match). Returns DUPLICATE_COLUMNS for the flagged rows
+    only, grouped by cluster; every pass is a hash index or a sort, never a pairwise scan.
+    """
+    n = len(ledger)
+    vendor = vendor_codes(ledger["Vendor"].to_numpy())
+    cents, amount_valid = to_cents(ledger["Amount"])
+    days, date_valid = to_days(ledger["Date"])
+    eligible = (vendor >= 0) & amount_valid & date_valid
+    description = ledger["Description"].fillna("").astype(str).str.lower().str.split().str.join(" ")
+
+    # 1. Exact duplicates: hash index on vendor + amount + date + description
+    exact_a, exact_b = group_links(
+        pd.DataFrame({"v": vendor, "c": cents, "d": days, "t": description.to_numpy()}), eligible)
+
+    # 2. One invoice number behind several ledger rows (the same bill paid twice)
+    invoice_ids = np.full(n, None, dtype=object)
+    if invoices is not None:
+        inv = invoice_frame(invoices)
+        inv = inv.assign(TransactionID=inv["TransactionID"].astype(str)).drop_duplicates("TransactionID", keep="last")
+        pos = pd.Index(inv["TransactionID"]).get_indexer(ledger["TransactionID"].astype(str))
+        numbers = inv["invoice_id"].astype(object).to_numpy()
+        invoice_ids[pos >= 0] = numbers[pos[pos >= 0]]
+    invoice_key = pd.Series(invoice_ids).fillna("").astype(str).str.strip().str.upper()
+    has_number = ~invoice_key.isin(("", "UNKNOWN", "NONE")).to_numpy()
+    inv_a, inv_b = group_links(pd.DataFrame({"i": invoice_key.to_numpy()}), has_number)
+
+    # 3. Near-duplicates: two sorted-neighbourhood passes, by amount then by date within each vendor
+    rows = np.flatnonzero(eligible)
+    near = [window_links(rows[np.lexsort(keys)], vendor, cents, days, window,
+                         amount_tolerance_cents, date_tolerance_days)
+            for keys in ((days[rows], cents[rows], vendor[rows]), (cents[rows], days[rows], vendor[rows]))]
+
+    a = np.concatenate([exact_a, inv_a] + [p[0] for p in near])
+    b = np.concatenate([exact_b, inv_b] + [p[1] for p in near])
+    if not len(a):
+        return pd.DataFrame(columns=DUPLICATE_COLUMNS)
+    labels = connected_components(n, a, b)
+
+    # Strongest finding per row: shared invoice number > exact copy > near copy
+    kind = np.full(n, "", dtype=object)
+    kind[np.concatenate([p[0] for p in near] + [p[1] for p in near])] = NEAR_DUPLICATE
+    kind[np.concatenate([exact_a, exact_b])] = EXACT_DUPLICATE
+    kind[np.concatenate([inv_a, inv_b])] = DUPLICATE_INVOICE
+    flagged = np.flatnonzero(kind != "")
+
+    cluster, _ = pd.factorize(labels[flagged])  # numbered in ledger order
+    out = pd.DataFrame({
+        "Duplicate_Cluster": [f"DUP-{c + 1:05d}" for c in cluster],
+        "Duplicate_Kind": kind[flagged],
+        "TransactionID": ledger["TransactionID"].to_numpy()[flagged],
+        "Vendor": ledger["Vendor"].to_numpy()[flagged],
+        "Amount": np.where(amount_valid[flagged], cents[flagged] / 100, np.nan),
+        "Date": ledger["Date"].to_numpy()[flagged],
+        "Invoice_ID": invoice_ids[flagged],
+    })
+    members = out.groupby("Duplicate_Cluster", sort=False)["TransactionID"].agg(list)
+    out["Cluster_Size"] = out["Duplicate_Cluster"].map(members.str.len())
+    out["Duplicate_Of"] = [
+        ", ".join([str(m) for m in members[c] if m != txn][:MAX_LISTED])
+        for c, txn in zip(out["Duplicate_Cluster"], out["TransactionID"])
+    ]
+    return out.sort_values("Duplicate_Cluster", kind="stable")[DUPLICATE_COLUMNS].reset_index(drop=True)
+
+
+def duplicate_decision(dup_row) -> str:
+    """Human-readable finding for a find_duplicates row (same style as the LLM answers)."""
+    cluster = f"cluster {dup_row.Duplicate_Cluster}" + (f" with {dup_row.Duplicate_Of}" if dup_row.Duplicate_Of else "")
+    if dup_row.Duplicate_Kind == DUPLICATE_INVOICE:
+        return f"VIOLATION: duplicate payment - invoice {dup_row.Invoice_ID} is booked on more than one ledger entry ({cluster})."
+    if dup_row.Duplicate_Kind == EXACT_DUPLICATE:
+        return f"VIOLATION: duplicate payment - same vendor, amount, date and description as another ledger entry ({cluster})."
+    return (f"REVIEW: possible duplicate payment - same vendor and amount within {DATE_TOLERANCE_DAYS} days "
+            f"of another ledger entry ({cluster}).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Duplicate and near-duplicate payment scan of the General Ledger.")
+    parser.add_argument("--ledger", default=os.path.join("data", "general_ledger.csv"))
+    parser.add_argument("--no-invoices", action="store_true", help="skip the invoice-number check (no PDF parsing)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="processes parsing invoices")
+    parser.add_argument("--date-days", type=int, default=DATE_TOLERANCE_DAYS)
+    parser.add_argument("--amount-cents", type=int, default=AMOUNT_TOLERANCE_CENTS)
+    parser.add_argument("--out", default=DUPLICATE_REPORT_FILE)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.ledger):
+        print(f"❌ Ledger not found: {args.ledger}")
+        return
+    missing = missing_columns(pd.read_csv(args.ledger, nrows=0).columns)
+    if missing:
+        print(f"❌ The ledger has no {', '.join(missing)} column(s); the duplicate scan needs {', '.join(LEDGER_COLUMNS)}.")
+        return
+    ledger = pd.read_csv(args.ledger, usecols=LEDGER_COLUMNS)
+    invoices: Optional[list] = None
+    if not args.no_invoices:
+        invoices = IngestionAgent().run_pipeline(workers=args.workers) or []
+
+    dups = find_duplicates(ledger, invoices, date_tolerance_days=args.date_days,
+                           amount_tolerance_cents=args.amount_cents)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    dups.to_csv(args.out, index=False)
+    print(f"\n[*] {len(ledger):,} ledger rows: {dups['Duplicate_Cluster'].nunique()} duplicate clusters "
+          f"{dups['Duplicate_Kind'].value_counts().to_dict()}")
+    print(f"[SUCCESS] Duplicate report ({len(dups)} rows) saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from doa_rules import normalize_role, TITLE_ALIASES
+
+# Approval limits of the DoA policy written by create_policy.py (what the oracle "knows")
+ORACLE_LIMITS = {"manager": 1000.00, "director": 5000.00, "vp": 10000.00, "vice president": 10000.00}
+ORACLE_SECTIONS = {"manager": "1.1", "director": "1.2", "vp": "1.3", "vice president": "1.3"}
+
+APPROVER_PATTERN = re.compile(r"Approver:?\s+(?P<approver>.+?),?\s+(?:-\s+)?Amount:?\s+\$(?P<amount>[\d,]+(?:\.\d+)?)")
+TOTAL_PATTERN = re.compile(r"Total Amount:\s*\$(?P<total>[\d,]+\.\d{2})")
+BATCH_ROW_PATTERN = re.compile(r"^[ \t]*- TransactionID: (?P<id>\S+)\n(?P<body>.*?)(?=^[ \t]*- TransactionID: |\Z)", re.MULTILINE | re.DOTALL)
+
+
+def default_responder(prompt: str) -> str:
+    """Very small stand-in for the auditor: always compliant."""
+    return "COMPLIANT: Transaction is within policy (offline fake model).\nCONFIDENCE: 0.9"
+
+
+def oracle_verdict(text: str):
+    """(status, section, reason) for one transaction, decided with the known policy limits."""
+    match = APPROVER_PATTERN.search(text)
+    if not match:
+        return "COMPLIANT", "", "Nothing to check."
+    amount = float(match.group("amount").replace(",", ""))
+    role = normalize_role(match.group("approver").split()[-1])
+    role = TITLE_ALIASES.get(role, role)
+    limit = ORACLE_LIMITS.get(role)
+    if limit is not None and amount > limit:
+        return "VIOLATION", ORACLE_SECTIONS[role], f"{role} limit is ${limit:,.2f}, amount is ${amount:,.2f}."
+    if "[MISSING INVOICE FILE]" in text:
+        return "VIOLATION", "3.1", "No invoice on file."
+    total = TOTAL_PATTERN.search(text)
+    if total and abs(float(total.group("total").replace(",", "")) - amount) > 0.01:
+        return "VIOLATION", "3.1", f"Invoice total ${total.group('total')} does not match ledger ${amount:,.2f}."
+    return "COMPLIANT", "", "Within the approver's limit and the invoice matches."
+
+
+def oracle_responder(prompt: str) -> str:
+    """
+    Answers like a perfect auditor for data from generate_data.py (single-row
+    and batch prompts), so benchmarks can measure detection accuracy offline.
+    """
+    transactions = prompt.split("TRANSACTIONS TO AUDIT", 1)
+    if len(transactions) == 2:
+        answers = []
+        for m in BATCH_ROW_PATTERN.finditer(transactions[1].split("Audit EVERY transaction", 1)[0]):
+            status, section, reason = oracle_verdict(m.group("body"))
+            answers.append({"TransactionID": m.group("id"), "status": status, "section": section,
+                            "reason": reason, "confidence": 0.95})
+        return json.dumps(answers)
+    status, section, reason = oracle_verdict(prompt.split("TRANSACTION TO AUDIT", 1)[-1])
+    cited = f" (Section {section})" if section else ""
+    return f"{status}{cited}: {reason}\nCONFIDENCE: 0.95"
+
+
+class FakeAuditLLM(BaseChatModel):
+    """
+    Offline chat model for exercising the audit pipeline without an API key.
+    Drop it into PolicyAgent(llm=FakeAuditLLM(latency=0.2)) to simulate network latency;
+    `error_rate` makes that share of calls fail with a 429 (reproducible with `seed`).
+    """
+
+    latency: float = 0.0
+    responder: Callable[[str], str] = default_responder
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+    calls: int = 0
+    _rng: Optional[random.Random] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-audit"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        if self.error_rate:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            if self._rng.random() < self.error_rate:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED: simulated quota error (fake model)")
+        prompt = "\n".join(str(m.content) for m in messages)
+        message = AIMessage(content=self.responder(prompt))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
@@ -1,4 +1,8 @@
+import argparse
+import json
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from fpdf import FPDF
 from datetime import datetime, timedelta
@@ -7,12 +11,23 @@ from datetime import datetime, timedelta
 DATA_DIR = "data"
 LEDGER_FILE = os.path.join(DATA_DIR, "general_ledger.csv")
 INVOICE_DIR = os.path.join(DATA_DIR, "invoices")
+# Invoices the last run wrote (in the data dir). Only these are ever deleted: a PDF someone
+# put into the invoice folder by hand stays, even if it is named like a generated one
+GENERATED_MANIFEST = "generated_invoices.json"
 
-# Ensure directories exist
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
-if not os.path.exists(INVOICE_DIR):
-    os.makedirs(INVOICE_DIR)
+# Approval limits of the DoA policy written by create_policy.py (None = no limit)
+APPROVERS = {
+    "Charlie Manager": 1000.00,
+    "Bob Director": 5000.00,
+    "Alice VP": 10000.00,
+    "Dana CFO": None,
+}
+VENDORS = {
+    "TechCorp Solutions": ["Server Maintenance", "Laptop Refresh", "Cloud Hosting"],
+    "Global Consultants": ["Strategy Audit", "Market Study", "Process Review"],
+    "Office Supplies Co": ["Paper Supplies", "Printer Toner", "Desk Chairs"],
+    "Rapid Logistics": ["Freight Charges", "Courier Services"],
+}
 
 # --- MOCK DATA ---
 transactions = [
@@ -24,63 +39,210 @@ transactions = [
     {"vendor": "Office Supplies Co", "amount": 200.00, "approver": "Charlie Manager", "desc": "Paper Supplies"},
 ]
 
-ledger_data = []
-
-print("[*] Generating General Ledger & Invoices...")
-
-for i, tx in enumerate(transactions):
-    tx_id = f"TXN-{1000+i}"
-    date_str = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-    
-    # 1. Add to Ledger Data
-    ledger_entry = {
-        "TransactionID": tx_id,
-        "Date": date_str,
-        "Vendor": tx["vendor"],
-        "Amount": tx["amount"],
-        "Currency": "USD",
-        "Approver": tx["approver"],
-        "Description": tx["desc"]
+
+def demo_transactions():
+    """The three hand-written cases above, with their known outcome."""
+    today = datetime.now()
+    rows = []
+    for i, tx in enumerate(transactions):
+        rows.append(dict(
+            tx,
+            date=(today - timedelta(days=i)).strftime("%Y-%m-%d"),
+            # TRICK: For Case 3, we write a DIFFERENT amount in the PDF to test the AI
+            invoice_amount=250.00 if i == 2 else tx["amount"],
+            doa_violation=i == 1,
+            missing_invoice=False,
+        ))
+    return rows
+
+
+def random_transaction(i, doa_rate, mismatch_rate, missing_rate, seed, today):
+    """
+    One synthetic row. Each row has its own RNG (seed, i), so the corpus is the
+    same whatever the number of workers.
+    """
+    rng = random.Random(f"{seed}-{i}")
+    doa_violation = rng.random() < doa_rate
+    if doa_violation:
+        approver = rng.choice([a for a, limit in APPROVERS.items() if limit is not None])
+        limit = APPROVERS[approver]
+        amount = round(rng.uniform(limit * 1.05, limit * 3), 2)
+    else:
+        approver = rng.choice(list(APPROVERS))
+        limit = APPROVERS[approver] or 50000.00
+        amount = round(rng.uniform(20, limit * 0.98), 2)
+
+    roll = rng.random()
+    missing_invoice = roll < missing_rate
+    invoice_amount = amount
+    if not missing_invoice and roll < missing_rate + mismatch_rate:
+        # Off by 5-20% in either direction, never by less than a dollar
+        delta = max(1.00, round(amount * rng.uniform(0.05, 0.20), 2))
+        invoice_amount = round(amount + rng.choice((-1, 1)) * delta, 2)
+        if invoice_amount <= 0:
+            invoice_amount = round(amount + delta, 2)
+
+    vendor = rng.choice(list(VENDORS))
+    return {
+        "vendor": vendor,
+        "amount": amount,
+        "approver": approver,
+        "desc": rng.choice(VENDORS[vendor]),
+        "date": (today - timedelta(days=i % 365)).strftime("%Y-%m-%d"),
+        "invoice_amount": invoice_amount,
+        "doa_violation": doa_violation,
+        "missing_invoice": missing_invoice,
     }
-    ledger_data.append(ledger_entry)
 
-    # 2. Generate PDF Invoice
+
+def write_invoice(pdf_path, invoice_number, tx):
+    """Generates one PDF Invoice (same layout the auditors were shown from day one)."""
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
-    
+
     # Header
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(200, 10, txt=f"INVOICE - {tx['vendor']}", ln=1, align='C')
     pdf.ln(10)
-    
+
     # Details
     pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"Invoice ID: INV-{1000+i}", ln=1)
-    pdf.cell(200, 10, txt=f"Date: {date_str}", ln=1)
+    pdf.cell(200, 10, txt=f"Invoice ID: INV-{invoice_number}", ln=1)
+    pdf.cell(200, 10, txt=f"Date: {tx['date']}", ln=1)
     pdf.cell(200, 10, txt="Bill To: Your Company Inc.", ln=1)
     pdf.ln(10)
-    
+
     # Line Items
-    # TRICK: For Case 3, we write a DIFFERENT amount in the PDF to test the AI
-    invoice_amount = tx["amount"]
-    if i == 2: # The mismatch case
-        invoice_amount = 250.00 
-        
     pdf.cell(200, 10, txt=f"Description: {tx['desc']}", ln=1)
-    pdf.cell(200, 10, txt=f"Total Amount: ${invoice_amount:.2f}", ln=1)
-    
+    pdf.cell(200, 10, txt=f"Total Amount: ${tx['invoice_amount']:.2f}", ln=1)
+
     # Footer
     pdf.ln(20)
     pdf.set_font("Arial", 'I', 10)
     pdf.cell(200, 10, txt="Payment due within 30 days.", ln=1)
-    
-    # Save PDF
-    pdf_path = os.path.join(INVOICE_DIR, f"{tx_id}.pdf")
+
     pdf.output(pdf_path)
-    print(f"    -> Created Invoice: {pdf_path}")
 
-# Save Ledger CSV
-df = pd.DataFrame(ledger_data)
-df.to_csv(LEDGER_FILE, index=False)
-print(f"[SUCCESS] General Ledger saved to {LEDGER_FILE}")
\ No newline at end of file
+
+def _write_invoices(jobs):
+    """Worker: writes a slice of invoices, returns how many."""
+    for pdf_path, invoice_number, tx in jobs:
+        write_invoice(pdf_path, invoice_number, tx)
+    return len(jobs)
+
+
+def load_manifest(path):
+    """File names of the invoices the last run generated (empty if it left no manifest)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+
+def generate(rows, data_dir=DATA_DIR, doa_rate=0.1, mismatch_rate=0.1, missing_rate=0.02,
+             workers=1, seed=0, verbose=True):
+    """
+    Writes the ledger, the invoice PDFs and a ground-truth CSV under `data_dir`.
+    rows=None writes the three demo transactions.
+    Returns the ground-truth DataFrame.
+    """
+    invoice_dir = os.path.join(data_dir, "invoices")
+    os.makedirs(invoice_dir, exist_ok=True)
+
+    if rows is None:
+        txs = demo_transactions()
+    else:
+        today = datetime.now()
+        txs = [random_transaction(i, doa_rate, mismatch_rate, missing_rate, seed, today) for i in range(rows)]
+
+    ledger_data = []
+    truth = []
+    jobs = []
+    for i, tx in enumerate(txs):
+        tx_id = f"TXN-{1000+i}"
+        # 1. Add to Ledger Data
+        ledger_data.append({
+            "TransactionID": tx_id,
+            "Date": tx["date"],
+            "Vendor": tx["vendor"],
+            "Amount": tx["amount"],
+            "Currency": "USD",
+            "Approver": tx["approver"],
+            "Description": tx["desc"]
+        })
+
+        mismatch = not tx["missing_invoice"] and tx["invoice_amount"] != tx["amount"]
+        truth.append({
+            "TransactionID": tx_id,
+            "InvoiceAmount": None if tx["missing_invoice"] else tx["invoice_amount"],
+            "DoAViolation": tx["doa_violation"],
+            "AmountMismatch": mismatch,
+            "MissingInvoice": tx["missing_invoice"],
+            "Expected": "FLAG" if tx["doa_violation"] or mismatch or tx["missing_invoice"] else "PASS",
+        })
+
+        # 2. Queue the PDF Invoice
+        if tx["missing_invoice"]:
+            continue
+        jobs.append((os.path.join(invoice_dir, f"{tx_id}.pdf"), 1000 + i, tx))
+
+    # Invoices an earlier run generated but this one does not (a larger corpus, or a row whose
+    # invoice is now missing) would otherwise be read by the invoice store and the duplicate detector
+    manifest_path = os.path.join(data_dir, GENERATED_MANIFEST)
+    written = sorted(os.path.basename(pdf_path) for pdf_path, _, _ in jobs)
+    stale = [f for f in sorted(load_manifest(manifest_path) - set(written))
+             if os.path.exists(os.path.join(invoice_dir, f))]
+    for f in stale:
+        os.remove(os.path.join(invoice_dir, f))
+    if verbose and stale:
+        print(f"[*] Removed {len(stale)} invoices generated by an earlier run")
+
+    if verbose:
+        print(f"[*] Generating General Ledger & {len(jobs)} Invoices ({workers} workers)...")
+    if workers > 1 and len(jobs) > 1:
+        step = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_write_invoices, [jobs[i:i + step] for i in range(0, len(jobs), step)]))
+    else:
+        for pdf_path, invoice_number, tx in jobs:
+            write_invoice(pdf_path, invoice_number, tx)
+            if verbose and rows is None:
+                print(f"    -> Created Invoice: {pdf_path}")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(written, f)
+
+    # Save Ledger CSV
+    ledger_file = os.path.join(data_dir, "general_ledger.csv")
+    pd.DataFrame(ledger_data).to_csv(ledger_file, index=False)
+    truth_df = pd.DataFrame(truth)
+    truth_df.to_csv(os.path.join(data_dir, "ground_truth.csv"), index=False)
+    if verbose:
+        print(f"[SUCCESS] General Ledger saved to {ledger_file}")
+    return truth_df
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic General Ledger with matching PDF invoices. "
+                    "Without --rows the three demo transactions are written.")
+    parser.add_argument("--rows", type=int, default=None, help="number of random ledger rows")
+    parser.add_argument("--doa-rate", type=float, default=0.1, help="share of rows above the approver's limit")
+    parser.add_argument("--mismatch-rate", type=float, default=0.1, help="share of invoices with a different amount")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="share of rows without an invoice PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes writing PDFs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    generate(args.rows, data_dir=args.data_dir, doa_rate=args.doa_rate, mismatch_rate=args.mismatch_rate,
+             missing_rate=args.missing_rate, workers=args.workers, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,85 @@
+import argparse
 import os
-import pandas as pd
-import pdfplumber
 import re
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+from pdf_extract import default_backend
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where the ledger is read: the invoice patterns and PDF parsing do not need it
 
 # --- CONFIGURATION ---
 DATA_DIR = "data"
 LEDGER_FILE = os.path.join(DATA_DIR, "general_ledger.csv")
 INVOICE_DIR = os.path.join(DATA_DIR, "invoices")
 
+# PDF library used for invoice text (pypdf | pdfplumber | fast-total | template), see pdf_extract.py.
+# Created on first use: the template backend imports the invoice patterns from this module
+_pdf_backend = None
+
+# Parallel ingest (PDF text extraction is CPU-bound). 1 = serial.
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 1))
+INGEST_FILE_TIMEOUT = float(os.environ.get("INGEST_FILE_TIMEOUT", 60))
+
+# Rows per chunk when streaming the ledger (peak memory is bounded by this, not the file size)
+LEDGER_CHUNK_SIZE = int(os.environ.get("LEDGER_CHUNK_SIZE", 50_000))
+
+# Invoice field patterns (compiled once, used for every invoice)
+INVOICE_ID_PATTERN = re.compile(r"Invoice ID:\s*(INV-\d+)")
+TOTAL_PATTERN = re.compile(r"Total Amount:\s*\$([\d,]+\.\d{2})")
+DATE_PATTERN = re.compile(r"\bDate:\s*(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})")
+VENDOR_PATTERN = re.compile(r"^\s*INVOICE\s*[-:]\s*(\S[^\n]*?)\s*$", re.MULTILINE)
+DESCRIPTION_PATTERN = re.compile(r"^\s*Description:\s*(\S[^\n]*?)\s*$", re.MULTILINE)
+# "Line item 3 ........ $120.00"
+# (not anchored to line ends: page joins can put two items on one line)
+LINE_ITEM_PATTERN = re.compile(r"(\S[^\n$]*?)\s*\.{2,}\s*\$([\d,]+\.\d{2})")
+
+# How much each field contributes to the extraction confidence (sums to 1)
+FIELD_WEIGHTS = {"total": 0.4, "invoice_id": 0.25, "vendor": 0.2, "date": 0.15}
+
+def pdf_backend():
+    """The INGEST_PDF_BACKEND backend (one per process, so a template registry is loaded once)."""
+    global _pdf_backend
+    if _pdf_backend is None:
+        _pdf_backend = default_backend("INGEST_PDF_BACKEND", "pdfplumber")
+    return _pdf_backend
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Raises TimeoutError if the block runs longer than `seconds` (POSIX only, no-op elsewhere)."""
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def _on_timeout(signum, frame):
+        raise TimeoutError(f"timed out after {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, _on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _process_invoice_worker(args):
+    """Runs in a worker process: extract + parse one invoice under a per-file time limit."""
+    path, timeout = args
+    agent = IngestionAgent()
+    try:
+        with _time_limit(timeout):
+            return agent.process_invoice(path)
+    except TimeoutError as e:
+        # Same shape as an unreadable PDF so one bad file can't sink the whole batch
+        print(f"[!] Timed out reading PDF {path}: {e}")
+        f = os.path.basename(path)
+        structured_data = agent.parse_invoice("", f)
+        structured_data["linked_txn_id"] = f.replace(".pdf", "")
+        return structured_data
+
 class IngestionAgent:
     """
     The 'Eyes' of the Audit System. 
@@ -20,8 +90,9 @@ class IngestionAgent:
         self.ledger_df = None
         self.invoices = {} # Dictionary to hold invoice data by TransactionID
 
-    def load_ledger(self) -> pd.DataFrame:
+    def load_ledger(self) -> "pd.DataFrame":
         """Loads the General Ledger CSV and ensures types are strict."""
+        import pandas as pd
         print(f"[*] Loading Ledger from {LEDGER_FILE}...")
         try:
             self.ledger_df = pd.read_csv(LEDGER_FILE)
@@ -33,14 +104,28 @@ class IngestionAgent:
             print(f"[!] CRITICAL: Ledger file not found at {LEDGER_FILE}")
             return pd.DataFrame()
 
+    def iter_ledger(self, chunksize: int = LEDGER_CHUNK_SIZE, path: str = LEDGER_FILE):
+        """
+        Streams the General Ledger as DataFrame chunks of `chunksize` rows
+        (same column normalization as load_ledger). Nothing is kept between chunks.
+        """
+        import pandas as pd
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            for chunk in reader:
+                chunk.columns = [c.strip() for c in chunk.columns]
+                yield chunk
+
+    def iter_ledger_records(self, chunksize: int = LEDGER_CHUNK_SIZE, path: str = LEDGER_FILE):
+        """Streams the ledger as lightweight namedtuple records (much cheaper than iterrows)."""
+        for chunk in self.iter_ledger(chunksize, path):
+            yield from chunk.itertuples(index=False)
+
     def extract_invoice_text(self, pdf_path: str) -> str:
         """Extracts raw text from a PDF file."""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                full_text = ""
-                for page in pdf.pages:
-                    full_text += page.extract_text()
-            return full_text
+            return pdf_backend().extract(pdf_path, separator="")
+        except TimeoutError:
+            raise  # the per-file time limit (_time_limit), reported by _process_invoice_worker
         except Exception as e:
             print(f"[!] Error reading PDF {pdf_path}: {e}")
             return ""
@@ -52,20 +137,21 @@ class IngestionAgent:
         For Phase 1 (Foundation), we use Regex to ensure strict control.
         """
         # 1. Extract Invoice ID (e.g., INV-1000)
-        inv_id_match = re.search(r"Invoice ID:\s*(INV-\d+)", text)
+        inv_id_match = INVOICE_ID_PATTERN.search(text)
         inv_id = inv_id_match.group(1) if inv_id_match else "UNKNOWN"
 
         # 2. Extract Total Amount (e.g., $4500.00)
         # Regex explanation: Look for '$' followed by digits and decimals
-        amount_match = re.search(r"Total Amount:\s*\$([\d,]+\.\d{2})", text)
-        amount = 0.0
+        # No readable total is NaN, not $0.00 (match_engine reports it as UNREADABLE)
+        amount_match = TOTAL_PATTERN.search(text)
+        amount = float("nan")
         if amount_match:
             try:
                 # Remove commas and convert to float
                 clean_amount = amount_match.group(1).replace(",", "")
                 amount = float(clean_amount)
             except ValueError:
-                amount = 0.0
+                amount = float("nan")
 
         return {
             "source_file": file_name,
@@ -74,7 +160,53 @@ class IngestionAgent:
             "raw_text_snippet": text[:100].replace("\n", " ") + "..." # Audit trail
         }
 
-    def run_pipeline(self):
+    def extract_fields(self, text: str) -> Dict[str, Any]:
+        """
+        Normalized invoice record: invoice ID, total, date, vendor and line items,
+        plus a 0-1 confidence (weighted share of the fields found, halved when the
+        priced line items do not add up to the total).
+        """
+        def first(pattern):
+            match = pattern.search(text)
+            return match.group(1) if match else None
+
+        total = first(TOTAL_PATTERN)
+        fields = {
+            "invoice_id": first(INVOICE_ID_PATTERN),
+            "date": first(DATE_PATTERN),
+            "vendor": first(VENDOR_PATTERN),
+            "total": float(total.replace(",", "")) if total else None,
+            "line_items": [{"description": d, "amount": None} for d in DESCRIPTION_PATTERN.findall(text)],
+        }
+        priced = [{"description": d, "amount": float(a.replace(",", ""))} for d, a in LINE_ITEM_PATTERN.findall(text)]
+        fields["line_items"] += priced
+
+        confidence = sum(weight for name, weight in FIELD_WEIGHTS.items() if fields[name] is not None)
+        if priced and fields["total"] is not None and abs(sum(i["amount"] for i in priced) - fields["total"]) > 0.01:
+            confidence /= 2
+        fields["confidence"] = round(confidence, 2)
+        return fields
+
+    def process_invoice(self, path: str) -> Dict[str, Any]:
+        """Extract + parse one invoice file (shared by the serial and parallel paths)."""
+        f = os.path.basename(path)
+        # The filename contains the Transaction ID (e.g., TXN-1000.pdf)
+        txn_id = f.replace(".pdf", "")
+        
+        raw_text = self.extract_invoice_text(path)
+        structured_data = self.parse_invoice(raw_text, f)
+        
+        # Link to Transaction ID for the 3-Way Match later
+        structured_data["linked_txn_id"] = txn_id
+        return structured_data
+
+    def run_pipeline(self, workers: int = INGEST_WORKERS, chunksize: Optional[int] = None,
+                     timeout: Optional[float] = INGEST_FILE_TIMEOUT):
+        """
+        Loads the ledger and parses every invoice.
+        With workers > 1 the invoices are spread over a process pool; results come
+        back in the same (sorted file name) order as the serial path.
+        """
         # 1. Load Ledger
         self.load_ledger()
         
@@ -85,32 +217,37 @@ class IngestionAgent:
             print(f"[!] Directory {INVOICE_DIR} does not exist.")
             return
 
-        invoice_files = [f for f in os.listdir(INVOICE_DIR) if f.endswith('.pdf')]
-        
-        results = []
+        invoice_files = sorted(f for f in os.listdir(INVOICE_DIR) if f.endswith('.pdf'))
+        paths = [os.path.join(INVOICE_DIR, f) for f in invoice_files]
         
-        for f in invoice_files:
-            path = os.path.join(INVOICE_DIR, f)
-            # The filename contains the Transaction ID (e.g., TXN-1000.pdf)
-            txn_id = f.replace(".pdf", "")
-            
-            raw_text = self.extract_invoice_text(path)
-            structured_data = self.parse_invoice(raw_text, f)
-            
-            # Link to Transaction ID for the 3-Way Match later
-            structured_data["linked_txn_id"] = txn_id
-            results.append(structured_data)
-            print(f"   > Parsed {f}: Found Amount ${structured_data['extracted_amount']}")
+        if workers > 1 and len(paths) > 1:
+            workers = min(workers, len(paths))
+            chunksize = chunksize or max(1, len(paths) // (workers * 4))
+            print(f"   > Using {workers} worker processes (chunksize {chunksize})")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_process_invoice_worker, [(p, timeout) for p in paths], chunksize=chunksize))
+        else:
+            results = [self.process_invoice(p) for p in paths]
+
+        for f, structured_data in zip(invoice_files, results):
+            amount = structured_data["extracted_amount"]
+            print(f"   > Parsed {f}: " + (f"Found Amount ${amount}" if amount == amount else "No readable total"))
 
         return results
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the General Ledger and parse every invoice PDF.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="processes parsing invoices")
+    args = parser.parse_args(argv)
+
     agent = IngestionAgent()
-    data = agent.run_pipeline()
+    data = agent.run_pipeline(workers=args.workers)
     
     # Simple check to verify we have data
     if data:
         print("\n[SUCCESS] Phase 1 Complete. Data is structured.")
         print(f"Sample Extracted Record: {data[0]}")
     else:
-        print("\n[FAIL] No data extracted.")
\ No newline at end of file
+        print("\n[FAIL] No data extracted.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+import os
+from typing import Callable, Dict, Optional, Set
+
+import pandas as pd
+
+from ingestion import IngestionAgent, INVOICE_DIR
+from policy_engine import file_sha256
+from verdict_cache import CACHE_DIR
+
+# --- CONFIGURATION ---
+STORE_COLUMNS = ["TransactionID", "path", "size", "mtime", "sha256", "text", "invoice_id", "extracted_amount", "fields"]
+
+
+class InvoiceStore:
+    """
+    Persistent manifest of data/invoices: TransactionID -> path, size, mtime,
+    content hash, extracted text, the parse_invoice fields and the compact
+    extract_fields record (JSON).
+
+    refresh() walks the folder once with os.scandir and only re-extracts files
+    that are new or whose content hash changed; everything else comes from a
+    Parquet file. Lookups during the audit are plain dictionary hits.
+    """
+
+    def __init__(self, extractor_name: str, extract: Callable[[str], str],
+                 invoice_dir: str = INVOICE_DIR, store_dir: str = CACHE_DIR):
+        self.extract = extract
+        self.invoice_dir = invoice_dir
+        # Text depends on the extraction library, so each extractor keeps its own store
+        self.path = os.path.join(store_dir, f"invoice_store_{extractor_name}.parquet")
+        self._parser = IngestionAgent()
+        self._records: Dict[str, dict] = {}
+        self._loaded = False
+        self.changed: Set[str] = set()  # TransactionIDs extracted or removed by the last refresh()
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.path):
+            return {}
+        df = pd.read_parquet(self.path)
+        return {rec["TransactionID"]: rec for rec in df.to_dict("records")}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        df = pd.DataFrame(list(self._records.values()), columns=STORE_COLUMNS)
+        tmp = self.path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self.path)
+
+    def refresh(self) -> Dict[str, int]:
+        """Synchronizes the store with the invoice folder. Returns counts of what changed."""
+        # Repeated refreshes (watch_mode.py polls) compare against the manifest in memory
+        previous = dict(self._records) if self._loaded else self._load()
+        records = {}
+        stats = {"unchanged": 0, "touched": 0, "extracted": 0, "removed": 0}
+
+        if os.path.isdir(self.invoice_dir):
+            with os.scandir(self.invoice_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".pdf") or not entry.is_file():
+                        continue
+                    txn_id = entry.name[:-len(".pdf")]
+                    st = entry.stat()
+                    old = previous.get(txn_id)
+                    if old is not None and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                        records[txn_id] = old
+                        stats["unchanged"] += 1
+                        continue
+
+                    digest = file_sha256(entry.path)
+                    if old is not None and old["sha256"] == digest:
+                        # Touched but identical: keep the extraction, update the stamp
+                        old.update(path=entry.path, size=st.st_size, mtime=st.st_mtime)
+                        records[txn_id] = old
+                        stats["touched"] += 1
+                        continue
+
+                    text = self.extract(entry.path)
+                    parsed = self._parser.parse_invoice(text, entry.name)
+                    records[txn_id] = {
+                        "TransactionID": txn_id,
+                        "path": entry.path,
+                        "size": st.st_size,
+                        "mtime": st.st_mtime,
+                        "sha256": digest,
+                        "text": text,
+                        "invoice_id": parsed["invoice_id"],
+                        "extracted_amount": parsed["extracted_amount"],
+                        "fields": json.dumps(self._parser.extract_fields(text)),
+                    }
+                    stats["extracted"] += 1
+
+        # Stores written before the field record existed are upgraded from the stored text
+        upgraded = 0
+        for rec in records.values():
+            if not isinstance(rec.get("fields"), str):
+                rec["fields"] = json.dumps(self._parser.extract_fields(rec["text"]))
+                upgraded += 1
+            if rec["extracted_amount"] == 0:  # older stores kept an unreadable total as $0.00
+                amount = self._parser.parse_invoice(rec["text"], os.path.basename(rec["path"]))["extracted_amount"]
+                if amount != amount:
+                    rec["extracted_amount"] = amount
+                    upgraded += 1
+
+        removed = set(previous) - set(records)
+        stats["removed"] = len(removed)
+        self.changed = removed | {t for t, rec in records.items() if previous.get(t) is None
+                                  or previous[t]["sha256"] != rec["sha256"]}
+        self._records = records
+        self._loaded = True
+        if stats["touched"] or stats["extracted"] or stats["removed"] or upgraded or not os.path.exists(self.path):
+            self._save()
+        return stats
+
+    def get(self, txn_id: str) -> Optional[dict]:
+        return self._records.get(txn_id)
+
+    def fields(self, txn_id: str) -> Optional[dict]:
+        """The extract_fields record of one invoice, or None if there is no invoice."""
+        rec = self._records.get(txn_id)
+        return json.loads(rec["fields"]) if rec is not None else None
+
+    def to_frame(self) -> pd.DataFrame:
+        """TransactionID / invoice_id / extracted_amount of every invoice (match_engine input)."""
+        return pd.DataFrame(
+            [(r["TransactionID"], r["invoice_id"], r["extracted_amount"]) for r in self._records.values()],
+            columns=["TransactionID", "invoice_id", "extracted_amount"],
+        )
+
+    def __contains__(self, txn_id: str) -> bool:
+        return txn_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized between processes
+    fcntl = None
+
+from ingestion import (INVOICE_ID_PATTERN, DATE_PATTERN, TOTAL_PATTERN, VENDOR_PATTERN, DESCRIPTION_PATTERN,
+                       LINE_ITEM_PATTERN)
+from pdf_extract import PdfBackend
+from verdict_cache import CACHE_DIR
+
+# --- CONFIGURATION ---
+TEMPLATE_REGISTRY = os.environ.get("AUDIT_TEMPLATE_REGISTRY", os.path.join(CACHE_DIR, "invoice_templates.json"))
+# Words whose top edges are this close (PDF points) are on the same line
+LINE_TOLERANCE = 3.0
+# Slack around a learned field box (PDF points), with more room to the right for longer values
+MARGIN = 4.0
+H_MARGIN = 72.0
+# A vendor whose template failed this often (and more often than it worked) is always read in full
+DISABLE_AFTER = 5
+
+# Fields a template locates; the check requires every learned one to parse in its box
+FIELD_PATTERNS = {
+    "invoice_id": INVOICE_ID_PATTERN,
+    "date": DATE_PATTERN,
+    "total": TOTAL_PATTERN,
+    "description": DESCRIPTION_PATTERN,
+}
+REQUIRED_FIELDS = ("invoice_id", "total")
+# Priced line items have no fixed box (their number varies), so a vendor whose invoices list them is read in full:
+# extract_fields needs every item to check that they add up to the total
+
+
+def text_lines(words: List[dict]) -> List[dict]:
+    """pdfplumber words grouped into lines, top to bottom: {"text", "x0", "top", "x1", "bottom"}."""
+    lines = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        line = lines[-1] if lines else None
+        if line is None or abs(word["top"] - line["top"]) > LINE_TOLERANCE:
+            lines.append({"words": [word], "top": word["top"], "bottom": word["bottom"]})
+        else:
+            line["words"].append(word)
+            line["bottom"] = max(line["bottom"], word["bottom"])
+    for line in lines:
+        words = sorted(line.pop("words"), key=lambda w: w["x0"])
+        line.update(text=" ".join(w["text"] for w in words), x0=words[0]["x0"], x1=words[-1]["x1"])
+    return lines
+
+
+def vendor_key(lines: List[dict]) -> Optional[str]:
+    """Layouts are keyed by the invoice's header line ('INVOICE - TechCorp Solutions' -> 'techcorp solutions')."""
+    if not lines:
+        return None
+    match = VENDOR_PATTERN.search(lines[0]["text"])
+    name = match.group(1) if match else lines[0]["text"]
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip() or None
+
+
+def learn_template(pages: List[List[dict]], widths: List[float]) -> Optional[dict]:
+    """
+    Page and box of each field, from the lines of a fully read invoice. A field
+    on the last page of a multi-page invoice is stored counting from the end
+    (page -1), since that is where a variable-length invoice puts its total.
+    `priced_items` notes whether the invoice lists priced line items.
+    """
+    fields = {}
+    for number, lines in enumerate(pages):
+        for line in lines:
+            for name, pattern in FIELD_PATTERNS.items():
+                if name not in fields and pattern.search(line["text"]):
+                    page = number - len(pages) if number == len(pages) - 1 and len(pages) > 1 else number
+                    fields[name] = {
+                        "page": page,
+                        "bbox": [max(0.0, line["x0"] - MARGIN), line["top"] - MARGIN,
+                                 min(widths[number], line["x1"] + H_MARGIN), line["bottom"] + MARGIN],
+                    }
+    if not all(name in fields for name in REQUIRED_FIELDS):
+        return None
+    priced = any(LINE_ITEM_PATTERN.search(line["text"]) for lines in pages for line in lines)
+    return {"fields": fields, "priced_items": priced, "learned": time.time(), "hits": 0, "misses": 0}
+
+
+def in_box(line: dict, bbox: List[float]) -> bool:
+    """The line's vertical middle is inside the box and the line starts inside it."""
+    x0, top, x1, bottom = bbox
+    middle = (line["top"] + line["bottom"]) / 2
+    return top <= middle <= bottom and x0 <= line["x0"] <= x1
+
+
+class TemplateRegistry:
+    """
+    vendor key -> learned template, in one small JSON file shared by every
+    ingest process. It is rewritten when a template is learned and when the
+    process exits. Each save merges with the file under a lock: hit / miss
+    counts are added to the ones on disk, so no process overwrites another's.
+    """
+
+    def __init__(self, path: str = TEMPLATE_REGISTRY):
+        self.path = path
+        self.templates: Dict[str, dict] = self._read()
+        self._counts: Dict[str, List[int]] = {}  # vendor -> [hits, misses] not yet saved
+        self._learned = set()  # vendors whose template was (re-)learned since the last save
+        # Runs at exit in pool workers as well (they skip atexit, not multiprocessing finalizers)
+        Finalize(self, self.save, exitpriority=10)
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def get(self, vendor: str) -> Optional[dict]:
+        return self.templates.get(vendor)
+
+    def count(self, vendor: str, hit: bool):
+        template = self.templates[vendor]
+        template["hits" if hit else "misses"] += 1
+        self._counts.setdefault(vendor, [0, 0])[0 if hit else 1] += 1
+
+    def put(self, vendor: str, template: dict):
+        old = self.templates.get(vendor)
+        if old is not None:  # a re-learned layout keeps its track record
+            template["hits"], template["misses"] = old["hits"], old["misses"]
+        self.templates[vendor] = template
+        self._learned.add(vendor)
+        self.save()
+
+    def save(self):
+        if not self._counts and not self._learned:
+            return
+        with self._locked():
+            merged = self._read()
+            for vendor in self._learned | set(self._counts):
+                ours, theirs = self.templates[vendor], merged.get(vendor)
+                hits, misses = self._counts.get(vendor, (0, 0))
+                if theirs is not None:  # counters from disk, plus what this process added
+                    hits, misses = theirs["hits"] + hits, theirs["misses"] + misses
+                else:
+                    hits, misses = ours["hits"], ours["misses"]
+                merged[vendor] = dict(ours if vendor in self._learned or theirs is None else theirs,
+                                      hits=hits, misses=misses)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, indent=1)
+            os.replace(tmp, self.path)
+        self.templates = merged  # picks up what other processes learned meanwhile
+        self._counts, self._learned = {}, set()
+
+
+class TemplateBackend(PdfBackend):
+    """
+    pdfplumber with per-vendor field templates. The first invoice of a vendor
+    is read in full and its field positions learned; later ones only have the
+    template's pages laid out and return the lines inside the learned boxes
+    (header, invoice ID, date, description, total), which parse_invoice and
+    extract_fields read like the full text. If any learned field does not
+    parse in its box, or a page it laid out has priced line items, the invoice
+    is read in full and the template re-learned. Vendors whose invoices have
+    priced line items are always read in full.
+    """
+
+    name = "template"
+
+    def __init__(self, registry: Optional[TemplateRegistry] = None):
+        self.registry = registry or TemplateRegistry()
+        self.stats = {"template": 0, "fallback": 0, "learned": 0}
+
+    def _apply(self, template: dict, pdf, first_lines: List[dict]) -> Optional[str]:
+        out = [first_lines[0]["text"]]
+        lines_by_page = {0: first_lines}
+        for name, field in template["fields"].items():
+            number = field["page"] if field["page"] >= 0 else len(pdf.pages) + field["page"]
+            if not 0 <= number < len(pdf.pages):
+                return None
+            if number not in lines_by_page:
+                lines_by_page[number] = text_lines(pdf.pages[number].extract_words())
+            found = [line["text"] for line in lines_by_page[number] if in_box(line, field["bbox"])]
+            if not any(FIELD_PATTERNS[name].search(text) for text in found):
+                return None
+            out.extend(text for text in found if text not in out)
+        if any(LINE_ITEM_PATTERN.search(line["text"]) for lines in lines_by_page.values() for line in lines):
+            return None  # the boxes would drop the items
+        return "\n".join(out)
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            if not pdf.pages:
+                return
+            first_lines = text_lines(pdf.pages[0].extract_words())
+            vendor = vendor_key(first_lines)
+            template = self.registry.get(vendor) if vendor else None
+            disabled = template is not None and template["misses"] >= DISABLE_AFTER and template["misses"] > template["hits"]
+            priced = template is not None and template.get("priced_items", False)
+            if template is not None and not disabled and not priced:
+                text = self._apply(template, pdf, first_lines)
+                if text is not None:
+                    self.registry.count(vendor, hit=True)
+                    self.stats["template"] += 1
+                    yield text
+                    return
+                self.registry.count(vendor, hit=False)
+
+            # Full read (unknown vendor or failed check); learn the layout from the same pages
+            self.stats["fallback"] += 1
+            pages, widths = [first_lines], [float(pdf.pages[0].width)]
+            yield pdf.pages[0].extract_text() or ""
+            for page in pdf.pages[1:]:
+                pages.append(text_lines(page.extract_words()))
+                widths.append(float(page.width))
+                yield page.extract_text() or ""
+            learned = learn_template(pages, widths) if vendor and not disabled else None
+            if learned is not None and not (priced and learned["priced_items"]):  # unchanged: no rewrite
+                self.registry.put(vendor, learned)
+                self.stats["learned"] += 1
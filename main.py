@@ -1,8 +1,24 @@
-import pandas as pd
+import argparse
 import os
-import time
-from policy_engine import PolicyAgent
-from langchain_community.document_loaders import PyPDFLoader
+# Eager on purpose: every pipeline module below works on pandas frames and an audit reads the
+# ledger first thing, so deferring these imports would not make `cli.py audit` start any sooner
+import pandas as pd
+from policy_engine import PolicyAgent, format_verdict
+from audit_executor import AuditExecutor
+from doa_rules import compile_doa_rules, prescreen, doa_decision, DOA_VIOLATION
+from match_engine import (three_way_match, mismatch_table, match_decision, MATCH_FAILURES, UNREADABLE,
+                          MATCH_COLUMNS, MATCH_REPORT_FILE)
+from duplicate_detector import (find_duplicates, duplicate_decision, missing_columns, DUPLICATE_FAILURES,
+                                DUPLICATE_COLUMNS, DUPLICATE_REPORT_FILE)
+from audit_history import AuditHistory
+from policy_impact import relied_sections, record_policy_version, WHOLE_POLICY
+from verdict_reuse import VerdictClasses, CLASS_REPORT_FILE
+from audit_journal import AuditJournal, row_input_hash, MISSING_INVOICE_HASH
+from invoice_store import InvoiceStore
+from ingestion import IngestionAgent, LEDGER_CHUNK_SIZE
+from report_writer import ReportWriter
+from pdf_extract import default_backend
+from metrics import METRICS, METRICS_JSON, METRICS_PROM, estimate_tokens
 
 # --- CONFIGURATION ---
 DATA_DIR = "data"
@@ -10,58 +26,64 @@ LEDGER_FILE = os.path.join(DATA_DIR, "general_ledger.csv")
 INVOICE_DIR = os.path.join(DATA_DIR, "invoices")
 REPORT_FILE = os.path.join(DATA_DIR, "final_audit_report.csv")
 
-def extract_invoice_text(pdf_path):
-    """Extracts text from a single PDF invoice to show the AI."""
-    try:
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load()
-        return " ".join([p.page_content for p in pages])
-    except Exception as e:
-        return f"[Error reading invoice: {e}]"
+# Concurrency / rate limits for the LLM calls (tune to your API quota)
+MAX_CONCURRENCY = int(os.environ.get("AUDIT_MAX_CONCURRENCY", 8))
+REQUESTS_PER_MINUTE = int(os.environ.get("AUDIT_REQUESTS_PER_MINUTE", 60))
+TOKENS_PER_MINUTE = int(os.environ.get("AUDIT_TOKENS_PER_MINUTE", 1_000_000))
 
-def main():
-    print("[*] Starting Audit Agent...")
+# PDF library used for invoice text (pypdf | pdfplumber | fast-total | template), see pdf_extract.py
+PDF_BACKEND = default_backend("AUDIT_PDF_BACKEND", "pypdf")
 
-    # 1. Initialize the Brain
-    agent = PolicyAgent()
-    # Ensure the policy is indexed (The Brain needs to read the rulebook first)
-    if not agent.vector_db:
-        print("[*] Indexing Policy for the first time...")
-        agent.ingest_policy()
+# Resolve clear-cut Delegation of Authority breaches without calling the LLM
+DOA_PRESCREEN = os.environ.get("AUDIT_DOA_PRESCREEN", "1") != "0"
 
-    # 2. Load the General Ledger
-    print(f"[*] Loading General Ledger from {LEDGER_FILE}...")
-    try:
-        df = pd.read_csv(LEDGER_FILE)
-    except FileNotFoundError:
-        print("❌ Ledger not found. Run generate_full_data.py first.")
-        return
+# Resolve invoice/ledger amount mismatches and missing invoices (Section 3.1) without the LLM
+MATCH_PRESCREEN = os.environ.get("AUDIT_MATCH_PRESCREEN", "1") != "0"
 
-    audit_results = []
+# Scan the whole ledger for duplicate / near-duplicate payments before auditing it
+# (not in --stream mode, which never holds the whole ledger; run duplicate_detector.py instead)
+DUPLICATE_CHECK = os.environ.get("AUDIT_DUPLICATE_CHECK", "1") != "0"
 
-    print("\n" + "="*80)
-    print(f"{'TXN ID':<12} | {'ROLE':<10} | {'AMOUNT':<10} | {'STATUS'}")
-    print("="*80)
+# Keep every run's verdicts in the indexed history store (audit_history.py) as well as the CSV
+HISTORY_ENABLED = os.environ.get("AUDIT_HISTORY", "1") != "0"
 
-    # 3. The Audit Loop
-    for index, row in df.iterrows():
-        txn_id = row['TransactionID']
-        approver = row['Approver']
-        amount = row['Amount']
-        desc = row['Description']
-        
-        # A. Find the Invoice PDF
-        pdf_path = os.path.join(INVOICE_DIR, f"{txn_id}.pdf")
-        
-        # B. Read the Invoice Text (The "Evidence")
-        if os.path.exists(pdf_path):
-            invoice_text = extract_invoice_text(pdf_path)
-        else:
-            invoice_text = "[MISSING INVOICE FILE]"
+# Ask the model once per class of structurally identical rows and fan the answer out (verdict_reuse.py)
+VERDICT_REUSE = os.environ.get("AUDIT_VERDICT_REUSE", "1") != "0"
 
-        # C. Construct the Audit Query
-        # We give the AI the Ledger Info + Invoice Info and ask it to check against Policy
-        query = f"""
+# Rows per LLM request (0 = one request per row). 20-50 is a good range.
+BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 0))
+
+# Send the extracted invoice fields instead of the raw PDF text
+# (the raw text is still sent when field extraction is unsure)
+COMPACT_EVIDENCE = os.environ.get("AUDIT_COMPACT_EVIDENCE", "1") != "0"
+EVIDENCE_MIN_CONFIDENCE = float(os.environ.get("AUDIT_EVIDENCE_MIN_CONFIDENCE", 0.75))
+MAX_EVIDENCE_ITEMS = 20
+
+def extract_invoice_text(pdf_path):
+    """Extracts text from a single PDF invoice to show the AI."""
+    try:
+        with METRICS.timer("pdf_extract"):
+            return PDF_BACKEND.extract(pdf_path, separator=" ")
+    except Exception as e:
+        return f"[Error reading invoice: {e}]"
+
+def format_evidence(fields):
+    """One-line invoice record built from IngestionAgent.extract_fields."""
+    parts = [f"{label}: {fields[key]}" for label, key in
+             (("Invoice ID", "invoice_id"), ("Date", "date"), ("Vendor", "vendor")) if fields[key]]
+    if fields["total"] is not None:
+        parts.append(f"Total Amount: ${fields['total']:.2f}")
+    items = [i["description"] + (f" ${i['amount']:.2f}" if i["amount"] is not None else "")
+             for i in fields["line_items"][:MAX_EVIDENCE_ITEMS]]
+    if len(fields["line_items"]) > MAX_EVIDENCE_ITEMS:
+        items.append(f"(+{len(fields['line_items']) - MAX_EVIDENCE_ITEMS} more)")
+    if items:
+        parts.append("Line items: " + "; ".join(items))
+    return " | ".join(parts)
+
+def build_audit_query(txn_id, approver, amount, desc, invoice_text, evidence_kind="PDF Text"):
+    """We give the AI the Ledger Info + Invoice Info and ask it to check against Policy"""
+    return f"""
         Perform a strict 3-Way Match Audit.
         
         1. LEDGER ENTRY (Internal Record):
@@ -70,7 +92,7 @@ def main():
            - Amount: ${amount}
            - Description: {desc}
            
-        2. INVOICE EVIDENCE (PDF Text):
+        2. INVOICE EVIDENCE ({evidence_kind}):
            "{invoice_text}"
            
         TASK:
@@ -82,36 +104,404 @@ def main():
         If invalid, start with "VIOLATION" and explain the specific reason.
         """
 
-        # D. Ask the Agent
-        try:
-            response = agent.check_policy(query)
-            # Clean up text
+def build_batch_record(txn_id, approver, amount, desc, invoice_text):
+    """One ledger row in batch mode (the audit instructions are sent once per batch)."""
+    return f"Ledger: Approver {approver}, Amount ${amount}, Description: {desc} | Invoice evidence: \"{invoice_text}\""
+
+def is_error_response(response):
+    return response.startswith(("Error:", "⚠️"))
+
+def classify_response(response, status=None):
+    """Maps the AI answer (or a structured batch status) onto the report status."""
+    if status == "ERROR":
+        return "⚠️ ERROR"
+    if status is not None:
+        return "🔴 FLAG" if status == "VIOLATION" else "🟢 PASS"
+    return "🔴 FLAG" if "VIOLATION" in response.upper() else "🟢 PASS"
+
+def print_row(row, response, verdict_status=None):
+    status = classify_response(response, verdict_status)
+    role_short = row.Approver.split()[-1] if " " in row.Approver else row.Approver
+    print(f"{row.TransactionID:<12} | {role_short:<10} | ${row.Amount:<9} | {status}")
+
+def report_records(df):
+    """DataFrame rows as dicts for ReportWriter (missing values as empty cells)."""
+    return df.astype(object).where(df.notna(), "").to_dict("records")
+
+def open_invoice_store():
+    """The invoice store main.py audits against (text from the configured PDF backend)."""
+    return InvoiceStore(PDF_BACKEND.name, extract_invoice_text, invoice_dir=INVOICE_DIR)
+
+def orphan_invoice_records(invoice_table, ledger_ids):
+    """Three-way match rows for invoices that no ledger row claimed."""
+    orphans = invoice_table[~invoice_table["TransactionID"].astype(str).isin(ledger_ids)]
+    return report_records(three_way_match(pd.DataFrame(columns=["TransactionID", "Amount"]), orphans))
+
+def timed_chunks(chunks):
+    """Ledger chunks, with the time spent reading each one recorded as ledger_load."""
+    chunks = iter(chunks)
+    while True:
+        with METRICS.timer("ledger_load"):
+            df = next(chunks, None)
+        if df is None:
+            return
+        yield df
+
+class AuditRun:
+    """
+    State shared by every chunk of one audit run (agent, limiter, DoA rules, journal).
+    audit_chunk() takes a slice of the ledger and returns its report rows in ledger order,
+    so the whole ledger (non-streaming) is just the one-chunk case.
+    """
+
+    def __init__(self, agent, journal, run_id, known, invoices, doa_rules=None, match_writer=None,
+                 reaudit=None):
+        self.agent = agent
+        self.invoices = invoices
+        self.journal = journal
+        self.run_id = run_id
+        self.known = known
+        self.reaudit = reaudit  # TransactionIDs whose earlier verdicts must not be re-used (policy_impact)
+        self.doa_rules = doa_rules
+        # Three-way match input, built once; the mismatch table goes to `match_writer`
+        self.invoice_table = invoices.to_frame()
+        self.match_writer = match_writer
+        self.matched_ids = set()  # ledger TransactionIDs that have an invoice (for orphan detection)
+        self.duplicates = {}  # TransactionID -> duplicate_detector finding, set before the first chunk
+        self.classes = VerdictClasses(doa_rules) if VERDICT_REUSE and doa_rules else None
+        self.reused = 0
+        self.evidence = {"compact": 0, "raw": 0, "raw_tokens": 0, "sent_tokens": 0}
+        self.executor = AuditExecutor(
+            agent,
+            max_concurrency=MAX_CONCURRENCY,
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+        )
+
+    def invoice_evidence(self, txn_id, invoice, raw_only=False):
+        """
+        (evidence text, kind): the compact field record when extraction is confident,
+        else the raw text (always for an invoice whose total could not be read).
+        """
+        if invoice is None:
+            return "[MISSING INVOICE FILE]", "PDF Text"
+        raw = invoice["text"]
+        fields = self.invoices.fields(txn_id) if COMPACT_EVIDENCE and not raw_only else None
+        if fields is not None and fields["confidence"] >= EVIDENCE_MIN_CONFIDENCE:
+            text, kind = format_evidence(fields), "Extracted Fields"
+            self.evidence["compact"] += 1
+        else:
+            text, kind = raw, "PDF Text"
+            self.evidence["raw"] += 1
+        self.evidence["raw_tokens"] += estimate_tokens(raw)
+        self.evidence["sent_tokens"] += estimate_tokens(text)
+        return text, kind
+
+    def audit_chunk(self, df):
+        journal, run_id = self.journal, self.run_id
+
+        # 3. Deterministic DoA pre-screen (Section 1 limits, evaluated for all rows at once)
+        screen = prescreen(df, self.doa_rules) if self.doa_rules is not None else None
+
+        # Deterministic three-way match (Section 3.1/3.2, integer cents, all rows at once)
+        with METRICS.timer("three_way_match"):
+            match = three_way_match(df, self.invoice_table, include_orphans=False)
+        self.matched_ids.update(match.loc[match["Invoice_ID"].notna(), "TransactionID"].astype(str))
+        if self.match_writer is not None:
+            self.match_writer.write_rows(report_records(mismatch_table(match)))
+
+        # 4. Build one Audit Query per ledger row that still needs the LLM
+        # (DoA-compliant rows still go to the LLM for the invoice check)
+        rows = list(df.itertuples(index=False))
+        screen_rows = list(screen.itertuples(index=False)) if screen is not None else [None] * len(rows)
+        match_rows = list(match.itertuples(index=False))
+        responses = [None] * len(rows)
+        statuses = [None] * len(rows)  # structured status, when batch mode provides one
+        input_hashes = [None] * len(rows)
+        retrieved = [()] * len(rows)  # policy sections retrieval picked for each LLM row
+        llm_indices = []
+        queries = []
+        representatives = {}  # class key -> row that asks the model for the whole class
+        followers = []  # (row, class key) answered by their class
+        invoice_fields = {}  # row -> extract_fields record, for the class key and fan-out
+        for i, (row, screen_row, match_row) in enumerate(zip(rows, screen_rows, match_rows)):
+            # A. Find the Invoice PDF (already hashed and extracted by the invoice store)
+            with METRICS.timer("invoice_lookup"):
+                invoice = self.invoices.get(str(row.TransactionID))
+                invoice_hash = invoice["sha256"] if invoice is not None else MISSING_INVOICE_HASH
+                input_hashes[i] = row_input_hash(row._asdict(), invoice_hash)
+
+            # Unchanged inputs that already have a verdict are not audited again
+            previous = self.known.get(input_hashes[i])
+            if previous is not None and self.reaudit is not None and str(row.TransactionID) in self.reaudit:
+                previous = None
+            if previous is not None:
+                responses[i] = previous["response"]
+                statuses[i] = previous.get("verdict_status")
+                retrieved[i] = previous.get("retrieved", ())
+                # Not journaled again: the earlier event still holds it, so the journal grows only by what changed.
+                # A re-audit carries the verdicts a policy edit did not affect over to the new policy version
+                if self.reaudit is not None and previous.get("policy_hash") != self.agent.policy_hash:
+                    journal.record(run_id, row.TransactionID, input_hashes[i], responses[i], statuses[i], retrieved[i])
+                self.reused += 1
+                print_row(row, responses[i], statuses[i])
+                continue
+
+            if screen_row is not None and screen_row.DoA_Status == DOA_VIOLATION:
+                responses[i] = doa_decision(row.Approver, row.Amount, screen_row)
+                journal.record(run_id, row.TransactionID, input_hashes[i], responses[i])
+                print_row(row, responses[i])
+                continue
+
+            if MATCH_PRESCREEN and match_row.Match_Status in MATCH_FAILURES:
+                responses[i] = match_decision(match_row)
+                journal.record(run_id, row.TransactionID, input_hashes[i], responses[i])
+                print_row(row, responses[i])
+                continue
+
+            # Rows that put the same question to the model share one answer (verdict_reuse.py)
+            key = None
+            unreadable = match_row.Match_Status == UNREADABLE
+            if self.classes is not None and invoice is not None and not unreadable:
+                invoice_fields[i] = self.invoices.fields(str(row.TransactionID))
+                key = self.classes.key(row, screen_row, match_row, invoice_fields[i], EVIDENCE_MIN_CONFIDENCE)
+            if key is not None:
+                if self.classes.answer(key) is not None or key in representatives:
+                    followers.append((i, key))
+                    continue
+                representatives[key] = i
+
+            # B. The "Evidence": extracted invoice fields, or the raw text if extraction is unsure
+            with METRICS.timer("prompt_build"):
+                invoice_text, evidence_kind = self.invoice_evidence(str(row.TransactionID), invoice, unreadable)
+                llm_indices.append(i)
+                if BATCH_SIZE > 0:
+                    queries.append(build_batch_record(row.TransactionID, row.Approver, row.Amount, row.Description, invoice_text))
+                else:
+                    queries.append(build_audit_query(row.TransactionID, row.Approver, row.Amount, row.Description,
+                                                     invoice_text, evidence_kind))
+                # Without retrieval the model sees, and so the verdict depends on, every section
+                retrieved[i] = self.agent.retrieved_sections(queries[-1]) if self.agent.top_k else [WHOLE_POLICY]
+
+        # 5. The Audit Loop (concurrent, rate limited)
+        def on_result(index, response):
+            i = llm_indices[index]
+            responses[i] = response
+            if not is_error_response(response):  # failed calls are retried on --resume
+                journal.record(run_id, rows[i].TransactionID, input_hashes[i], response, retrieved=retrieved[i])
+            print_row(rows[i], response)
+
+        def on_verdict(index, verdict):
+            i = llm_indices[index]
+            responses[i] = format_verdict(verdict)
+            statuses[i] = verdict["status"]
+            if verdict["status"] != "ERROR":
+                journal.record(run_id, rows[i].TransactionID, input_hashes[i], responses[i], statuses[i],
+                               retrieved[i])
+            print_row(rows[i], responses[i], statuses[i])
+
+        with METRICS.timer("llm_stage"):
+            if BATCH_SIZE > 0:
+                transactions = [{"TransactionID": str(rows[i].TransactionID), "query": q} for i, q in zip(llm_indices, queries)]
+                self.executor.run_batches(transactions, batch_size=BATCH_SIZE, on_result=on_verdict)
+            elif queries:
+                self.executor.run(queries, on_result=on_result)
+        METRICS.count("rows", len(rows))
+        METRICS.count("rows_llm", len(llm_indices))
+
+        # Class members get their representative's answer, with their own IDs filled in
+        for key, i in representatives.items():
+            self.classes.store(key, rows[i], invoice_fields.get(i), responses[i], statuses[i], retrieved[i],
+                               failed=is_error_response(responses[i]) or statuses[i] == "ERROR")
+        for i, key in followers:
+            found = self.classes.answer(key)
+            if found is None:  # the representative's call failed, and so does the class (retried on --resume)
+                rep = representatives[key]
+                responses[i], statuses[i] = responses[rep], statuses[rep]
+            else:
+                responses[i] = self.classes.fan_out(key, rows[i], invoice_fields.get(i))
+                statuses[i], retrieved[i] = found["verdict_status"], found["retrieved"]
+                journal.record(run_id, rows[i].TransactionID, input_hashes[i], responses[i], statuses[i], retrieved[i])
+            print_row(rows[i], responses[i], statuses[i])
+        METRICS.count("rows_class_reused", len(followers))
+
+        # Results are reported in ledger order regardless of completion order
+        audit_results = []
+        for row, response, verdict_status, screen_row, match_row, sections in zip(
+                rows, responses, statuses, screen_rows, match_rows, retrieved):
             response_clean = response.strip().replace("\n", " ")
-        except Exception as e:
-            response_clean = f"AI ERROR: {e}"
-        
-        # E. Determine Status
-        status = "🔴 FLAG" if "VIOLATION" in response_clean.upper() else "🟢 PASS"
-        
-        # Print to console
-        role_short = approver.split()[-1] if " " in approver else approver
-        print(f"{txn_id:<12} | {role_short:<10} | ${amount:<9} | {status}")
-        
-        # Save full explanation
-        audit_results.append({
-            "TransactionID": txn_id,
-            "Status": status,
-            "AI_Decision": response_clean
-        })
-        
-        # Sleep to be nice to the API
-        time.sleep(1)
+            status = classify_response(response_clean, verdict_status)
+            # Duplicate payments are a finding of their own, whatever the row's verdict
+            duplicate = self.duplicates.get(str(row.TransactionID))
+            if duplicate is not None:
+                if duplicate.Duplicate_Kind in DUPLICATE_FAILURES:
+                    status = "🔴 FLAG"
+                response_clean = f"{response_clean} | {duplicate_decision(duplicate)}"
+            audit_results.append({
+                "TransactionID": row.TransactionID,
+                "Status": status,
+                "AI_Decision": response_clean,
+                "Duplicate_Cluster": duplicate.Duplicate_Cluster if duplicate is not None else "",
+                # What a policy edit must touch to change this verdict (see policy_impact.py)
+                "Policy_Sections": relied_sections(response, screen_row, match_row, sections)
+            })
+        return audit_results
+
+def main(agent=None, resume=False, incremental=False, stream=False, chunk_size=LEDGER_CHUNK_SIZE,
+         metrics_interval=0, reaudit=None):
+    """
+    resume:      continue the last interrupted run, skipping rows it already decided.
+    incremental: start a new run but re-use any earlier verdict whose inputs
+                 (ledger row + invoice file) are unchanged and that was made under
+                 the current policy.
+    stream:      read the ledger `chunk_size` rows at a time and write the report
+                 incrementally, so memory stays flat however big the ledger is.
+    metrics_interval: with metrics on, also re-write the metric files every N seconds.
+    reaudit:     TransactionIDs to decide again even if an earlier verdict exists
+                 (policy_impact.py passes the rows a policy edit affects).
+    """
+    print("[*] Starting Audit Agent...")
+
+    # 1. Initialize the Brain (pass an agent in to run offline, e.g. with fake_llm.FakeAuditLLM)
+    agent = agent or PolicyAgent()
+    # Ensure the policy is read (The Brain needs to read the rulebook first)
+    if not agent.policy_text:
+        print("[*] Reading Policy for the first time...")
+        print(f"[*] {agent.ingest_policy()}")
+    if agent.top_k and agent.policy_text:
+        print(f"[*] Policy retrieval: top {agent.top_k} of {len(agent.index.sections)} sections per transaction")
+
+    # 2. Load the General Ledger
+    print(f"[*] Loading General Ledger from {LEDGER_FILE}...")
+    if not os.path.exists(LEDGER_FILE):
+        print("❌ Ledger not found. Run generate_full_data.py first.")
+        return
+    if stream:
+        print(f"[*] Streaming mode: {chunk_size} rows per chunk")
+        chunks = timed_chunks(IngestionAgent().iter_ledger(chunksize=chunk_size, path=LEDGER_FILE))
+    else:
+        with METRICS.timer("ledger_load"):
+            chunks = [pd.read_csv(LEDGER_FILE)]
 
-    # 4. Save Final Report
-    report_df = pd.DataFrame(audit_results)
-    report_df.to_csv(REPORT_FILE, index=False)
+    doa_rules = None
+    if DOA_PRESCREEN:
+        if not agent.policy_text:
+            agent.ingest_policy()
+        doa_rules = compile_doa_rules(agent.policy_text)
+    # The sections of each policy version runs used, so a later edit can be diffed (policy_impact.py)
+    record_policy_version(agent.policy_text, agent.policy_hash)
+
+    # Every verdict is journaled the moment it is decided
+    journal = AuditJournal()
+    run_id, resumed = journal.start_run(resume=resume, incremental=incremental, policy_hash=agent.policy_hash)
+    # Only verdicts made under the current policy are re-used; after an edit, policy_impact.py's
+    # re-audit (reaudit=...) names the rows to decide again and vouches for the rest
+    policy_hash = None if reaudit is not None else agent.policy_hash
+    if resumed:
+        # An incremental run journals only what it decided; what it re-used is in the earlier runs
+        known = journal.verdicts(None if journal.is_incremental(run_id) else run_id, policy_hash)
+        print(f"[*] Resuming run {run_id}: {len(known)} verdicts already journaled")
+    elif incremental:
+        known = journal.verdicts(policy_hash=policy_hash)
+        print(f"[*] Incremental run {run_id}: {len(known)} earlier verdicts available")
+        stale = len(journal.verdicts().keys() - known.keys()) if policy_hash is not None else 0
+        if stale:
+            print(f"[!] {stale} earlier verdicts were made under another policy version and are audited again. "
+                  "`python cli.py impact reaudit` re-decides only the transactions the edit affects.")
+    else:
+        known = {}
+        print(f"[*] Run {run_id}")
+    history = AuditHistory() if HISTORY_ENABLED else None
+    if history is not None:
+        history.start_run(run_id, source="main", ledger_path=LEDGER_FILE)
+
+    # Invoices are scanned once; only new or changed PDFs are parsed again
+    invoices = open_invoice_store()
+    with METRICS.timer("invoice_refresh"):
+        print(f"[*] Invoice store: {invoices.refresh()}")
+    METRICS.start_exporter(metrics_interval)
+
+    print("\n" + "="*80)
+    print(f"{'TXN ID':<12} | {'ROLE':<10} | {'AMOUNT':<10} | {'STATUS'}")
     print("="*80)
+
+    # 6. Save Final Report (rows are written chunk by chunk), plus the three-way match exceptions
+    # and the duplicate payment clusters
+    with ReportWriter(REPORT_FILE) as writer, ReportWriter(MATCH_REPORT_FILE, columns=MATCH_COLUMNS) as match_writer, \
+            ReportWriter(DUPLICATE_REPORT_FILE, columns=DUPLICATE_COLUMNS) as duplicate_writer:
+        run = AuditRun(agent, journal, run_id, known, invoices, doa_rules, match_writer, reaudit)
+        duplicates = None
+        if DUPLICATE_CHECK and stream:
+            print("[*] Duplicate scan skipped: it needs the whole ledger in memory, which --stream avoids "
+                  "(run `python duplicate_detector.py` for it)")
+        elif DUPLICATE_CHECK and missing_columns(chunks[0].columns):
+            print(f"[*] Duplicate scan skipped: the ledger has no {', '.join(missing_columns(chunks[0].columns))} column(s)")
+        elif DUPLICATE_CHECK:
+            with METRICS.timer("duplicate_scan"):
+                duplicates = find_duplicates(chunks[0], run.invoice_table)
+            run.duplicates = {str(d.TransactionID): d for d in duplicates.itertuples(index=False)}
+            duplicate_writer.write_rows(report_records(duplicates))
+        for df in chunks:
+            results = run.audit_chunk(df)
+            writer.write_rows(results)
+            if history is not None:
+                history.record(run_id, df, results)
+        # Invoices that no ledger row claimed
+        match_writer.write_rows(orphan_invoice_records(run.invoice_table, run.matched_ids))
+    journal.finish_run(run_id)
+    journal.close()
+    if history is not None:
+        history.finish_run(run_id)
+        history.close()
+    print("="*80)
+    if run.reused:
+        print(f"[*] Re-used {run.reused} verdicts with unchanged inputs")
+    ev = run.evidence
+    if ev["compact"] or ev["raw"]:
+        saved = ev["raw_tokens"] - ev["sent_tokens"]
+        print(f"[*] Invoice evidence: {ev['compact']} compact, {ev['raw']} raw text; "
+              f"~{saved:,} prompt tokens saved ({saved / max(1, ev['raw_tokens']):.0%} of invoice text)")
+        METRICS.count("evidence_tokens_saved", saved)
+    if run.classes is not None and run.classes.keyed:
+        run.classes.write_report(CLASS_REPORT_FILE)
+        print(f"[*] Verdict classes: {run.classes.summary()} saved to: {CLASS_REPORT_FILE}")
+    print(f"[*] Three-way match exceptions ({match_writer.rows_written}) saved to: {MATCH_REPORT_FILE}")
+    if duplicates is not None:
+        print(f"[*] Duplicate payments ({duplicates['Duplicate_Cluster'].nunique()} clusters, "
+              f"{duplicate_writer.rows_written} rows) saved to: {DUPLICATE_REPORT_FILE}")
+    print(f"[*] Verdict cache: {agent.cache.stats()}")
+    for tier in agent.tier_stats():
+        print(f"[*] Model tier: {tier}")
+    if METRICS.enabled:
+        METRICS.stop_exporter()
+        METRICS.write()
+        print("\n" + METRICS.summary_table())
+        print(f"[*] Metrics written to {METRICS_JSON} and {METRICS_PROM}")
     print(f"\n[SUCCESS] Full Audit Complete. Report saved to: {REPORT_FILE}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AI audit over the General Ledger.")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last interrupted run instead of starting over")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only audit ledger rows / invoices that changed since earlier runs under the same policy")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the ledger in fixed-size chunks with constant memory")
+    parser.add_argument("--chunk-size", type=int, default=LEDGER_CHUNK_SIZE,
+                        help=f"rows per chunk in --stream mode (default {LEDGER_CHUNK_SIZE})")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time every pipeline stage and write JSON / Prometheus metrics (also AUDIT_METRICS=1)")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="with --metrics, re-write the metric files every N seconds during the run")
+    return parser.parse_args(argv)
+
+def cli(argv=None):
+    """Command-line entry point (python main.py ..., or python cli.py audit ...)."""
+    args = parse_args(argv)
+    if args.metrics:
+        METRICS.enabled = True
+    main(resume=args.resume, incremental=args.incremental, stream=args.stream, chunk_size=args.chunk_size,
+         metrics_interval=args.metrics_interval)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import argparse
+import os
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from ingestion import IngestionAgent, INGEST_WORKERS
+
+# --- CONFIGURATION ---
+MATCH_REPORT_FILE = os.path.join("data", "match_report.csv")
+# Policy Section 3.2: "A variance of $0.01 is acceptable for rounding errors."
+TOLERANCE_CENTS = 1
+MATCH_SECTION = "3.1"
+TOLERANCE_SECTION = "3.2"
+
+MATCHED = "MATCHED"
+WITHIN_TOLERANCE = "WITHIN_TOLERANCE"
+MISMATCHED = "MISMATCHED"
+MISSING_INVOICE = "MISSING_INVOICE"
+ORPHAN_INVOICE = "ORPHAN_INVOICE"
+# An invoice is on file but its total could not be read: the LLM decides from the raw text
+UNREADABLE = "UNREADABLE"
+# Statuses that break Section 3.1 on their own (no LLM needed to say so)
+MATCH_FAILURES = (MISMATCHED, MISSING_INVOICE)
+
+MATCH_COLUMNS = ["TransactionID", "Invoice_ID", "Ledger_Amount", "Invoice_Amount",
+                 "Variance_Cents", "Match_Status", "Match_Section"]
+
+
+def to_cents(values) -> tuple:
+    """(int64 cents, valid mask) for a column of amounts; money is never compared as floats."""
+    amounts = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(amounts)
+    cents = np.zeros(len(amounts), dtype=np.int64)
+    cents[valid] = np.rint(amounts[valid] * 100).astype(np.int64)
+    return cents, valid
+
+
+def invoice_frame(invoices: Union[pd.DataFrame, Iterable[dict]]) -> pd.DataFrame:
+    """
+    Normalizes invoice records (IngestionAgent.run_pipeline output, or an
+    InvoiceStore frame) to TransactionID / invoice_id / extracted_amount.
+    """
+    df = invoices if isinstance(invoices, pd.DataFrame) else pd.DataFrame(list(invoices or []))
+    if "TransactionID" not in df.columns:
+        df = df.rename(columns={"linked_txn_id": "TransactionID"})
+    for column in ("TransactionID", "invoice_id", "extracted_amount"):
+        if column not in df.columns:
+            df[column] = pd.Series(dtype=object)
+    return df[["TransactionID", "invoice_id", "extracted_amount"]]
+
+
+def three_way_match(ledger: pd.DataFrame, invoices, tolerance_cents: int = TOLERANCE_CENTS,
+                    include_orphans: bool = True) -> pd.DataFrame:
+    """
+    Joins ledger rows to invoices on TransactionID and classifies every row in
+    one vectorized pass. Returns MATCH_COLUMNS, one row per ledger row in ledger
+    order, followed (with include_orphans) by invoices that have no ledger row.
+    """
+    inv = invoice_frame(invoices)
+    # One invoice per transaction (the last record wins, as in a dict)
+    inv = inv.assign(TransactionID=inv["TransactionID"].astype(str)).drop_duplicates("TransactionID", keep="last")
+    inv_ids = pd.Index(inv["TransactionID"])
+    ledger_ids = ledger["TransactionID"].astype(str)
+
+    # Hash join: position of each ledger row's invoice (-1 = none)
+    pos = inv_ids.get_indexer(ledger_ids)
+    has_invoice = pos >= 0
+    safe_pos = np.where(has_invoice, pos, 0)
+
+    ledger_cents, ledger_valid = to_cents(ledger["Amount"])
+    inv_cents_all, inv_valid_all = to_cents(inv["extracted_amount"])
+    if len(inv):
+        inv_cents = np.where(has_invoice, inv_cents_all[safe_pos], 0)
+        inv_valid = has_invoice & inv_valid_all[safe_pos]
+    else:
+        inv_cents = np.zeros(len(ledger), dtype=np.int64)
+        inv_valid = np.zeros(len(ledger), dtype=bool)
+
+    variance = inv_cents - ledger_cents
+    comparable = inv_valid & ledger_valid
+    status = np.select(
+        [~has_invoice, ~inv_valid, comparable & (variance == 0), comparable & (np.abs(variance) <= tolerance_cents)],
+        [MISSING_INVOICE, UNREADABLE, MATCHED, WITHIN_TOLERANCE],
+        MISMATCHED,
+    )
+
+    invoice_ids = inv["invoice_id"].to_numpy(dtype=object)
+    out = pd.DataFrame({
+        "TransactionID": ledger["TransactionID"].to_numpy(),
+        "Invoice_ID": np.where(has_invoice, invoice_ids[safe_pos] if len(inv) else None, None),
+        "Ledger_Amount": np.where(ledger_valid, ledger_cents / 100, np.nan),
+        "Invoice_Amount": np.where(inv_valid, inv_cents / 100, np.nan),
+        "Variance_Cents": pd.array(np.where(comparable, variance, 0), dtype="Int64"),
+        "Match_Status": status,
+        "Match_Section": np.where(status == WITHIN_TOLERANCE, TOLERANCE_SECTION,
+                                  np.where(status == MATCHED, "", MATCH_SECTION)),
+    }, index=ledger.index)
+    out.loc[~comparable, "Variance_Cents"] = pd.NA
+
+    if include_orphans:
+        orphans = ~inv_ids.isin(ledger_ids)
+        if orphans.any():
+            orphan_cents, orphan_valid = inv_cents_all[orphans], inv_valid_all[orphans]
+            out = pd.concat([out, pd.DataFrame({
+                "TransactionID": inv["TransactionID"].to_numpy()[orphans],
+                "Invoice_ID": invoice_ids[orphans],
+                "Ledger_Amount": np.nan,
+                "Invoice_Amount": np.where(orphan_valid, orphan_cents / 100, np.nan),
+                "Variance_Cents": pd.array([pd.NA] * int(orphans.sum()), dtype="Int64"),
+                "Match_Status": ORPHAN_INVOICE,
+                "Match_Section": MATCH_SECTION,
+            })], ignore_index=True)
+    return out
+
+
+def mismatch_table(match: pd.DataFrame) -> pd.DataFrame:
+    """Only the rows that need attention (everything except exact / tolerated matches)."""
+    return match[~match["Match_Status"].isin((MATCHED, WITHIN_TOLERANCE))]
+
+
+def match_decision(match_row) -> str:
+    """Human-readable verdict for a three_way_match row (same style as the LLM answers)."""
+    status = match_row.Match_Status
+    if status == MISSING_INVOICE:
+        return f"VIOLATION: Section {MATCH_SECTION} - no invoice on file for this ledger entry."
+    if status == ORPHAN_INVOICE:
+        return f"VIOLATION: Section {MATCH_SECTION} - invoice {match_row.Invoice_ID} has no ledger entry."
+    if status == UNREADABLE:
+        return f"REVIEW: Section {MATCH_SECTION} - the total of invoice {match_row.Invoice_ID} could not be read."
+    if status == MISMATCHED:
+        if pd.isna(match_row.Variance_Cents):
+            return f"VIOLATION: Section {MATCH_SECTION} - invoice {match_row.Invoice_ID} amount could not be compared with the ledger."
+        return (f"VIOLATION: Section {MATCH_SECTION} - invoice {match_row.Invoice_ID} total ${match_row.Invoice_Amount:,.2f} "
+                f"does not match the ledger amount ${match_row.Ledger_Amount:,.2f} "
+                f"(variance {'+' if match_row.Variance_Cents > 0 else '-'}${abs(int(match_row.Variance_Cents)) / 100:,.2f}).")
+    if status == WITHIN_TOLERANCE:
+        return (f"COMPLIANT: Section {TOLERANCE_SECTION} - invoice {match_row.Invoice_ID} differs from the ledger by "
+                f"${abs(int(match_row.Variance_Cents)) / 100:,.2f}, within rounding tolerance.")
+    return f"COMPLIANT: invoice {match_row.Invoice_ID} matches the ledger amount exactly."
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Three-way match of the General Ledger against the invoice PDFs.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="processes parsing invoices")
+    parser.add_argument("--out", default=MATCH_REPORT_FILE)
+    parser.add_argument("--all", action="store_true", help="write every row, not only the mismatches")
+    args = parser.parse_args(argv)
+
+    agent = IngestionAgent()
+    invoices = agent.run_pipeline(workers=args.workers) or []
+    ledger = agent.ledger_df
+    if ledger is None or ledger.empty:
+        return
+
+    match = three_way_match(ledger, invoices)
+    report = match if args.all else mismatch_table(match)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    report.to_csv(args.out, index=False)
+    print(f"\n[*] Match summary: {match['Match_Status'].value_counts().to_dict()}")
+    print(f"[SUCCESS] Match report ({len(report)} rows) saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+# --- CONFIGURATION ---
+# Off by default; AUDIT_METRICS=1 (or main.py --metrics) turns it on
+METRICS_ENABLED = os.environ.get("AUDIT_METRICS", "0") == "1"
+METRICS_DIR = os.path.join("data", "metrics")
+METRICS_JSON = os.path.join(METRICS_DIR, "audit_metrics.json")
+METRICS_PROM = os.path.join(METRICS_DIR, "audit_metrics.prom")
+MAX_SAMPLES = 100_000  # per stage; beyond that percentiles come from a uniform reservoir
+PERCENTILES = (50, 95, 99)
+
+_NULL_TIMER = nullcontext()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for rate limiting."""
+    return max(1, len(text) // 4)
+
+
+def usage_tokens(message, prompt_text: str = "") -> tuple:
+    """(prompt tokens, response tokens) from a chat model reply; estimated when the model reports none."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    prompt = usage.get("input_tokens") or estimate_tokens(prompt_text)
+    response = usage.get("output_tokens") or estimate_tokens(str(getattr(message, "content", "")))
+    return prompt, response
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Per-stage wall time (count, total, percentiles) and plain counters for one audit run.
+    When disabled every call returns immediately (timer() hands back a shared no-op
+    context manager), so the hooks can stay in the hot path.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+        self._counters: Dict[str, float] = {}
+        self._rng = random.Random(0)
+        self._exporter: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.started = time.time()
+
+    def timer(self, stage: str):
+        """with METRICS.timer("llm_call"): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = {"count": 0, "total": 0.0, "max": 0.0, "samples": []}
+            s["count"] += 1
+            s["total"] += seconds
+            s["max"] = max(s["max"], seconds)
+            if len(s["samples"]) < MAX_SAMPLES:
+                s["samples"].append(seconds)
+            else:
+                j = self._rng.randrange(s["count"])
+                if j < MAX_SAMPLES:
+                    s["samples"][j] = seconds
+
+    def count(self, name: str, n: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def record_llm_call(self, seconds: float, prompt_tokens: int, response_tokens: int, tier: str = ""):
+        """One request to a model (single row or one batch)."""
+        if not self.enabled:
+            return
+        self.observe("llm_call", seconds)
+        self.count("llm_calls")
+        self.count("prompt_tokens", prompt_tokens)
+        self.count("response_tokens", response_tokens)
+        if tier:
+            self.count(f"llm_calls:{tier}")
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    # --- Export ---
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {}
+            for name, s in self._stages.items():
+                ordered = sorted(s["samples"])
+                stages[name] = {
+                    "count": s["count"],
+                    "total_s": s["total"],
+                    "mean_s": s["total"] / s["count"],
+                    "max_s": s["max"],
+                    **{f"p{q}_s": percentile(ordered, q) for q in PERCENTILES},
+                }
+            return {"started": self.started, "uptime_s": time.time() - self.started,
+                    "stages": stages, "counters": dict(self._counters)}
+
+    def to_prometheus(self, snapshot: Optional[dict] = None) -> str:
+        """Prometheus text exposition format (for the node_exporter textfile collector or a scrape)."""
+        snap = snapshot or self.snapshot()
+        lines = [
+            "# HELP audit_stage_seconds Wall time spent per audit pipeline stage.",
+            "# TYPE audit_stage_seconds summary",
+        ]
+        for name, s in sorted(snap["stages"].items()):
+            for q in PERCENTILES:
+                lines.append(f'audit_stage_seconds{{stage="{name}",quantile="{q / 100}"}} {s[f"p{q}_s"]:.6f}')
+            lines.append(f'audit_stage_seconds_sum{{stage="{name}"}} {s["total_s"]:.6f}')
+            lines.append(f'audit_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines += ["# HELP audit_events_total Counters of the audit run (calls, tokens, retries ...).",
+                  "# TYPE audit_events_total counter"]
+        for name, value in sorted(snap["counters"].items()):
+            metric, _, tier = name.partition(":")
+            labels = f'name="{metric}"' + (f',tier="{tier}"' if tier else "")
+            lines.append(f"audit_events_total{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str = METRICS_JSON, prom_path: str = METRICS_PROM):
+        """Writes both files atomically (a scraper never sees a half-written file)."""
+        if not self.enabled:
+            return
+        snap = self.snapshot()
+        for path, text in ((json_path, json.dumps(snap, indent=2)), (prom_path, self.to_prometheus(snap))):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+
+    def start_exporter(self, interval: float, json_path: str = METRICS_JSON, prom_path: str = METRICS_PROM):
+        """Re-writes the metric files every `interval` seconds during long runs."""
+        if not self.enabled or interval <= 0 or self._exporter is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.write(json_path, prom_path)
+
+        self._exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self):
+        if self._exporter is not None:
+            self._stop.set()
+            self._exporter.join()
+            self._exporter = None
+
+    def summary_table(self) -> str:
+        snap = self.snapshot()
+        lines = [f"{'STAGE':<18} | {'COUNT':>8} | {'TOTAL S':>9} | {'P50 MS':>8} | {'P95 MS':>8} | {'P99 MS':>8}",
+                 "-" * 72]
+        for name, s in sorted(snap["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(f"{name:<18} | {s['count']:>8,} | {s['total_s']:>9.3f} | {s['p50_s'] * 1000:>8.2f} | "
+                         f"{s['p95_s'] * 1000:>8.2f} | {s['p99_s'] * 1000:>8.2f}")
+        counters = ", ".join(f"{k}={v:,.0f}" for k, v in sorted(snap["counters"].items()))
+        if counters:
+            lines.append(counters)
+        return "\n".join(lines)
+
+
+# Process-wide instance used by the pipeline modules
+METRICS = Metrics()
@@ -0,0 +1,119 @@
+import os
+import re
+from typing import Callable, List, Optional, Tuple
+
+# --- CONFIGURATION ---
+# Models tried in order, cheapest first; only uncertain answers move up a tier.
+# One model by default (the one the audit always used); the cascade is opt-in,
+# e.g. AUDIT_MODEL_TIERS="gemini-2.0-flash-lite,gemini-2.0-flash,gemini-2.5-pro"
+DEFAULT_MODEL_TIERS = "gemini-2.0-flash"
+MODEL_TIERS = [m.strip() for m in os.environ.get("AUDIT_MODEL_TIERS", DEFAULT_MODEL_TIERS).split(",") if m.strip()]
+# Answers below this self-reported confidence are escalated to the next tier
+MIN_CONFIDENCE = float(os.environ.get("AUDIT_MIN_CONFIDENCE", 0.8))
+
+CONFIDENCE_PATTERN = re.compile(r"^\s*CONFIDENCE\s*[:=]\s*(\d+(?:\.\d+)?)\s*(%?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_confidence(text: str) -> Tuple[str, Optional[float]]:
+    """Splits the trailing 'CONFIDENCE: 0.9' line off an answer. Returns (answer, confidence or None)."""
+    match = None
+    for match in CONFIDENCE_PATTERN.finditer(text):
+        pass  # the last one wins
+    if match is None:
+        return text, None
+    answer = (text[:match.start()] + text[match.end():]).strip()
+    return answer, confidence_value(float(match.group(1)), bool(match.group(2)))
+
+
+def confidence_value(value: float, percent: bool = False) -> Optional[float]:
+    """
+    A reported confidence on the 0-1 scale. Percentages are "85%" or a bare 2-100;
+    a bare value just over 1 ("1.5") is an overshoot of the 0-1 scale and counts as 1.0.
+    Anything else out of range is None.
+    """
+    if percent or 2 <= value <= 100:
+        return value / 100 if 0 <= value <= 100 else None
+    if 0 <= value < 2:
+        return min(1.0, value)
+    return None
+
+
+def coerce_confidence(value) -> Optional[float]:
+    """Confidence field of a batch answer (0.93, "93%", ...) as a float, or None."""
+    percent = isinstance(value, str) and value.strip().endswith("%")
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return confidence_value(value, percent)
+
+
+def needs_escalation(answer: str, confidence: Optional[float], min_confidence: float = MIN_CONFIDENCE) -> bool:
+    """Malformed (no verdict or no confidence) or not confident enough."""
+    upper = answer.upper()
+    if "VIOLATION" not in upper and "COMPLIANT" not in upper:
+        return True
+    return confidence is None or confidence < min_confidence
+
+
+class ModelTier:
+    """One model of the cascade plus its running stats. The model itself is created on first use."""
+
+    def __init__(self, name: str, llm=None, factory: Optional[Callable] = None):
+        self.name = name
+        self._llm = llm
+        self._factory = factory
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.escalated = 0
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = self._factory()
+        return self._llm
+
+    def record(self, seconds: float, rows: int, escalated: int):
+        self.calls += 1
+        self.seconds += seconds
+        self.rows += rows
+        self.escalated += escalated
+
+    def stats(self) -> dict:
+        return {
+            "model": self.name,
+            "calls": self.calls,
+            "rows": self.rows,
+            "avg_latency_s": round(self.seconds / self.calls, 3) if self.calls else 0.0,
+            "escalation_rate": round(self.escalated / self.rows, 3) if self.rows else 0.0,
+        }
+
+
+def model_name_of(llm) -> str:
+    return getattr(llm, "model", None) or getattr(llm, "model_name", None) or llm._llm_type
+
+
+def gemini_factory(name: str) -> Callable:
+    """Creates the Gemini client when called (importing langchain_google_genai alone takes about a second)."""
+    def create():
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model=name,
+            temperature=0,
+            google_api_key=os.environ.get("GOOGLE_API_KEY")
+        )
+    return create
+
+
+def build_tiers(llms: Optional[List] = None, names: Optional[List[str]] = None) -> List[ModelTier]:
+    """
+    Tiers from injected chat models (e.g. fake_llm.FakeAuditLLM for offline runs),
+    otherwise one Gemini model per configured name.
+    """
+    if llms:
+        return [ModelTier(model_name_of(llm), llm) for llm in llms]
+
+    return [ModelTier(name, factory=gemini_factory(name)) for name in (names or MODEL_TIERS)]
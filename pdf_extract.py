@@ -0,0 +1,88 @@
+import os
+import re
+from typing import Callable, Dict, Iterator, Optional
+
+# --- CONFIGURATION ---
+# The line every vendor invoice ends its money section with (see IngestionAgent.parse_invoice)
+TOTAL_MARKER = re.compile(r"Total Amount:\s*\$[\d,]+\.\d{2}")
+
+
+class PdfBackend:
+    """Interface: yields the text of each page of a PDF, in order."""
+
+    name = "base"
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    def extract(self, path: str, separator: str = "\n") -> str:
+        return separator.join(self.iter_pages(path))
+
+
+class PypdfBackend(PdfBackend):
+    """pypdf text layer only (what langchain's PyPDFLoader uses underneath)."""
+
+    name = "pypdf"
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+class PdfplumberBackend(PdfBackend):
+    """pdfplumber (pdfminer layout analysis): slower, better on complex layouts."""
+
+    name = "pdfplumber"
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+
+
+class FastTotalBackend(PdfBackend):
+    """
+    Page-limited fast path: reads pages with `inner` and stops as soon as the
+    "Total Amount" line has been seen, so long invoices with the total up front
+    are not parsed to the end.
+    """
+
+    name = "fast-total"
+
+    def __init__(self, inner: Optional[PdfBackend] = None, max_pages: Optional[int] = None):
+        self.inner = inner or PypdfBackend()
+        self.max_pages = max_pages
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        for number, text in enumerate(self.inner.iter_pages(path), start=1):
+            yield text
+            if TOTAL_MARKER.search(text) or (self.max_pages and number >= self.max_pages):
+                return
+
+
+def _template_backend() -> PdfBackend:
+    from invoice_templates import TemplateBackend  # per-vendor field boxes over pdfplumber
+    return TemplateBackend()
+
+
+BACKENDS: Dict[str, Callable[[], PdfBackend]] = {
+    PypdfBackend.name: PypdfBackend,
+    PdfplumberBackend.name: PdfplumberBackend,
+    FastTotalBackend.name: FastTotalBackend,
+    "template": _template_backend,
+}
+
+
+def get_backend(name: str) -> PdfBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend '{name}'. Choose from: {', '.join(BACKENDS)}") from None
+
+
+def default_backend(env_var: str, fallback: str) -> PdfBackend:
+    """Backend named by an environment variable (e.g. AUDIT_PDF_BACKEND), else `fallback`."""
+    return get_backend(os.environ.get(env_var, fallback))
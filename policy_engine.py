@@ -1,36 +1,362 @@
+import hashlib
+import json
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate 
+import re
+import time
+from typing import List
+from verdict_cache import VerdictCache, CACHE_DIR
+from policy_index import PolicyIndex
+from metrics import METRICS, usage_tokens
+from model_cascade import MIN_CONFIDENCE, build_tiers, coerce_confidence, needs_escalation, parse_confidence
 
 # --- CONFIGURATION ---
 POLICY_PATH = "data/Company_Policy.pdf"
+POLICY_CACHE_FILE = os.path.join(CACHE_DIR, "policy_text.json")
+# Register the policy once as a Gemini cached context (falls back to sending it inline)
+USE_CONTEXT_CACHE = os.environ.get("AUDIT_CONTEXT_CACHE", "1") != "0"
+CONTEXT_CACHE_TTL_SECONDS = 3600
+# Send only the top-k policy sections per transaction, on top of the approval-limit chapter
+# which is always sent (0 = always send the whole policy). Off by default: retrieval turns
+# the context cache off (the sections differ per transaction, and the instructions alone
+# are far below Gemini's minimum cacheable size)
+POLICY_TOP_K = int(os.environ.get("AUDIT_POLICY_TOP_K", 0))
+
+# Direct Prompting: the policy + instructions are a fixed prefix, only the transaction varies
+SYSTEM_TEMPLATE = """
+        You are a strict Internal Audit AI. Compare the transaction below against the Policy Rules.
+        
+        POLICY RULES:
+        {policy_text}
+        
+        INSTRUCTIONS:
+        1. If the transaction violates a rule, say "VIOLATION" and cite the specific section (e.g., Section 4.1).
+        2. If it is allowed, say "COMPLIANT".
+        3. Be brief and professional.
+        4. End with a final line "CONFIDENCE: <0.0-1.0>" saying how sure you are of the verdict.
+        """
+
+HUMAN_TEMPLATE = """
+        TRANSACTION TO AUDIT:
+        {question}
+        
+        Answer:
+        """
+
+# Batch mode: K transactions per request, answered as a JSON array
+BATCH_HUMAN_TEMPLATE = """
+        TRANSACTIONS TO AUDIT (one per block):
+        {question}
+        
+        Audit EVERY transaction above independently.
+        Where invoice evidence is given, also check that the invoice amount matches the ledger amount.
+        Respond with ONLY a JSON array, one object per transaction, in this exact shape:
+        [{{"TransactionID": "<id>", "status": "VIOLATION" or "COMPLIANT", "section": "<cited section or empty>", "reason": "<one sentence>", "confidence": <0.0-1.0>}}]
+        """
+DEFAULT_BATCH_SIZE = 25
+BATCH_MAX_ROUNDS = 2  # re-asks for missing/malformed rows before falling back to one call per row
+
+VERDICT_STATUSES = ("VIOLATION", "COMPLIANT")
+SECTION_PATTERN = re.compile(r"Section\s+(\d+(?:\.\d+)*)", re.IGNORECASE)
+JSON_ARRAY_PATTERN = re.compile(r"\[.*\]", re.DOTALL)
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def parse_batch_response(text: str, expected_ids) -> dict:
+    """
+    Validates a batch answer. Returns {TransactionID: verdict} for the well-formed
+    entries only; anything missing, unknown or malformed is simply left out.
+    """
+    match = JSON_ARRAY_PATTERN.search(text)  # tolerates ```json fences and chatter
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    expected = set(expected_ids)
+    verdicts = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        txn_id = str(item.get("TransactionID", "")).strip()
+        status = str(item.get("status", "")).strip().upper()
+        reason = item.get("reason")
+        if txn_id not in expected or status not in VERDICT_STATUSES or not isinstance(reason, str) or not reason:
+            continue
+        section = item.get("section") or ""
+        verdicts[txn_id] = {
+            "TransactionID": txn_id,
+            "status": status,
+            "section": str(section).replace("Section", "").strip(),
+            "reason": reason.strip(),
+            "confidence": coerce_confidence(item.get("confidence")),
+        }
+    return verdicts
+
+def verdict_from_text(txn_id: str, text: str) -> dict:
+    """Turns a free-text answer (single-row mode) into the structured batch verdict."""
+    section = SECTION_PATTERN.search(text)
+    if text.startswith(("Error:", "⚠️")):
+        status = "ERROR"
+    else:
+        status = "VIOLATION" if "VIOLATION" in text.upper() else "COMPLIANT"
+    return {
+        "TransactionID": txn_id,
+        "status": status,
+        "section": section.group(1) if section else "",
+        "reason": text.strip().replace("\n", " "),
+    }
+
+def format_verdict(verdict: dict) -> str:
+    """Report text for a structured verdict, same shape as the single-row answers."""
+    cited = f" (Section {verdict['section']})" if verdict["section"] else ""
+    return f"{verdict['status']}{cited}: {verdict['reason']}"
 
 class PolicyAgent:
-    def __init__(self):
-        # FIX: We use the EXACT model name found in your list
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash", 
-            temperature=0,
-            google_api_key=os.environ.get("GOOGLE_API_KEY")
-        )
+    def __init__(self, llm=None, cache=None, top_k=POLICY_TOP_K, tiers=None, min_confidence=MIN_CONFIDENCE):
+        # Any LangChain chat model can be injected (e.g. fake_llm.FakeAuditLLM for offline runs);
+        # `tiers` injects a whole cascade. Otherwise the models come from AUDIT_MODEL_TIERS.
+        # Gemini clients (and their imports) are only created when a tier is first called
+        self.tiers = build_tiers(tiers or ([llm] if llm is not None else None))
+        self.min_confidence = min_confidence
         self.policy_text = ""
+        self.policy_hash = ""
+        self._policy_stamp = None  # (mtime, size) of the PDF the text came from
+        self._chains = {}  # human template -> chain, for the current policy version
+        self._chain_policy = None  # policy text the chains were built for
+        self._chain_expires = 0.0
+        self._context_cache_names = {}  # tier index -> Gemini cached context (or None)
+        self.top_k = top_k
+        self._index = None  # loaded on first retrieval
+        self._pinned = None  # (policy hash, section indices always retrieved)
+        # Verdicts are deterministic (temperature 0), so identical requests are answered from disk
+        self.cache = cache if cache is not None else VerdictCache()
+
+    @property
+    def llm(self):
+        """The first (cheapest) tier."""
+        return self.tiers[0].llm
+
+    @property
+    def model_name(self) -> str:
+        return "+".join(tier.name for tier in self.tiers)
+
+    def _prompt_id(self, human_template: str) -> str:
+        # Retrieval and the escalation threshold change the answer, so they are part of the cache key
+        retrieval = f"\x00retrieval:top{self.top_k}" if self.top_k else ""
+        cascade = f"\x00min_confidence:{self.min_confidence}" if len(self.tiers) > 1 else ""
+        return SYSTEM_TEMPLATE + human_template + retrieval + cascade
+
+    def tier_stats(self):
+        """Per-model calls, average latency and escalation rate."""
+        return [tier.stats() for tier in self.tiers]
+
+    def _cache_key(self, query: str) -> str:
+        return VerdictCache.make_key(self.policy_text, self._prompt_id(HUMAN_TEMPLATE), self.model_name, query)
+
+    @property
+    def index(self) -> PolicyIndex:
+        """Section index of the current policy (read from disk, rebuilt when the PDF hash changes)."""
+        if self._index is None or self._index.policy_hash != self.policy_hash:
+            self._index = PolicyIndex.load_or_build(self.policy_text, self.policy_hash)
+        return self._index
+
+    @property
+    def pinned_sections(self) -> List[int]:
+        """
+        Sections every retrieval prompt carries: the chapter holding the approval
+        limits. A row's amount rarely shares a word with the clause that caps it
+        ("$12000.0" vs "above $10,000"), so BM25 alone would miss it.
+        """
+        if self._pinned is None or self._pinned[0] != self.policy_hash:
+            from doa_rules import compile_doa_rules
+            limits = compile_doa_rules(self.policy_text).sections.values()
+            self._pinned = (self.policy_hash, self.index.chapter_sections(limits))
+        return self._pinned[1]
+
+    def retrieved_sections(self, query: str) -> List[str]:
+        """Section numbers retrieval sends with this transaction (recorded with its verdict)."""
+        sections = self.index.sections
+        return [sections[i]["section"] for i in self.index.retrieve(query, self.top_k, self.pinned_sections)]
+
+    def policy_context(self, queries) -> str:
+        """The policy text the model gets for these transactions: their retrieved sections, or everything."""
+        if not self.top_k:
+            return self.policy_text
+        if isinstance(queries, str):
+            queries = [queries]
+        return self.index.excerpt(queries, self.top_k, self.pinned_sections)
+
+    def _prompt_inputs(self, question: str, queries) -> dict:
+        if not self.top_k:
+            return {"question": question}  # the policy is already a fixed part of the chain
+        return {"question": question, "policy_text": self.policy_context(queries)}
+
+    def cached_verdict(self, query: str):
+        """Returns the stored verdict for this query, or None (without calling the LLM)."""
+        if not self.policy_text:
+            self.ingest_policy()
+        return self.cache.get(self._cache_key(query))
 
     def ingest_policy(self):
-        """Reads the PDF directly into text"""
+        """Reads the PDF directly into text (re-uses the on-disk copy if the PDF is unchanged)"""
         if not os.path.exists(POLICY_PATH):
             return "❌ Error: Policy PDF not found!"
 
+        stat = os.stat(POLICY_PATH)
+        stamp = (stat.st_mtime, stat.st_size)
+        if self.policy_text and stamp == self._policy_stamp:
+            return "✅ Policy already loaded."
+
         try:
-            loader = PyPDFLoader(POLICY_PATH)
-            pages = loader.load()
-            # Combine all pages into one simple text string
-            self.policy_text = "\n".join([p.page_content for p in pages])
+            cached = self._load_policy_cache()
+            if cached and (cached["mtime"], cached["size"]) == stamp:
+                self._set_policy(cached["text"], cached["sha256"], stamp)
+                return "✅ Policy loaded from cache."
+
+            # mtime changed: only re-parse if the content actually changed
+            digest = file_sha256(POLICY_PATH)
+            if cached and cached["sha256"] == digest:
+                text = cached["text"]
+            else:
+                from langchain_community.document_loaders import PyPDFLoader
+                loader = PyPDFLoader(POLICY_PATH)
+                pages = loader.load()
+                # Combine all pages into one simple text string
+                text = "\n".join([p.page_content for p in pages])
+            self._set_policy(text, digest, stamp)
+            self._save_policy_cache()
             return "✅ Policy read successfully!"
         except Exception as e:
             return f"❌ Error reading PDF: {e}"
 
-    def check_policy(self, query: str) -> str:
+    def _set_policy(self, text, digest, stamp):
+        self.policy_text = text
+        self.policy_hash = digest
+        self._policy_stamp = stamp
+
+    def _load_policy_cache(self):
+        try:
+            with open(POLICY_CACHE_FILE, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cached if cached.get("path") == os.path.abspath(POLICY_PATH) else None
+
+    def _save_policy_cache(self):
+        os.makedirs(os.path.dirname(POLICY_CACHE_FILE), exist_ok=True)
+        tmp = POLICY_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "path": os.path.abspath(POLICY_PATH),
+                "mtime": self._policy_stamp[0],
+                "size": self._policy_stamp[1],
+                "sha256": self.policy_hash,
+                "text": self.policy_text,
+            }, f)
+        os.replace(tmp, POLICY_CACHE_FILE)
+
+    def _register_context_cache(self, llm):
+        """
+        Uploads the policy prefix once as a Gemini cached context.
+        Returns the cache name, or None when the backend can't cache it
+        (other models, per-transaction policy retrieval, or a policy below
+        Gemini's minimum cacheable size).
+        """
+        # Checked by module so that injected models never import the Gemini client
+        if not USE_CONTEXT_CACHE or not type(llm).__module__.startswith("langchain_google_genai"):
+            return None
+        if self.top_k:
+            print(f"[*] Context cache off: policy retrieval (top {self.top_k}) sends different sections per "
+                  f"transaction; set AUDIT_POLICY_TOP_K=0 to cache the whole policy instead")
+            return None
+        from langchain_core.messages import SystemMessage
+        from langchain_google_genai import create_context_cache
+        try:
+            system = SystemMessage(content=SYSTEM_TEMPLATE.format(policy_text=self.policy_text))
+            return create_context_cache(llm, [system], ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s")
+        except Exception as e:
+            print(f"[*] Context cache unavailable, sending policy inline ({e})")
+            return None
+
+    def _build_chain(self, human_template: str = HUMAN_TEMPLATE, tier: int = 0):
+        """Built once per policy version (and prompt shape and tier) and reused for every transaction."""
+        if self._chain_policy != self.policy_text or time.time() >= self._chain_expires:
+            self._chains = {}
+            self._context_cache_names = {}
+            self._chain_expires = float("inf")
+            self._chain_policy = self.policy_text
+
+        llm = self.tiers[tier].llm
+        if tier not in self._context_cache_names:
+            name = self._register_context_cache(llm)
+            self._context_cache_names[tier] = name
+            if name:
+                # Re-register a little before the server-side cache expires
+                self._chain_expires = min(self._chain_expires, time.time() + CONTEXT_CACHE_TTL_SECONDS - 60)
+        context_cache_name = self._context_cache_names[tier]
+
+        chain = self._chains.get((tier, human_template))
+        if chain is None:
+            from langchain_core.prompts import ChatPromptTemplate
+            if context_cache_name:
+                # Only the per-transaction suffix is sent; the policy lives server side
+                prompt = ChatPromptTemplate.from_messages([("human", human_template)])
+                chain = prompt | llm.bind(cached_content=context_cache_name)
+            else:
+                prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_TEMPLATE), ("human", human_template)])
+                if not self.top_k:
+                    prompt = prompt.partial(policy_text=self.policy_text)
+                chain = prompt | llm
+            self._chains[(tier, human_template)] = chain
+        return chain
+
+    def _record_call(self, tier: int, inputs: dict, response, started: float):
+        if METRICS.enabled:
+            prompt_tokens, response_tokens = usage_tokens(response, SYSTEM_TEMPLATE + "".join(inputs.values()))
+            METRICS.record_llm_call(time.perf_counter() - started, prompt_tokens, response_tokens,
+                                    self.tiers[tier].name)
+
+    def _accept_answer(self, tier: int, content: str, started: float):
+        """Cascade step for one row: the answer without its confidence line, or None to escalate."""
+        with METRICS.timer("verdict_parse"):
+            answer, confidence = parse_confidence(content)
+            last = tier == len(self.tiers) - 1
+            escalate = not last and needs_escalation(answer, confidence, self.min_confidence)
+        self.tiers[tier].record(time.perf_counter() - started, rows=1, escalated=int(escalate))
+        return None if escalate else answer
+
+    def _ask(self, query: str) -> str:
+        """Runs one transaction up the cascade until a tier is confident. API errors are raised."""
+        for tier in range(len(self.tiers)):
+            started = time.perf_counter()
+            inputs = self._prompt_inputs(query, query)
+            response = self._build_chain(HUMAN_TEMPLATE, tier).invoke(inputs)
+            self._record_call(tier, inputs, response, started)
+            answer = self._accept_answer(tier, response.content, started)
+            if answer is not None:
+                return answer
+
+    async def _aask(self, query: str) -> str:
+        """Async version of _ask."""
+        for tier in range(len(self.tiers)):
+            started = time.perf_counter()
+            inputs = self._prompt_inputs(query, query)
+            response = await self._build_chain(HUMAN_TEMPLATE, tier).ainvoke(inputs)
+            self._record_call(tier, inputs, response, started)
+            answer = self._accept_answer(tier, response.content, started)
+            if answer is not None:
+                return answer
+
+    def check_policy(self, query: str, use_cache: bool = True) -> str:
         """Asks Gemini to check the policy text directly"""
         
         # If policy hasn't been read yet, read it now
@@ -40,33 +366,154 @@ class PolicyAgent:
         if not self.policy_text:
             return "⚠️ Policy is empty. Please check the PDF."
 
-        # Direct Prompting
-        prompt_template = """
-        You are a strict Internal Audit AI. Compare the transaction below against the Policy Rules.
-        
-        POLICY RULES:
-        {policy_text}
-        
-        TRANSACTION TO AUDIT:
-        {question}
-        
-        INSTRUCTIONS:
-        1. If the transaction violates a rule, say "VIOLATION" and cite the specific section (e.g., Section 4.1).
-        2. If it is allowed, say "COMPLIANT".
-        3. Be brief and professional.
-        
-        Answer:
-        """
-        
-        prompt = PromptTemplate(
-            template=prompt_template, 
-            input_variables=["policy_text", "question"]
-        )
-        
-        chain = prompt | self.llm
-        
+        key = self._cache_key(query)
+        if use_cache:
+            # use_cache=False only skips the lookup; fresh answers are still stored
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
         try:
-            response = chain.invoke({"policy_text": self.policy_text, "question": query})
-            return response.content
+            answer = self._ask(query)
         except Exception as e:
-            return f"Error: {e}"
\ No newline at end of file
+            return f"Error: {e}"
+        self.cache.put(key, answer)
+        return answer
+
+    async def acheck_policy(self, query: str, use_cache: bool = True) -> str:
+        """
+        Async version of check_policy (uses chain.ainvoke).
+        Unlike check_policy, API errors are raised so the caller can retry / back off.
+        """
+        if not self.policy_text:
+            self.ingest_policy()
+
+        if not self.policy_text:
+            return "⚠️ Policy is empty. Please check the PDF."
+
+        key = self._cache_key(query)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        answer = await self._aask(query)
+        self.cache.put(key, answer)
+        return answer
+
+    # --- Batch mode ---
+
+    def _batch_cache_key(self, transaction: dict) -> str:
+        return VerdictCache.make_key(self.policy_text, self._prompt_id(BATCH_HUMAN_TEMPLATE),
+                                     self.model_name, transaction["query"])
+
+    def cached_batch_verdict(self, transaction: dict):
+        """Stored structured verdict for one batch row, or None."""
+        if not self.policy_text:
+            self.ingest_policy()
+        cached = self.cache.get(self._batch_cache_key(transaction))
+        return json.loads(cached) if cached is not None else None
+
+    def _batch_question(self, transactions) -> str:
+        return "\n".join(f"- TransactionID: {t['TransactionID']}\n  {t['query']}" for t in transactions)
+
+    def _accept_batch(self, transactions, text: str, tier: int, started: float):
+        """
+        Stores the valid verdicts of one batch answer and returns (verdicts, rows to pass on).
+        Below the last tier, rows answered without enough confidence are passed on too.
+        """
+        last = tier == len(self.tiers) - 1
+        with METRICS.timer("verdict_parse"):
+            parsed = parse_batch_response(text, [str(t["TransactionID"]) for t in transactions])
+        verdicts = {}
+        missing = []
+        for t in transactions:
+            verdict = parsed.get(str(t["TransactionID"]))
+            if verdict is None or (not last and (verdict["confidence"] or 0.0) < self.min_confidence):
+                missing.append(t)
+            else:
+                verdicts[verdict["TransactionID"]] = verdict
+                self.cache.put(self._batch_cache_key(t), json.dumps(verdict))
+        self.tiers[tier].record(time.perf_counter() - started, rows=len(transactions),
+                                escalated=0 if last else len(missing))
+        return verdicts, missing
+
+    def batch_round(self, transactions):
+        """
+        One request for up to K rows, plus one per higher tier for the rows it was unsure of.
+        Returns (verdicts, rows to re-queue). API errors are raised.
+        """
+        verdicts, pending = {}, transactions
+        for tier in range(len(self.tiers)):
+            started = time.perf_counter()
+            chain = self._build_chain(BATCH_HUMAN_TEMPLATE, tier)
+            inputs = self._prompt_inputs(self._batch_question(pending), [t["query"] for t in pending])
+            response = chain.invoke(inputs)
+            self._record_call(tier, inputs, response, started)
+            accepted, pending = self._accept_batch(pending, response.content, tier, started)
+            verdicts.update(accepted)
+            if not pending:
+                break
+        return verdicts, pending
+
+    async def abatch_round(self, transactions):
+        """Async version of batch_round (used by audit_executor)."""
+        verdicts, pending = {}, transactions
+        for tier in range(len(self.tiers)):
+            started = time.perf_counter()
+            chain = self._build_chain(BATCH_HUMAN_TEMPLATE, tier)
+            inputs = self._prompt_inputs(self._batch_question(pending), [t["query"] for t in pending])
+            response = await chain.ainvoke(inputs)
+            self._record_call(tier, inputs, response, started)
+            accepted, pending = self._accept_batch(pending, response.content, tier, started)
+            verdicts.update(accepted)
+            if not pending:
+                break
+        return verdicts, pending
+
+    def check_policy_batch(self, transactions, batch_size: int = DEFAULT_BATCH_SIZE,
+                           max_rounds: int = BATCH_MAX_ROUNDS, use_cache: bool = True) -> dict:
+        """
+        Audits many transactions with K rows per request.
+        `transactions` are dicts with "TransactionID" and "query" (the row to audit).
+        Returns {TransactionID: {"TransactionID", "status", "section", "reason"}}.
+        Rows missing from (or malformed in) an answer are re-queued; after
+        `max_rounds` they are audited one at a time with check_policy.
+        """
+        if not self.policy_text:
+            self.ingest_policy()
+        if not self.policy_text:
+            return {str(t["TransactionID"]): verdict_from_text(str(t["TransactionID"]), "⚠️ Policy is empty. Please check the PDF.")
+                    for t in transactions}
+
+        results = {}
+        pending = []
+        for t in transactions:
+            cached = self.cached_batch_verdict(t) if use_cache else None
+            if cached is not None:
+                results[str(t["TransactionID"])] = cached
+            else:
+                pending.append(t)
+
+        batch_size = max(1, int(batch_size))
+        for _ in range(max_rounds):
+            if not pending:
+                break
+            retry = []
+            for i in range(0, len(pending), batch_size):
+                batch = pending[i:i + batch_size]
+                try:
+                    verdicts, missing = self.batch_round(batch)
+                except Exception as e:
+                    print(f"[!] Batch request failed, re-queueing {len(batch)} rows: {e}")
+                    retry.extend(batch)
+                    continue
+                results.update(verdicts)
+                retry.extend(missing)
+            pending = retry
+
+        # Whatever the model still did not answer properly is audited row by row
+        for t in pending:
+            txn_id = str(t["TransactionID"])
+            results[txn_id] = verdict_from_text(txn_id, self.check_policy(t["query"], use_cache=use_cache))
+        return results
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from audit_history import AuditHistory, SECTION_PATTERN
+from doa_rules import compile_doa_rules, prescreen
+from match_engine import MATCH_SECTION, TOLERANCE_SECTION, MISMATCHED, WITHIN_TOLERANCE
+from policy_index import split_sections
+from verdict_cache import CACHE_DIR
+
+# --- CONFIGURATION ---
+VERSIONS_FILE = os.path.join(CACHE_DIR, "policy_versions.json")
+MAX_VERSIONS = 20
+IMPACT_FILE = os.path.join("data", "policy_impact.csv")
+# A verdict that depends on everything: the model was shown the whole policy (no retrieval),
+# or no sections were recorded for it
+WHOLE_POLICY = "*"
+
+
+def section_key(section: str) -> tuple:
+    """'1.10' sorts after '1.9'."""
+    return tuple(int(p) if p.isdigit() else 0 for p in section.split("."))
+
+
+def relied_sections(decision: str, screen_row=None, match_row=None, retrieved: Iterable[str] = ()) -> str:
+    """
+    The policy sections one verdict depends on, comma separated: every section
+    the answer cites, the approver's limit clause (DoA pre-screen), the
+    invoice-match clauses, and the sections retrieval sent to the model
+    (WHOLE_POLICY when the model was sent all of it).
+    """
+    if WHOLE_POLICY in retrieved:
+        return WHOLE_POLICY
+    sections = set(SECTION_PATTERN.findall(decision or ""))
+    doa_section = getattr(screen_row, "DoA_Section", None)
+    if isinstance(doa_section, str) and doa_section:
+        sections.add(doa_section)
+    if match_row is not None:
+        sections.add(MATCH_SECTION)
+        if match_row.Match_Status in (WITHIN_TOLERANCE, MISMATCHED):
+            sections.add(TOLERANCE_SECTION)
+    sections.update(s for s in retrieved if s)
+    return ",".join(sorted(sections, key=section_key)) or WHOLE_POLICY
+
+
+# --- Policy versions ---
+
+def load_versions(path: str = VERSIONS_FILE) -> List[dict]:
+    """Recorded policy versions, oldest first: {"policy_hash", "ingested", "sections": {number: text}}."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def policy_version(policy_text: str, policy_hash: str) -> dict:
+    return {"policy_hash": policy_hash, "ingested": time.time(),
+            "sections": {s["section"]: s["text"] for s in split_sections(policy_text)}}
+
+
+def record_policy_version(policy_text: str, policy_hash: str, path: str = VERSIONS_FILE) -> bool:
+    """
+    Remembers the sections of the policy an audit run is about to use (called by
+    the runs that write verdicts, not on every ingest). False if it is already
+    the current version.
+    """
+    versions = load_versions(path)
+    if not policy_text or (versions and versions[-1]["policy_hash"] == policy_hash):
+        return False
+    versions = [v for v in versions if v["policy_hash"] != policy_hash]  # a reverted edit becomes current again
+    versions.append(policy_version(policy_text, policy_hash))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(versions[-MAX_VERSIONS:], f)
+    os.replace(tmp, path)
+    return True
+
+
+def find_version(versions: List[dict], ref: Optional[str], default: int) -> Optional[dict]:
+    """A version by hash prefix, or by position (default -1 = current, -2 = previous)."""
+    if ref:
+        matches = [v for v in versions if v["policy_hash"].startswith(ref)]
+        return matches[-1] if matches else None
+    return versions[default] if len(versions) >= abs(default) else None
+
+
+def version_text(version: dict) -> str:
+    return "\n".join(version["sections"].values())
+
+
+def diff_sections(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    """Section numbers whose text changed (whitespace ignored), was added or was removed."""
+    def norm(text):
+        return " ".join(text.split())
+    return {
+        "changed": sorted((s for s in old.keys() & new.keys() if norm(old[s]) != norm(new[s])), key=section_key),
+        "added": sorted(new.keys() - old.keys(), key=section_key),
+        "removed": sorted(old.keys() - new.keys(), key=section_key),
+    }
+
+
+# --- Impact ---
+
+def rule_affected(ledger: pd.DataFrame, old_text: str, new_text: str, touched: set) -> pd.Series:
+    """
+    Rows whose DoA outcome moves under the new policy (limit, governing clause
+    or status), plus rows now governed by a touched section. Vectorized per chunk.
+    """
+    old = prescreen(ledger, compile_doa_rules(old_text))
+    new = prescreen(ledger, compile_doa_rules(new_text))
+    moved = ((old["DoA_Status"] != new["DoA_Status"])
+             | (old["DoA_Section"].fillna("") != new["DoA_Section"].fillna(""))
+             | ~((old["DoA_Limit"] == new["DoA_Limit"]) | (old["DoA_Limit"].isna() & new["DoA_Limit"].isna())))
+    return moved | new["DoA_Section"].isin(touched)
+
+
+def impact(ledger_path: str, old: dict, new: dict, history: Optional[AuditHistory] = None, run: str = "latest",
+           chunk_size: int = 200_000) -> pd.DataFrame:
+    """
+    Transactions a policy change can affect, with the reason: their last verdict
+    relied on a changed / removed section (from the history store), or a
+    changed / added rule now matches them. Everything else keeps its verdict.
+
+    An added section reaches model verdicts through WHOLE_POLICY (made without
+    retrieval), and rows only through the DoA rules it compiles to: a verdict
+    made with retrieval (AUDIT_POLICY_TOP_K) is not re-audited because the new
+    section would now be retrieved for it.
+    """
+    diff = diff_sections(old["sections"], new["sections"])
+    touched = set(diff["changed"]) | set(diff["added"]) | set(diff["removed"])
+    found: Dict[str, str] = {}
+    if not touched:
+        return pd.DataFrame(columns=["TransactionID", "Reason"])
+
+    # 1. Verdicts that relied on a touched section (or whose sections are unknown)
+    history = history or AuditHistory()
+    for txn_id, sections in history.relied_on(sorted(touched) + [WHOLE_POLICY], run).itertuples(index=False):
+        relied = set((sections or WHOLE_POLICY).split(","))
+        hit = sorted(relied & touched, key=section_key)
+        found[txn_id] = f"relied on {', '.join(hit)}" if hit else "relied on the whole policy"
+
+    # 2. Rows the edited rules now match (a new limit, a new clause for a role ...)
+    old_text, new_text = version_text(old), version_text(new)
+    for chunk in pd.read_csv(ledger_path, usecols=["TransactionID", "Approver", "Amount"], chunksize=chunk_size):
+        mask = rule_affected(chunk, old_text, new_text, touched).to_numpy()
+        for txn_id in chunk["TransactionID"].astype(str).to_numpy()[mask]:
+            found.setdefault(txn_id, "rule now matches")
+    return pd.DataFrame(sorted(found.items()), columns=["TransactionID", "Reason"])
+
+
+def current_versions(old_ref: Optional[str] = None, new_ref: Optional[str] = None):
+    """
+    (old, new) versions. The policy on disk is the current one; if no run has
+    used it yet it is compared in memory (the re-audit records it).
+    """
+    from policy_engine import PolicyAgent
+    agent = PolicyAgent()
+    print(f"[*] {agent.ingest_policy()}")
+    versions = load_versions()
+    if agent.policy_text and (not versions or versions[-1]["policy_hash"] != agent.policy_hash):
+        versions = [v for v in versions if v["policy_hash"] != agent.policy_hash]
+        versions.append(policy_version(agent.policy_text, agent.policy_hash))
+    return find_version(versions, old_ref, -2), find_version(versions, new_ref, -1)
+
+
+def print_diff(old: dict, new: dict):
+    diff = diff_sections(old["sections"], new["sections"])
+    print(f"[*] Policy {old['policy_hash'][:12]} -> {new['policy_hash'][:12]}: "
+          f"{len(diff['changed'])} changed, {len(diff['added'])} added, {len(diff['removed'])} removed")
+    for kind in ("changed", "added", "removed"):
+        for section in diff[kind]:
+            print(f"\n  [{kind.upper()}] Section {section}")
+            if section in old["sections"]:
+                print(f"    - {' '.join(old['sections'][section].split())}")
+            if section in new["sections"]:
+                print(f"    + {' '.join(new['sections'][section].split())}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Policy-change impact: diff policy versions and re-audit only what changed.",
+        epilog="An added section reaches rows its DoA rules now match and verdicts made without retrieval; "
+               "a verdict made with retrieval (AUDIT_POLICY_TOP_K > 0) is not re-audited just because the "
+               "new section would now be retrieved for it.")
+    parser.add_argument("--old", help="old policy version (hash prefix; default: the previous version)")
+    parser.add_argument("--new", help="new policy version (hash prefix; default: the current version)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("versions", help="list the policy versions audit runs have used")
+    sub.add_parser("diff", help="sections that changed between two policy versions")
+    i = sub.add_parser("impact", help="transactions whose verdicts a policy change can affect")
+    i.add_argument("--run", default="latest", help="history run holding the verdicts to check")
+    i.add_argument("--out", default=IMPACT_FILE)
+    r = sub.add_parser("reaudit", help="incremental audit that re-decides only the affected transactions")
+    r.add_argument("--run", default="latest")
+    r.add_argument("--stream", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "versions":
+        for v in load_versions():
+            print(f"{v['policy_hash'][:12]}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(v['ingested']))}  "
+                  f"{len(v['sections'])} sections")
+        return
+
+    old, new = current_versions(args.old, args.new)
+    if old is None or new is None:
+        print("❌ Need two policy versions (a version is recorded when an audit run first uses it).")
+        return
+    print_diff(old, new)
+    if args.command == "diff":
+        return
+
+    import main as audit  # only the re-audit needs the audit pipeline
+    start = time.perf_counter()
+    affected = impact(audit.LEDGER_FILE, old, new, run=args.run)
+    print(f"\n[*] {len(affected):,} transactions affected ({time.perf_counter() - start:.2f}s): "
+          f"{affected['Reason'].str.split().str[0].value_counts().to_dict() if len(affected) else {}}")
+    if args.command == "impact":
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        affected.to_csv(args.out, index=False)
+        print(f"[SUCCESS] Affected transactions saved to: {args.out}")
+        return
+    audit.main(incremental=True, stream=args.stream, reaudit=set(affected["TransactionID"]))
+
+
+if __name__ == "__main__":
+    main()
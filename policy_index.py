@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from verdict_cache import CACHE_DIR
+
+# --- CONFIGURATION ---
+INDEX_FILE = os.path.join(CACHE_DIR, "policy_index.json")
+INDEX_VERSION = 1  # bump when the splitter or tokenizer changes
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# "1. Delegation of Authority", "Section 4: Powertrain ..." (chapter headings)
+CHAPTER_PATTERN = re.compile(r"^\s*(?:Section\s+)?(\d+)(?:\.|:)\s+(\S.*)$", re.IGNORECASE)
+# "1.1 Managers are ...", "4.3 Labor Rate Caps ..." (the clauses we retrieve)
+CLAUSE_PATTERN = re.compile(r"^\s*(?:Section\s+)?(\d+(?:\.\d+)+)\.?\s+(\S.*)$", re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+THOUSANDS_PATTERN = re.compile(r"(?<=\d),(?=\d{3})")
+# Ledger fields of a transaction as the audit prompts spell them ("Approver: Bob Director",
+# "Approver Bob Director, Amount $4500.0, Description: ...")
+APPROVER_FIELD = re.compile(r"Approver:?\s+([^,|\n]+)")
+AMOUNT_FIELD = re.compile(r"Amount:?\s+\$([\d,]+(?:\.\d+)?)")
+DESCRIPTION_FIELD = re.compile(r"Description:\s*([^|\n]+)")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens with '$1,000' -> '1000' and a crude plural strip (VPs -> vp)."""
+    tokens = TOKEN_PATTERN.findall(THOUSANDS_PATTERN.sub("", text.lower()))
+    return [t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t for t in tokens]
+
+
+def search_text(query: str) -> str:
+    """
+    What retrieval matches a transaction on: its approver, amount and description.
+    The rest of the prompt (instructions, invoice text) is the same for every row
+    and would pull the same clauses to the top each time. Falls back to the whole query.
+    """
+    fields = [m.group(1).strip() for pattern in (APPROVER_FIELD, AMOUNT_FIELD, DESCRIPTION_FIELD)
+              for m in [pattern.search(query)] if m]
+    return " ".join(fields) or query
+
+
+def split_sections(policy_text: str) -> List[dict]:
+    """
+    Splits the policy at its numbered clauses (1.1, 2.1, 3.2 ...).
+    Each clause remembers its chapter heading so excerpts still read naturally.
+    A policy without numbered clauses comes back as a single section.
+    """
+    sections = []
+    chapter = ""
+    current = None
+    for line in policy_text.splitlines():
+        clause = CLAUSE_PATTERN.match(line)
+        heading = None if clause else CHAPTER_PATTERN.match(line)
+        if clause:
+            current = {"section": clause.group(1), "chapter": chapter, "lines": [line.strip()]}
+            sections.append(current)
+        elif heading:
+            chapter = line.strip()
+            current = None
+        elif current is not None and line.strip():
+            current["lines"].append(line.strip())
+
+    if not sections:
+        return [{"section": "", "chapter": "", "text": policy_text.strip()}]
+    return [{"section": s["section"], "chapter": s["chapter"], "text": "\n".join(s["lines"])} for s in sections]
+
+
+class PolicyIndex:
+    """
+    BM25 index over the policy's numbered sections, kept on disk as JSON.
+    Pure Python, so nothing is downloaded; rebuilt only when the policy hash changes.
+    """
+
+    def __init__(self, policy_hash: str, sections: List[dict], postings: Dict[str, list], doc_lens: List[int]):
+        self.policy_hash = policy_hash
+        self.sections = sections
+        self.postings = postings  # term -> [[section index, term frequency], ...]
+        self.doc_lens = doc_lens
+        self.avg_len = (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0
+
+    @classmethod
+    def build(cls, policy_text: str, policy_hash: str) -> "PolicyIndex":
+        sections = split_sections(policy_text)
+        postings: Dict[str, list] = {}
+        doc_lens = []
+        for i, section in enumerate(sections):
+            terms = Counter(tokenize(section["chapter"] + "\n" + section["text"]))
+            doc_lens.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append([i, tf])
+        return cls(policy_hash, sections, postings, doc_lens)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> Optional["PolicyIndex"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return cls(data["policy_hash"], data["sections"], data["postings"], data["doc_lens"])
+
+    def save(self, path: str = INDEX_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "policy_hash": self.policy_hash,
+                "sections": self.sections,
+                "postings": self.postings,
+                "doc_lens": self.doc_lens,
+            }, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load_or_build(cls, policy_text: str, policy_hash: str, path: str = INDEX_FILE) -> "PolicyIndex":
+        index = cls.load(path)
+        if index is None or index.policy_hash != policy_hash:
+            index = cls.build(policy_text, policy_hash)
+            index.save(path)
+        return index
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        """Indices of the `top_k` best matching sections, best first."""
+        n = len(self.sections)
+        scores = [0.0] * n
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[i] / (self.avg_len or 1))
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted((i for i in range(n) if scores[i] > 0), key=lambda i: (-scores[i], i))
+        return ranked[:top_k]
+
+    def retrieve(self, query: str, top_k: int, pinned: Iterable[int] = ()) -> List[int]:
+        """Sections for one transaction in document order: `pinned` plus the `top_k` best for its ledger fields."""
+        return sorted(set(pinned) | set(self.search(search_text(query), top_k)))
+
+    def chapter_sections(self, numbers: Iterable[str]) -> List[int]:
+        """Indices of every section in the chapters that hold these section numbers."""
+        chapters = {s["chapter"] for s in self.sections if s["section"] in set(numbers)}
+        return [i for i, s in enumerate(self.sections) if s["chapter"] in chapters]
+
+    def excerpt(self, queries: List[str], top_k: int, pinned: Iterable[int] = ()) -> str:
+        """
+        Policy text to send for these transactions: the union of each one's
+        sections (see retrieve), in document order. Falls back to everything if nothing matched.
+        """
+        hits = set()
+        for query in queries:
+            hits.update(self.retrieve(query, top_k, pinned))
+        chosen = sorted(hits) if hits else range(len(self.sections))
+        lines, chapter = [], None
+        for i in chosen:
+            section = self.sections[i]
+            if section["chapter"] and section["chapter"] != chapter:
+                lines.append(section["chapter"])
+            chapter = section["chapter"]
+            lines.append(section["text"])
+        return "\n".join(lines)
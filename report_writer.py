@@ -0,0 +1,39 @@
+import csv
+import os
+
+REPORT_COLUMNS = ["TransactionID", "Status", "AI_Decision", "Duplicate_Cluster", "Policy_Sections"]
+
+
+class ReportWriter:
+    """
+    Writes the audit report row by row instead of building a DataFrame first.
+    Rows go to a temporary file that replaces the report only on close(),
+    so an interrupted run never leaves a half-written report behind.
+    """
+
+    def __init__(self, path: str, columns=REPORT_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.rows_written = 0
+        self._tmp_path = path + ".partial"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(self._tmp_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, lineterminator="\n")
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
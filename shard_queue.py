@@ -0,0 +1,495 @@
+import argparse
+import csv
+import glob
+import heapq
+import itertools
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from audit_history import AuditHistory
+from audit_journal import AuditJournal
+from doa_rules import compile_doa_rules
+from duplicate_detector import (find_duplicates, missing_columns, DUPLICATE_REPORT_FILE,
+                                LEDGER_COLUMNS as DUPLICATE_LEDGER_COLUMNS)
+from ingestion import IngestionAgent, LEDGER_CHUNK_SIZE
+from main import (AuditRun, open_invoice_store, orphan_invoice_records, DOA_PRESCREEN, DUPLICATE_CHECK,
+                  HISTORY_ENABLED, LEDGER_FILE, REPORT_FILE)
+from match_engine import MATCH_COLUMNS, MATCH_REPORT_FILE
+from policy_engine import PolicyAgent
+from policy_impact import record_policy_version
+from report_writer import ReportWriter, REPORT_COLUMNS
+
+# --- CONFIGURATION ---
+# Everything lives under one directory, so workers on other hosts only need it mounted
+SHARD_DIR = os.path.join("data", "shards")
+NUM_SHARDS = int(os.environ.get("AUDIT_SHARDS", 16))
+# A worker renews its lease every third of this; a crashed worker's unit is re-queued after it
+LEASE_SECONDS = float(os.environ.get("AUDIT_LEASE_SECONDS", 300))
+# Claims per unit before it is parked as failed (a unit that crashes every worker)
+MAX_ATTEMPTS = int(os.environ.get("AUDIT_SHARD_MAX_ATTEMPTS", 5))
+# Workers the model quota (AUDIT_REQUESTS_PER_MINUTE / AUDIT_TOKENS_PER_MINUTE) is split between;
+# plan --workers records the real count in the queue, so N workers never send N times the limit
+SHARD_WORKERS = int(os.environ.get("AUDIT_SHARD_WORKERS", 1))
+POLL_SECONDS = 5.0  # idle workers re-check the queue this often while other units are leased
+MERGE_BATCH = 10_000
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+# Position of the row in the ledger, so the merge can restore ledger order
+LEDGER_ROW = "_ledger_row"
+
+
+def shard_of(txn_id, shards: int) -> int:
+    """Shard of one TransactionID (CRC-32, stable across processes and hosts, unlike hash())."""
+    return zlib.crc32(str(txn_id).encode("utf-8")) % shards
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseLost(RuntimeError):
+    """Another worker owns the unit now (our lease expired before it was renewed)."""
+
+
+class WorkQueue:
+    """
+    Durable queue of ledger shards in SQLite, no broker needed.
+    Uses the rollback journal rather than WAL so that workers on other hosts can
+    share it over a network directory. Each state change is one short
+    IMMEDIATE transaction; a lease that is not renewed in time goes back to
+    pending (or to failed after MAX_ATTEMPTS claims) on the next claim().
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR, max_attempts: int = MAX_ATTEMPTS):
+        self.shard_dir = shard_dir
+        self.path = os.path.join(shard_dir, "queue.sqlite")
+        self.max_attempts = max_attempts
+        self._conn = None
+        self._lock = threading.Lock()  # the heartbeat thread shares the connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.shard_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS units ("
+                " shard INTEGER PRIMARY KEY, input_path TEXT NOT NULL, rows INTEGER NOT NULL,"
+                " status TEXT NOT NULL, worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0,"
+                " result_path TEXT, match_path TEXT, error TEXT, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_units_status ON units(status, lease_expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _requeue_expired(self, conn, now: float) -> int:
+        return conn.execute(
+            "UPDATE units SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,"
+            " worker = NULL, lease_expires = NULL, error = 'lease expired', updated = ?"
+            " WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, FAILED, PENDING, now, LEASED, now),
+        ).rowcount
+
+    def reset(self, meta: Dict[str, str], units: List[tuple]):
+        """Replaces the queue with a new plan: units are (shard, input_path, rows)."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM units")
+            conn.execute("DELETE FROM meta")
+            conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+            conn.executemany(
+                "INSERT INTO units (shard, input_path, rows, status, updated) VALUES (?, ?, ?, ?, ?)",
+                [(shard, path, rows, PENDING, now) for shard, path, rows in units],
+            )
+
+    def meta(self) -> Dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        with self._lock:
+            return {r["key"]: r["value"] for r in self._connect().execute("SELECT key, value FROM meta")}
+
+    def claim(self, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[dict]:
+        """Leases the next pending unit (least-tried first) to `worker`, or returns None."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT * FROM units WHERE status = ? ORDER BY attempts, shard LIMIT 1", (PENDING,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE units SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ?"
+                " WHERE shard = ?",
+                (LEASED, worker, now + lease_seconds, now, row["shard"]),
+            )
+        return dict(row, status=LEASED, worker=worker, attempts=row["attempts"] + 1)
+
+    def _update_owned(self, shard: int, worker: str, assignments: str, params: tuple) -> bool:
+        """Applies an update only while `worker` still holds the lease on `shard`."""
+        with self._transaction() as conn:
+            return conn.execute(
+                f"UPDATE units SET {assignments}, updated = ? WHERE shard = ? AND worker = ? AND status = ?",
+                params + (time.time(), shard, worker, LEASED),
+            ).rowcount == 1
+
+    def heartbeat(self, shard: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extends the lease. False means it was lost (expired and re-queued)."""
+        return self._update_owned(shard, worker, "lease_expires = ?", (time.time() + lease_seconds,))
+
+    def complete(self, shard: int, worker: str, result_path: str, match_path: str) -> bool:
+        return self._update_owned(shard, worker, "status = ?, result_path = ?, match_path = ?, error = NULL",
+                                  (DONE, result_path, match_path))
+
+    def fail(self, shard: int, worker: str, error: str) -> bool:
+        """Gives the unit back (to another worker), or parks it as failed once it used up its attempts."""
+        return self._update_owned(
+            shard, worker,
+            "status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_expires = NULL, error = ?",
+            (self.max_attempts, FAILED, PENDING, error),
+        )
+
+    def retry_failed(self) -> int:
+        """Puts failed units back in the queue with a fresh set of attempts."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE units SET status = ?, attempts = 0, updated = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED),
+            ).rowcount
+
+    def units(self) -> List[dict]:
+        with self._transaction() as conn:
+            self._requeue_expired(conn, time.time())
+            return [dict(r) for r in conn.execute("SELECT * FROM units ORDER BY shard")]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for unit in self.units():
+            counts[unit["status"]] += 1
+        return counts
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def plan(shards: int = NUM_SHARDS, ledger_path: str = LEDGER_FILE, shard_dir: str = SHARD_DIR,
+         chunk_size: int = LEDGER_CHUNK_SIZE, workers: int = SHARD_WORKERS) -> Dict[str, str]:
+    """
+    Partitions the ledger by shard_of(TransactionID) into one input file per
+    shard (streamed, constant memory) and fills the queue with them. Also runs
+    the steps that need the whole ledger once: invoice store refresh and the
+    duplicate payment scan. `workers` is how many workers will share the model
+    rate limits. Returns the queue meta.
+    """
+    input_dir = os.path.join(shard_dir, "input")
+    for sub in ("input", "results"):
+        shutil.rmtree(os.path.join(shard_dir, sub), ignore_errors=True)
+    for path in glob.glob(os.path.join(shard_dir, "journal-*.jsonl")) + glob.glob(os.path.join(shard_dir, "*.log")):
+        os.remove(path)
+    os.makedirs(input_dir, exist_ok=True)
+
+    rows = [0] * shards
+    offset = 0
+    for chunk in IngestionAgent().iter_ledger(chunksize=chunk_size, path=ledger_path):
+        chunk[LEDGER_ROW] = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        keys = np.fromiter((shard_of(t, shards) for t in chunk["TransactionID"]), dtype=np.int64, count=len(chunk))
+        for shard, part in chunk.groupby(keys, sort=False):
+            part.to_csv(os.path.join(input_dir, f"shard-{shard:04d}.csv"), mode="a",
+                        header=rows[shard] == 0, index=False)
+            rows[shard] += len(part)
+
+    # Workers only read the store; refreshing it here keeps them from all parsing the same PDFs
+    invoices = open_invoice_store()
+    print(f"[*] Invoice store: {invoices.refresh()}")
+    missing = missing_columns(pd.read_csv(ledger_path, nrows=0).columns)
+    if DUPLICATE_CHECK and missing:
+        print(f"[*] Duplicate scan skipped: the ledger has no {', '.join(missing)} column(s)")
+    elif DUPLICATE_CHECK:
+        duplicates = find_duplicates(pd.read_csv(ledger_path, usecols=DUPLICATE_LEDGER_COLUMNS), invoices.to_frame())
+        duplicates.to_csv(os.path.join(shard_dir, "duplicates.csv"), index=False)
+
+    meta = {"run_id": time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6], "ledger_path": ledger_path,
+            "shards": shards, "workers": max(1, workers), "rows": offset, "created": time.time()}
+    queue = WorkQueue(shard_dir)
+    queue.reset(meta, [(shard, os.path.join(input_dir, f"shard-{shard:04d}.csv"), n)
+                       for shard, n in enumerate(rows) if n])
+    queue.close()
+    print(f"[*] Planned run {meta['run_id']}: {offset:,} rows in {sum(1 for n in rows if n)} shards under {shard_dir}")
+    return {k: str(v) for k, v in meta.items()}
+
+
+def load_duplicates(shard_dir: str = SHARD_DIR) -> dict:
+    """TransactionID -> duplicate finding, as computed by plan() (empty when the scan is off)."""
+    path = os.path.join(shard_dir, "duplicates.csv")
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return {d.TransactionID: d for d in df.itertuples(index=False)}
+
+
+def previous_verdicts(shard_dir: str, run_id: str) -> dict:
+    """Verdicts journaled for this run by any worker (a retried unit does not pay for them twice)."""
+    known = {}
+    for path in glob.glob(os.path.join(shard_dir, "journal-*.jsonl")):
+        known.update(AuditJournal(path).verdicts(run_id))
+    return known
+
+
+def audit_unit(queue: WorkQueue, unit: dict, worker_id: str, run_id: str, agent, invoices, doa_rules,
+               duplicates: dict, journal: AuditJournal, lease_seconds: float = LEASE_SECONDS,
+               chunk_size: int = LEDGER_CHUNK_SIZE, workers: int = 1) -> bool:
+    """
+    Audits one leased unit into its own result files, with 1/`workers` of the
+    model rate limits. True if the result was accepted.
+    """
+    shard = unit["shard"]
+    results_dir = os.path.join(queue.shard_dir, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    # Named by worker too, so a worker that lost its lease never overwrites the new owner's files
+    result_path = os.path.join(results_dir, f"shard-{shard:04d}.{worker_id}.csv")
+    match_path = os.path.join(results_dir, f"match-{shard:04d}.{worker_id}.csv")
+    known = previous_verdicts(queue.shard_dir, run_id) if unit["attempts"] > 1 else {}
+
+    lost, stop = threading.Event(), threading.Event()
+
+    def renew():
+        while not stop.wait(lease_seconds / 3):
+            if not queue.heartbeat(shard, worker_id, lease_seconds):
+                lost.set()
+                return
+
+    heartbeat = threading.Thread(target=renew, name=f"lease-{shard}", daemon=True)
+    heartbeat.start()
+    try:
+        with ReportWriter(result_path, columns=REPORT_COLUMNS + [LEDGER_ROW]) as writer, \
+                ReportWriter(match_path, columns=MATCH_COLUMNS) as match_writer:
+            run = AuditRun(agent, journal, run_id, known, invoices, doa_rules, match_writer)
+            run.duplicates = duplicates
+            run.executor.cancel = lost  # stop sending requests for a unit we no longer own
+            run.executor.requests_per_minute /= workers
+            run.executor.tokens_per_minute /= workers
+            for df in pd.read_csv(unit["input_path"], chunksize=chunk_size):
+                positions = df.pop(LEDGER_ROW).tolist()
+                rows = run.audit_chunk(df)
+                if lost.is_set():
+                    raise LeaseLost(f"lease on shard {shard} expired")
+                for row, position in zip(rows, positions):
+                    row[LEDGER_ROW] = position
+                writer.write_rows(rows)
+    except Exception:
+        if lost.is_set():
+            raise LeaseLost(f"lease on shard {shard} expired") from None
+        raise
+    finally:
+        stop.set()
+        heartbeat.join()
+    return queue.complete(shard, worker_id, result_path, match_path)
+
+
+def run_worker(agent=None, worker_id: Optional[str] = None, shard_dir: str = SHARD_DIR,
+               lease_seconds: float = LEASE_SECONDS, wait: bool = True, chunk_size: int = LEDGER_CHUNK_SIZE,
+               workers: Optional[int] = None) -> int:
+    """
+    Claims and audits units until the queue is drained. With `wait`, an idle
+    worker stays around while other units are leased, in case one of them is
+    re-queued. The rate limits are shared by `workers` (default: the count
+    recorded by plan()). Returns the number of units this worker completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    queue = WorkQueue(shard_dir)
+    meta = queue.meta()
+    if not meta:
+        print(f"❌ No work queue in {shard_dir}. Run `python shard_queue.py plan` first.")
+        return 0
+
+    agent = agent or PolicyAgent()
+    if not agent.policy_text:
+        print(f"[*] {agent.ingest_policy()}")
+    doa_rules = compile_doa_rules(agent.policy_text) if DOA_PRESCREEN else None
+    record_policy_version(agent.policy_text, agent.policy_hash)
+    invoices = open_invoice_store()
+    invoices.refresh()
+    duplicates = load_duplicates(shard_dir)
+    journal = AuditJournal(os.path.join(shard_dir, f"journal-{worker_id}.jsonl"))
+    workers = max(1, workers or int(meta.get("workers", 1)))
+
+    completed = 0
+    try:
+        while True:
+            unit = queue.claim(worker_id, lease_seconds)
+            if unit is None:
+                if wait and queue.counts()[LEASED]:
+                    time.sleep(POLL_SECONDS)
+                    continue
+                break
+            print(f"[*] {worker_id}: shard {unit['shard']} ({unit['rows']:,} rows, attempt {unit['attempts']})")
+            try:
+                if audit_unit(queue, unit, worker_id, meta["run_id"], agent, invoices, doa_rules, duplicates,
+                              journal, lease_seconds, chunk_size, workers):
+                    completed += 1
+            except LeaseLost as e:
+                print(f"[!] {worker_id}: {e}, abandoning it")
+            except Exception as e:
+                queue.fail(unit["shard"], worker_id, f"{type(e).__name__}: {e}")
+                print(f"[!] {worker_id}: shard {unit['shard']} failed: {e}")
+    finally:
+        journal.close()
+        queue.close()
+    print(f"[*] {worker_id}: {completed} shard(s) done")
+    return completed
+
+
+def merge(shard_dir: str = SHARD_DIR, report_file: str = REPORT_FILE, allow_partial: bool = False) -> Dict[str, int]:
+    """
+    Builds final_audit_report.csv (ledger order), the match report and the
+    duplicate report from the finished units. Each shard file is already in
+    ledger order, so a k-way merge restores the full order in constant memory.
+    """
+    queue = WorkQueue(shard_dir)
+    meta, units = queue.meta(), queue.units()
+    queue.close()
+    if not meta:
+        raise RuntimeError(f"No work queue in {shard_dir}")
+    done = [u for u in units if u["status"] == DONE]
+    if len(done) < len(units) and not allow_partial:
+        raise RuntimeError(f"{len(units) - len(done)} of {len(units)} shards are not done yet")
+
+    files = [open(u["result_path"], newline="", encoding="utf-8") for u in done]
+    try:
+        rows = heapq.merge(*(csv.DictReader(f) for f in files), key=lambda r: int(r[LEDGER_ROW]))
+        with ReportWriter(report_file) as writer:
+            while True:
+                batch = list(itertools.islice(rows, MERGE_BATCH))
+                if not batch:
+                    break
+                for row in batch:
+                    del row[LEDGER_ROW]
+                writer.write_rows(batch)
+    finally:
+        for f in files:
+            f.close()
+
+    with ReportWriter(MATCH_REPORT_FILE, columns=MATCH_COLUMNS) as match_writer:
+        for unit in done:
+            with open(unit["match_path"], newline="", encoding="utf-8") as f:
+                match_writer.write_rows(list(csv.DictReader(f)))
+        invoices = open_invoice_store()
+        invoices.refresh()
+        ledger_ids = pd.read_csv(meta["ledger_path"], usecols=["TransactionID"])["TransactionID"].astype(str)
+        match_writer.write_rows(orphan_invoice_records(invoices.to_frame(), set(ledger_ids)))
+
+    duplicates = os.path.join(shard_dir, "duplicates.csv")
+    if os.path.exists(duplicates):
+        shutil.copyfile(duplicates, DUPLICATE_REPORT_FILE)
+
+    if HISTORY_ENABLED:
+        history = AuditHistory()
+        history.import_report(report_file, run_id=meta["run_id"], ledger_path=meta["ledger_path"], source="shards")
+        history.close()
+
+    print(f"[SUCCESS] Merged {len(done)} shards ({writer.rows_written:,} rows) into {report_file}; "
+          f"match exceptions ({match_writer.rows_written}) in {MATCH_REPORT_FILE}")
+    return {"shards": len(done), "rows": writer.rows_written, "match_rows": match_writer.rows_written}
+
+
+def print_status(shard_dir: str = SHARD_DIR):
+    queue = WorkQueue(shard_dir)
+    meta, units = queue.meta(), queue.units()
+    queue.close()
+    if not meta:
+        print(f"❌ No work queue in {shard_dir}")
+        return
+    counts = {s: sum(1 for u in units if u["status"] == s) for s in (PENDING, LEASED, DONE, FAILED)}
+    print(f"[*] Run {meta['run_id']}: {int(meta['rows']):,} rows, {len(units)} units {counts}")
+    print(f"{'SHARD':>5} | {'ROWS':>8} | {'STATUS':<8} | {'TRIES':>5} | {'WORKER':<24} | ERROR")
+    for u in units:
+        print(f"{u['shard']:>5} | {u['rows']:>8,} | {u['status']:<8} | {u['attempts']:>5} | "
+              f"{u['worker'] or '':<24} | {u['error'] or ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded audit: plan work units, run workers, merge the reports.")
+    parser.add_argument("--dir", default=SHARD_DIR, help="shared queue directory (mount it on every worker host)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("plan", help="partition the ledger into shards and (re)fill the queue")
+    p.add_argument("--shards", type=int, default=NUM_SHARDS)
+    p.add_argument("--ledger", default=LEDGER_FILE)
+    p.add_argument("--workers", type=int, default=SHARD_WORKERS, help="workers that will share the model rate limits")
+    w = sub.add_parser("worker", help="claim and audit units until the queue is drained")
+    w.add_argument("--worker-id", default=None)
+    w.add_argument("--lease", type=float, default=LEASE_SECONDS, help="lease length in seconds")
+    w.add_argument("--no-wait", action="store_true", help="exit as soon as nothing is pending")
+    w.add_argument("--workers", type=int, default=None,
+                   help="workers sharing the model rate limits (default: the count given to plan)")
+    r = sub.add_parser("run", help="plan, run N local worker processes, then merge")
+    r.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    r.add_argument("--shards", type=int, default=NUM_SHARDS)
+    r.add_argument("--no-plan", action="store_true", help="continue the current queue instead of planning anew")
+    m = sub.add_parser("merge", help="merge the shard results into the final reports")
+    m.add_argument("--partial", action="store_true", help="merge even if some shards are not done")
+    sub.add_parser("status", help="show the queue")
+    sub.add_parser("retry-failed", help="put failed units back in the queue")
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        plan(args.shards, args.ledger, args.dir, workers=args.workers)
+    elif args.command == "worker":
+        run_worker(worker_id=args.worker_id, shard_dir=args.dir, lease_seconds=args.lease, wait=not args.no_wait,
+                   workers=args.workers)
+    elif args.command == "run":
+        if not args.no_plan:
+            plan(args.shards, shard_dir=args.dir, workers=args.workers)
+        # Each worker logs to its own file; the queue is the only thing they share
+        procs = []
+        for i in range(args.workers):
+            log = open(os.path.join(args.dir, f"worker-{i}.log"), "w", encoding="utf-8")
+            procs.append((subprocess.Popen([sys.executable, os.path.abspath(__file__), "--dir", args.dir, "worker",
+                                            "--workers", str(args.workers)],
+                                           stdout=log, stderr=subprocess.STDOUT), log))
+        print(f"[*] {args.workers} workers started (logs in {args.dir}/worker-*.log)")
+        for proc, log in procs:
+            proc.wait()
+            log.close()
+        merge(args.dir)
+    elif args.command == "merge":
+        merge(args.dir, allow_partial=args.partial)
+    elif args.command == "status":
+        print_status(args.dir)
+    elif args.command == "retry-failed":
+        queue = WorkQueue(args.dir)
+        print(f"[*] {queue.retry_failed()} failed unit(s) re-queued")
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import sys
+from collections import namedtuple
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Section 1 and 3 of data/Company_Policy.pdf (create_policy.py), as PolicyAgent.ingest_policy returns it
+POLICY_TEXT = """
+1. Delegation of Authority (DoA)
+1.1 Managers are authorized to approve expenses up to $1,000 USD.
+1.2 Directors are authorized to approve expenses up to $5,000 USD.
+1.3 Vice Presidents (VPs) are authorized to approve expenses up to $10,000 USD.
+1.4 Any expense above $10,000 USD requires C-Level approval.
+3. Documentation Requirements
+3.1 All invoices must match the General Ledger amount exactly.
+3.2 A variance of $0.01 is acceptable for rounding errors.
+3.3 Invoices must be submitted within 30 days of service.
+"""
+
+LedgerRow = namedtuple("LedgerRow", ["TransactionID", "Date", "Vendor", "Amount", "Currency", "Approver", "Description"])
+
+
+@pytest.fixture
+def doa_rules():
+    from doa_rules import compile_doa_rules
+    return compile_doa_rules(POLICY_TEXT)
+
+
+@pytest.fixture
+def make_agent():
+    """PolicyAgent on FakeAuditLLM with the test policy loaded: make_agent(responder, latency=0.0)."""
+    from fake_llm import FakeAuditLLM
+    from policy_engine import PolicyAgent
+    from verdict_cache import VerdictCache
+
+    def make(responder, latency=0.0):
+        agent = PolicyAgent(llm=FakeAuditLLM(responder=responder, latency=latency), cache=VerdictCache(enabled=False),
+                            top_k=0)
+        agent.policy_text, agent.policy_hash = POLICY_TEXT, "test-policy"
+        return agent
+    return make
+
+
+CORPUS_ROWS = 40
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """A generated ledger + invoices in a scratch working directory, audited without rate limits: the ground truth."""
+    import pandas as pd
+    import generate_data
+    import main
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "REQUESTS_PER_MINUTE", 1_000_000)
+    monkeypatch.setattr(main, "TOKENS_PER_MINUTE", 1_000_000_000)
+    generate_data.generate(CORPUS_ROWS, workers=1, seed=7, verbose=False)
+    return pd.read_csv(os.path.join("data", "ground_truth.csv"))
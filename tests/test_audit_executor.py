@@ -0,0 +1,189 @@
+import asyncio
+import json
+import random
+import re
+import threading
+
+import pytest
+
+import audit_executor
+from audit_executor import AuditExecutor, CANCELLED_RESPONSE, TokenBucket, is_rate_limit_error
+from fake_llm import BATCH_ROW_PATTERN, oracle_responder
+from policy_engine import parse_batch_response
+
+
+def executor(agent, **kwargs):
+    return AuditExecutor(agent, requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000, **kwargs)
+
+
+def echo_responder(prompt):
+    """'COMPLIANT: row-N', so each answer names the query it belongs to."""
+    return "COMPLIANT: " + re.findall(r"row-\d+", prompt)[-1]
+
+
+def test_results_come_back_in_input_order(make_agent):
+    agent = make_agent(echo_responder)
+    rng = random.Random(7)
+    original = agent.acheck_policy
+
+    async def jittered(query, use_cache=True):
+        await asyncio.sleep(rng.random() / 200)  # rows finish out of order
+        return await original(query, use_cache=use_cache)
+    agent.acheck_policy = jittered
+
+    queries = [f"row-{i}" for i in range(40)]
+    completed = []
+
+    results = executor(agent, max_concurrency=8).run(queries, on_result=lambda i, r: completed.append(i))
+    assert [r.split()[-1] for r in results] == queries
+    assert sorted(completed) == list(range(40)) and completed != list(range(40))
+
+
+def test_cancel_returns_an_explicit_result_for_skipped_rows(make_agent):
+    cancel = threading.Event()
+    agent = make_agent(echo_responder)
+    seen = {}
+
+    def on_result(index, response):
+        seen[index] = response
+        cancel.set()  # stop after the first answer
+
+    results = executor(agent, max_concurrency=1, cancel=cancel).run([f"row-{i}" for i in range(5)], on_result)
+    assert results[0].startswith("COMPLIANT")
+    assert results[1:] == [CANCELLED_RESPONSE] * 4
+    assert seen == dict(enumerate(results))
+
+
+def test_no_more_requests_in_flight_than_max_concurrency(make_agent):
+    agent = make_agent(echo_responder)
+    original = agent.acheck_policy
+    in_flight, peak = [0], [0]
+
+    async def tracked(query, use_cache=True):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.001)
+        try:
+            return await original(query, use_cache=use_cache)
+        finally:
+            in_flight[0] -= 1
+    agent.acheck_policy = tracked
+
+    executor(agent, max_concurrency=3).run([f"row-{i}" for i in range(20)])
+    assert peak[0] == 3
+
+
+def test_token_bucket_waits_for_the_refill(monkeypatch):
+    now = [0.0]
+    waited = []
+
+    async def fake_sleep(seconds):
+        waited.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(audit_executor.asyncio, "sleep", fake_sleep)
+
+    async def drain():
+        bucket = TokenBucket(requests_per_minute=60, tokens_per_minute=6000, clock=lambda: now[0])
+        for _ in range(60):  # a full minute's burst is available up front
+            await bucket.acquire(10)
+        assert not waited
+        await bucket.acquire(10)  # the 61st request needs one second of refill
+        assert now[0] == pytest.approx(1.0)
+        bucket.penalize()
+        await bucket.acquire(10)  # at half rate the next one takes two
+        assert now[0] == pytest.approx(3.0)
+        await bucket.acquire(10 ** 9)  # a prompt over the whole budget waits for a full bucket, not forever
+        assert now[0] <= 3.0 + 120.0
+    asyncio.run(drain())
+
+
+def test_throttled_calls_back_off_and_retry(make_agent):
+    agent = make_agent(echo_responder)
+    original = agent.acheck_policy
+    failures = [2]
+
+    async def throttled(query, use_cache=True):
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+        return await original(query, use_cache=use_cache)
+    agent.acheck_policy = throttled
+
+    run = executor(agent, base_backoff=0.001)
+    assert run.run(["row-1"]) == ["COMPLIANT: row-1"]
+    assert run.stats["calls"] == 3 and run.stats["throttled"] == 2 and run.stats["errors"] == 0
+
+
+def test_other_errors_are_not_retried(make_agent):
+    agent = make_agent(echo_responder)
+
+    async def broken(query, use_cache=True):
+        raise ValueError("bad prompt")
+    agent.acheck_policy = broken
+
+    run = executor(agent, base_backoff=0.001)
+    assert run.run(["row-1"]) == ["Error: bad prompt"]
+    assert run.stats["calls"] == 1 and run.stats["errors"] == 1
+
+
+def test_rate_limit_errors_are_recognized():
+    class ApiError(Exception):
+        status_code = 429
+    assert is_rate_limit_error(ApiError("slow down"))
+    assert is_rate_limit_error(RuntimeError("ResourceExhausted: Quota exceeded for requests per minute"))
+    assert not is_rate_limit_error(ValueError("invalid argument"))
+
+
+def test_batch_rows_with_the_same_transaction_id_keep_their_own_verdicts(make_agent):
+    agent = make_agent(oracle_responder)
+    transactions = [
+        {"TransactionID": "TXN-1", "query": "Approver: Bob Director, Amount: $4500.00"},
+        {"TransactionID": "TXN-2", "query": "Approver: Carol Manager, Amount: $300.00"},
+        {"TransactionID": "TXN-1", "query": "Approver: Carol Manager, Amount: $4500.00"},  # duplicate ID
+    ]
+    results = executor(agent).run_batches(transactions, batch_size=3)
+    assert [v["TransactionID"] for v in results] == ["TXN-1", "TXN-2", "TXN-1"]
+    assert [v["status"] for v in results] == ["COMPLIANT", "COMPLIANT", "VIOLATION"]
+
+
+def test_cancelled_batch_rows_are_errors_not_none(make_agent):
+    cancel = threading.Event()
+    cancel.set()
+    agent = make_agent(oracle_responder)
+    transactions = [{"TransactionID": f"TXN-{i}", "query": "Approver: Bob Director, Amount: $10.00"} for i in range(3)]
+    results = executor(agent, cancel=cancel).run_batches(transactions, batch_size=2)
+    assert [(v["TransactionID"], v["status"]) for v in results] == [(f"TXN-{i}", "ERROR") for i in range(3)]
+
+
+def test_batch_rows_the_model_skips_are_asked_again(make_agent):
+    answered = set()
+
+    def forgetful(prompt):
+        # Answers each row only the second time it is asked
+        if "TRANSACTIONS TO AUDIT" not in prompt:
+            return oracle_responder(prompt)
+        rows = [m.group("id") for m in BATCH_ROW_PATTERN.finditer(prompt.split("TRANSACTIONS TO AUDIT", 1)[1])]
+        ready = [r for r in rows if r in answered]
+        answered.update(rows)
+        return json.dumps([{"TransactionID": r, "status": "COMPLIANT", "reason": "ok", "confidence": 0.9}
+                           for r in ready])
+
+    agent = make_agent(forgetful)
+    transactions = [{"TransactionID": f"TXN-{i}", "query": "Approver: Bob Director, Amount: $10.00"} for i in range(4)]
+    results = executor(agent).run_batches(transactions, batch_size=4)
+    assert [v["status"] for v in results] == ["COMPLIANT"] * 4
+
+
+def test_parse_batch_response_keeps_only_well_formed_expected_rows():
+    text = """```json
+    [{"TransactionID": "TXN-1", "status": "violation", "section": "Section 1.2", "reason": "over limit", "confidence": "0.8"},
+     {"TransactionID": "TXN-2", "status": "MAYBE", "reason": "?"},
+     {"TransactionID": "TXN-3", "status": "COMPLIANT", "reason": ""},
+     {"TransactionID": "TXN-9", "status": "COMPLIANT", "reason": "not asked"},
+     "garbage"]
+    ```"""
+    parsed = parse_batch_response(text, ["TXN-1", "TXN-2", "TXN-3"])
+    assert list(parsed) == ["TXN-1"]
+    assert parsed["TXN-1"]["status"] == "VIOLATION" and parsed["TXN-1"]["section"] == "1.2"
+    assert parse_batch_response("no json here", ["TXN-1"]) == {}
+    assert parse_batch_response("[not json]", ["TXN-1"]) == {}
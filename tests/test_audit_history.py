@@ -0,0 +1,42 @@
+import pandas as pd
+
+from audit_history import AuditHistory, parse_when
+
+
+def test_dates_are_utc_like_the_displayed_times():
+    assert parse_when("1970-01-02") == 86_400
+    assert parse_when("2026-07-01T12:00") == pd.Timestamp("2026-07-01 12:00", tz="UTC").timestamp()
+    assert parse_when("2026-07-01T12:00+02:00") == pd.Timestamp("2026-07-01 10:00", tz="UTC").timestamp()
+    # What the report prints for a stored timestamp parses back to the same instant
+    stored = 1_780_000_000.0
+    shown = pd.to_datetime(pd.Series([stored]), unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")[0]
+    assert parse_when(shown) == stored
+
+
+def test_every_row_keeps_its_verdict_when_a_transaction_id_repeats(tmp_path):
+    history = AuditHistory(str(tmp_path / "history.sqlite"))
+    ledger = pd.DataFrame({"TransactionID": ["TXN-1", "TXN-1", "TXN-2"], "Approver": ["Ann Manager"] * 3,
+                           "Vendor": ["Globex"] * 3, "Amount": [900.0, 1500.0, 200.0]})
+
+    def results(rows, *statuses):
+        return [{"TransactionID": t, "Status": s, "AI_Decision": f"{s}: {t}"}
+                for t, s in zip(rows["TransactionID"], statuses)]
+
+    history.start_run("r1", started=1.0)
+    history.record("r1", ledger, results(ledger, "PASS", "FLAG", "PASS"))
+    history.finish_run("r1")
+    history.start_run("r2", started=2.0)
+    history.record("r2", ledger.iloc[:2], results(ledger.iloc[:2], "PASS", "PASS"))
+    history.record("r2", ledger.iloc[2:], results(ledger.iloc[2:], "FLAG"))  # the second chunk goes on from position 2
+    history.finish_run("r2")
+
+    first = history.verdicts("r1")
+    assert list(first["TransactionID"]) == ["TXN-1", "TXN-1", "TXN-2"]
+    assert list(first["Amount"]) == [900.0, 1500.0, 200.0]
+    assert history.runs()["rows"].tolist() == [3, 3]
+    assert len(history.transaction("TXN-1")) == 4
+
+    changed = history.diff("r1", "r2")
+    assert list(zip(changed["TransactionID"], changed["Old_Status"], changed["New_Status"])) == [
+        ("TXN-1", "FLAG", "PASS"), ("TXN-2", "PASS", "FLAG")]
+    history.close()
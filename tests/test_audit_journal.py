@@ -0,0 +1,108 @@
+import io
+
+import pandas as pd
+
+import main
+from audit_journal import AuditJournal, JOURNAL_FILE, row_input_hash
+from fake_llm import oracle_responder
+
+LEDGER = """TransactionID,Date,Vendor,Amount,Currency,Approver,Description
+TXN-1,2026-02-05,TechCorp,4500,USD,Bob Director,Server Maintenance
+TXN-2,2026-02-06,Globex,4800.5,USD,Dana Director,Consulting
+"""
+
+
+def hashes(**read_csv):
+    frames = pd.read_csv(io.StringIO(LEDGER), **read_csv)
+    frames = [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+    return [row_input_hash(row._asdict(), "MISSING") for df in frames for row in df.itertuples(index=False)]
+
+
+def test_row_hash_does_not_depend_on_the_inferred_dtypes():
+    # One chunk reads Amount 4500 as int, the whole file as float, dtype=str as "4500"
+    assert hashes() == hashes(chunksize=1) == hashes(dtype=str)
+    assert row_input_hash({"Amount": 4500}, "x") == row_input_hash({"Amount": "4500.00 "}, "x")
+    assert row_input_hash({"Amount": 4500}, "x") != row_input_hash({"Amount": 4500.01}, "x")
+    assert row_input_hash({"Amount": 4500}, "x") != row_input_hash({"Amount": 4500}, "y")
+
+
+def test_resume_continues_the_unfinished_run(tmp_path):
+    journal = AuditJournal(str(tmp_path / "journal.jsonl"))
+    run_id, resumed = journal.start_run()
+    assert not resumed
+    journal.record(run_id, "TXN-1", "h1", "COMPLIANT: ok", retrieved=["1.2"])
+    journal.close()
+
+    journal = AuditJournal(str(tmp_path / "journal.jsonl"))
+    assert journal.start_run(resume=True) == (run_id, True)
+    assert journal.verdicts(run_id)["h1"]["retrieved"] == ["1.2"]
+    journal.finish_run(run_id)
+    assert journal.start_run(resume=True)[0] != run_id
+    journal.close()
+
+
+def test_incremental_run_only_journals_new_verdicts(tmp_path):
+    journal = AuditJournal(str(tmp_path / "journal.jsonl"))
+    first, _ = journal.start_run()
+    journal.record(first, "TXN-1", "h1", "COMPLIANT: ok")
+    journal.finish_run(first)
+
+    second, _ = journal.start_run(incremental=True)
+    journal.record(second, "TXN-2", "h2", "VIOLATION: Section 1.2")
+    assert journal.is_incremental(second) and not journal.is_incremental(first)
+    # What a resumed incremental run may re-use: its own verdicts and the earlier runs'
+    assert set(journal.verdicts()) == {"h1", "h2"}
+    assert set(journal.verdicts(second)) == {"h2"}
+    journal.close()
+
+
+def test_verdicts_are_reused_only_under_the_policy_they_were_made_with(tmp_path):
+    journal = AuditJournal(str(tmp_path / "journal.jsonl"))
+    old, _ = journal.start_run(policy_hash="v1")
+    journal.record(old, "TXN-1", "h1", "COMPLIANT: ok")
+    journal.finish_run(old)
+    new, _ = journal.start_run(incremental=True, policy_hash="v2")
+    journal.record(new, "TXN-2", "h2", "COMPLIANT: ok")
+    assert set(journal.verdicts(policy_hash="v2")) == {"h2"}
+    assert journal.verdicts()["h1"]["policy_hash"] == "v1"
+    journal.close()
+
+
+def journal_lines() -> int:
+    with open(JOURNAL_FILE, encoding="utf-8") as f:
+        return len(f.readlines())
+
+
+def test_incremental_stream_run_reuses_every_verdict(corpus, make_agent):
+    main.main(agent=make_agent(oracle_responder))
+    first = pd.read_csv(main.REPORT_FILE)
+    journaled = journal_lines()
+
+    agent = make_agent(oracle_responder)
+    main.main(agent=agent, incremental=True, stream=True, chunk_size=7)
+    assert agent.llm.calls == 0
+    assert journal_lines() == journaled + 2  # run started + run finished, no re-journaled verdicts
+    pd.testing.assert_series_equal(pd.read_csv(main.REPORT_FILE)["Status"], first["Status"])
+
+
+def agent_under(make_agent, policy_hash):
+    agent = make_agent(oracle_responder)
+    agent.policy_hash = policy_hash
+    return agent
+
+
+def test_a_policy_edit_stops_incremental_reuse(corpus, make_agent, capsys):
+    main.main(agent=make_agent(oracle_responder))
+    edited = agent_under(make_agent, "edited-policy")
+    main.main(agent=edited, incremental=True)
+    assert edited.llm.calls > 0
+    assert "under another policy version" in capsys.readouterr().out
+
+
+def test_a_reaudit_carries_unaffected_verdicts_over_to_the_edited_policy(corpus, make_agent):
+    main.main(agent=make_agent(oracle_responder))
+    reaudit = agent_under(make_agent, "edited-policy")
+    main.main(agent=reaudit, incremental=True, reaudit=set())  # the impact analysis found nothing affected
+    later = agent_under(make_agent, "edited-policy")
+    main.main(agent=later, incremental=True)
+    assert reaudit.llm.calls == 0 and later.llm.calls == 0
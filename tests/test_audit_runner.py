@@ -0,0 +1,62 @@
+import audit_runner
+from audit_runner import AuditJob, DONE, get_job, release, submit
+
+LEDGER = b"""TransactionID,Date,Vendor,Amount,Currency,Approver,Description
+TXN-1,2026-02-05,TechCorp,5000,USD,Carol Manager,Laptops
+TXN-2,2026-02-06,Globex,300,USD,Bob Director,Consulting
+TXN-3,2026-02-07,Initech,700,USD,Erin Intern,Office supplies
+"""
+
+
+def run_job(agent, **kwargs) -> AuditJob:
+    job = AuditJob(agent, LEDGER, **kwargs).start()
+    job._thread.join(timeout=30)
+    assert job.status == DONE, job.error
+    return job
+
+
+def test_only_approval_breaches_skip_the_model(make_agent, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return "COMPLIANT: invoice and policy checks passed"
+
+    job = run_job(make_agent(responder))
+    results = job.results()
+    assert [r["TransactionID"] for r in results] == ["TXN-1", "TXN-2", "TXN-3"]
+    assert results[0]["Status"] == "FLAGGED" and results[0]["Reasoning"].startswith("VIOLATION: Section 1.1")
+    # The compliant Director row is still audited, with the settled limit as context; the unknown role as is
+    asked = [p for p in prompts if "TXN-" in p]
+    assert len(asked) == 2 and not any("TXN-1" in p for p in asked)
+    assert "DoA pre-screen: COMPLIANT: Section 1.2" in next(p for p in asked if "TXN-2" in p)
+    assert "DoA pre-screen" not in next(p for p in asked if "TXN-3" in p)
+
+
+def test_a_collected_job_is_dropped_from_the_registry(make_agent, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit_runner, "_JOBS", {})
+    job = submit("session-a", AuditJob(make_agent(lambda prompt: "COMPLIANT"), LEDGER))
+    job._thread.join(timeout=30)
+    assert get_job("session-a") is job and len(job.results()) == 3
+    assert release("session-a", job)
+    assert get_job("session-a") is None and not release("session-a", job)
+
+
+def test_a_running_job_is_kept(make_agent, monkeypatch):
+    monkeypatch.setattr(audit_runner, "_JOBS", {})
+    job = AuditJob(make_agent(lambda prompt: "COMPLIANT"), LEDGER)  # queued, never started
+    audit_runner._JOBS["session-a"] = job
+    assert not release("session-a", job) and get_job("session-a") is job
+
+
+def test_finished_jobs_nobody_collects_are_capped(make_agent, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(audit_runner, "_JOBS", {})
+    monkeypatch.setattr(audit_runner, "MAX_FINISHED_JOBS", 2)
+    for n in range(5):
+        job = submit(f"session-{n}", AuditJob(make_agent(lambda prompt: "COMPLIANT"), LEDGER))
+        job._thread.join(timeout=30)
+    # The oldest are gone; the newest stays even beyond the cap
+    assert list(audit_runner._JOBS) == ["session-2", "session-3", "session-4"]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from doa_rules import DOA_AMBIGUOUS, DOA_COMPLIANT, DOA_VIOLATION, compile_doa_rules, doa_decision, prescreen
+
+
+def test_policy_limits_are_compiled(doa_rules):
+    assert doa_rules.limits == {"manager": 1000.0, "director": 5000.0, "vice president": 10000.0,
+                                "c-level": float("inf")}
+    assert doa_rules.aliases["vp"] == "vice president"
+    assert not compile_doa_rules("No limits in here.")
+
+
+def test_prescreen_classifies_every_row(doa_rules):
+    ledger = pd.DataFrame({
+        "Approver": ["Bob Director", "Bob Director", "Carol Manager", "Eve VP", "Dan CFO", "Zed Intern", "Bob Director"],
+        "Amount": [4500.0, 6000.0, 1000.0, 9000.0, 250_000.0, 10.0, "n/a"],
+    })
+    screen = prescreen(ledger, doa_rules)
+    assert list(screen["DoA_Status"]) == [DOA_COMPLIANT, DOA_VIOLATION, DOA_AMBIGUOUS, DOA_COMPLIANT, DOA_COMPLIANT,
+                                          DOA_AMBIGUOUS, DOA_AMBIGUOUS]  # at the limit, unknown role, bad amount
+    assert list(screen["DoA_Section"][:2]) == ["1.2", "1.2"]
+    row = next(screen.iloc[[1]].itertuples(index=False))
+    assert doa_decision("Bob Director", 6000.0, row).startswith("VIOLATION: Section 1.2")
+
+
+def test_prescreen_handles_a_chunk_without_any_approver(doa_rules):
+    for approvers in ([np.nan, np.nan], [None, None], pd.array([pd.NA, pd.NA], dtype="string")):
+        screen = prescreen(pd.DataFrame({"Approver": approvers, "Amount": [10.0, 20.0]}), doa_rules)
+        assert list(screen["DoA_Status"]) == [DOA_AMBIGUOUS, DOA_AMBIGUOUS]
+        assert screen["DoA_Role"].isna().all()
+    mixed = prescreen(pd.DataFrame({"Approver": [None, "Bob Director"], "Amount": [10.0, 6000.0]}), doa_rules)
+    assert list(mixed["DoA_Status"]) == [DOA_AMBIGUOUS, DOA_VIOLATION]
+
+
+def test_prescreen_of_an_empty_chunk(doa_rules):
+    screen = prescreen(pd.DataFrame({"Approver": [], "Amount": []}), doa_rules)
+    assert screen.empty and list(screen.columns) == ["DoA_Role", "DoA_Limit", "DoA_Section", "DoA_Status"]
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import main
+from duplicate_detector import (find_duplicates, window_links, connected_components, missing_columns,
+                                normalize_vendor, EXACT_DUPLICATE, NEAR_DUPLICATE, DUPLICATE_INVOICE)
+from fake_llm import oracle_responder
+
+
+def ledger(*rows):
+    return pd.DataFrame(rows, columns=["TransactionID", "Date", "Vendor", "Amount", "Description"])
+
+
+def kinds(dups):
+    return dict(zip(dups["TransactionID"], dups["Duplicate_Kind"]))
+
+
+def test_vendor_spellings_are_normalized():
+    assert normalize_vendor("Office Supplies Co.") == normalize_vendor("OFFICE SUPPLIES") == "office supplies"
+
+
+def test_exact_near_and_invoice_duplicates_are_told_apart():
+    dups = find_duplicates(ledger(
+        ("TXN-1", "2026-03-01", "Globex Corp", 900.00, "Paper"),
+        ("TXN-2", "2026-03-01", "GLOBEX", 900.00, "paper"),
+        ("TXN-3", "2026-05-01", "Initech", 120.00, "Toner"),
+        ("TXN-4", "2026-05-04", "Initech Ltd", 120.01, "Toner refill"),
+        ("TXN-5", "2026-06-01", "Hooli", 50.00, "Cables"),
+        ("TXN-6", "2026-08-01", "Umbrella", 75.00, "Badges"),
+    ), invoices=[{"TransactionID": "TXN-5", "invoice_id": "INV-7", "extracted_amount": 50.00},
+                 {"TransactionID": "TXN-6", "invoice_id": "inv-7 ", "extracted_amount": 75.00}])
+
+    assert kinds(dups) == {"TXN-1": EXACT_DUPLICATE, "TXN-2": EXACT_DUPLICATE, "TXN-3": NEAR_DUPLICATE,
+                           "TXN-4": NEAR_DUPLICATE, "TXN-5": DUPLICATE_INVOICE, "TXN-6": DUPLICATE_INVOICE}
+    assert dups["Duplicate_Cluster"].nunique() == 3
+
+
+def test_payments_further_apart_than_the_date_tolerance_are_not_linked():
+    rows = ledger(("TXN-1", "2026-03-01", "Globex", 900.00, "Paper"),
+                  ("TXN-2", "2026-03-11", "Globex", 900.00, "Paper"))
+    assert find_duplicates(rows, date_tolerance_days=7).empty
+    assert len(find_duplicates(rows, date_tolerance_days=10)) == 2
+
+
+def test_near_duplicates_chain_into_one_cluster():
+    dups = find_duplicates(ledger(
+        ("TXN-1", "2026-03-01", "Globex", 900.00, "Paper"),
+        ("TXN-2", "2026-03-06", "Globex", 900.00, "Paper"),
+        ("TXN-3", "2026-03-11", "Globex", 900.00, "Paper"),  # 10 days after TXN-1, linked through TXN-2
+    ), date_tolerance_days=7)
+    assert dups["Duplicate_Cluster"].nunique() == 1
+    assert dups["Cluster_Size"].tolist() == [3, 3, 3]
+    assert dups.set_index("TransactionID").loc["TXN-1", "Duplicate_Of"] == "TXN-2, TXN-3"
+
+
+def test_window_links_compares_only_the_next_neighbours():
+    # Rows 0 and 2 match, with an unrelated row between them in the sorted order
+    order = np.array([0, 1, 2])
+    vendor, cents, days = np.array([1, 2, 1]), np.array([100, 100, 100]), np.array([0, 0, 1])
+    a, b = window_links(order, vendor, cents, days, 1, 1, 7)
+    assert not len(a)
+    a, b = window_links(order, vendor, cents, days, 2, 1, 7)
+    assert (a.tolist(), b.tolist()) == ([0], [2])
+
+
+def test_connected_components_label_each_row_with_its_smallest_member():
+    labels = connected_components(6, np.array([1, 2, 4]), np.array([0, 1, 3]))
+    assert labels.tolist() == [0, 0, 0, 3, 3, 5]
+    assert connected_components(3, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)).tolist() == [0, 1, 2]
+
+
+def test_missing_columns():
+    assert missing_columns(["TransactionID", "Amount", "Description", "Approver"]) == ["Date", "Vendor"]
+    assert missing_columns(["TransactionID", "Date", "Vendor", "Amount", "Description"]) == []
+
+
+def test_stream_mode_skips_the_scan(corpus, make_agent, capsys):
+    main.main(agent=make_agent(oracle_responder), stream=True, chunk_size=9)
+    out = capsys.readouterr().out
+    assert "Duplicate scan skipped" in out and "[SUCCESS]" in out
+
+
+def test_a_ledger_without_vendor_or_date_is_audited_without_the_scan(corpus, make_agent, capsys):
+    path = os.path.join("data", "general_ledger.csv")
+    pd.read_csv(path).drop(columns=["Vendor", "Date"]).to_csv(path, index=False)
+    main.main(agent=make_agent(oracle_responder))
+    out = capsys.readouterr().out
+    assert "the ledger has no Date, Vendor column(s)" in out and "[SUCCESS]" in out
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+import main
+from fake_llm import oracle_responder
+from generate_data import generate
+
+
+def invoices(data_dir):
+    return sorted(os.listdir(os.path.join(data_dir, "invoices")))
+
+
+def test_a_smaller_run_removes_only_invoices_the_generator_wrote(tmp_path):
+    data_dir = str(tmp_path / "data")
+    generate(8, data_dir=data_dir, missing_rate=0, verbose=False)
+    with open(os.path.join(data_dir, "invoices", "TXN-9999.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 dropped in by hand")  # named like a generated invoice, outside the new range
+
+    generate(5, data_dir=data_dir, missing_rate=0, verbose=False)
+    assert invoices(data_dir) == [f"TXN-{1000 + i}.pdf" for i in range(5)] + ["TXN-9999.pdf"]
+
+
+def test_a_row_that_loses_its_invoice_loses_the_generated_pdf(tmp_path):
+    data_dir = str(tmp_path / "data")
+    generate(6, data_dir=data_dir, missing_rate=0, verbose=False)
+    truth = generate(6, data_dir=data_dir, missing_rate=1, verbose=False)
+    assert truth["MissingInvoice"].all() and invoices(data_dir) == []
+
+
+def test_full_run_flags_exactly_the_planted_exceptions(corpus, make_agent):
+    main.main(agent=make_agent(oracle_responder))
+    report = pd.read_csv(main.REPORT_FILE)
+    assert list(report["TransactionID"]) == list(corpus["TransactionID"])
+    flagged = report["Status"].str.contains("FLAG")
+    assert (flagged == (corpus["Expected"] == "FLAG")).all()
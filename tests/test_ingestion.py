@@ -0,0 +1,33 @@
+import math
+import time
+
+import ingestion
+from ingestion import _process_invoice_worker
+
+
+class SlowBackend:
+    def extract(self, path, separator=""):
+        time.sleep(5)
+        return "Total Amount: $10.00"
+
+
+class BrokenBackend:
+    def extract(self, path, separator=""):
+        raise ValueError("not a PDF")
+
+
+def test_a_file_over_the_time_limit_is_reported_as_a_timeout(monkeypatch, capsys):
+    monkeypatch.setattr(ingestion, "_pdf_backend", SlowBackend())
+    started = time.perf_counter()
+    parsed = _process_invoice_worker(("data/invoices/TXN-1.pdf", 0.05))
+    assert time.perf_counter() - started < 2
+    assert parsed["linked_txn_id"] == "TXN-1" and math.isnan(parsed["extracted_amount"])
+    assert "Timed out reading PDF data/invoices/TXN-1.pdf" in capsys.readouterr().out
+
+
+def test_an_unreadable_file_is_not_a_timeout(monkeypatch, capsys):
+    monkeypatch.setattr(ingestion, "_pdf_backend", BrokenBackend())
+    parsed = _process_invoice_worker(("data/invoices/TXN-2.pdf", 5))
+    assert math.isnan(parsed["extracted_amount"])
+    out = capsys.readouterr().out
+    assert "Error reading PDF data/invoices/TXN-2.pdf: not a PDF" in out and "Timed out" not in out
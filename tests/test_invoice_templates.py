@@ -0,0 +1,86 @@
+import json
+
+from ingestion import IngestionAgent
+from invoice_templates import TemplateBackend, TemplateRegistry
+
+
+def template(**counts):
+    return dict({"fields": {"total": {"page": -1, "bbox": [0, 0, 100, 10]}}, "learned": 0.0, "hits": 0, "misses": 0},
+                **counts)
+
+
+def test_counters_from_several_processes_add_up(tmp_path):
+    path = str(tmp_path / "templates.json")
+    TemplateRegistry(path).put("acme", template())
+    first, second = TemplateRegistry(path), TemplateRegistry(path)  # two ingest workers
+    for _ in range(3):
+        first.count("acme", hit=False)
+    second.count("acme", hit=True)
+    second.count("acme", hit=False)
+    first.save()
+    second.save()
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)["acme"]
+    assert (saved["hits"], saved["misses"]) == (1, 4)
+    assert TemplateRegistry(path).get("acme")["misses"] == 4
+
+
+def test_a_relearned_template_keeps_the_counts_on_disk(tmp_path):
+    path = str(tmp_path / "templates.json")
+    TemplateRegistry(path).put("acme", template(hits=5, misses=2))
+    stale, other = TemplateRegistry(path), TemplateRegistry(path)
+    other.count("acme", hit=True)
+    other.put("globex", template())
+    other.save()
+    stale.count("acme", hit=False)
+    relearned = template()
+    relearned["fields"]["total"]["page"] = 0
+    stale.put("acme", relearned)
+    saved = TemplateRegistry(path)
+    assert saved.get("acme")["fields"]["total"]["page"] == 0
+    assert (saved.get("acme")["hits"], saved.get("acme")["misses"]) == (6, 3)
+    assert saved.get("globex") is not None
+
+
+def write_invoice(path, invoice_id, items=(), total=None):
+    """A one-page invoice, optionally with priced line items (adding up to the total unless one is given)."""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    lines = ["INVOICE - Acme Supplies", f"Invoice ID: {invoice_id}", "Date: 2026-03-01", "Description: Office supplies"]
+    lines += [f"{name} ........ ${amount:.2f}" for name, amount in items]
+    lines.append(f"Total Amount: ${total or sum(a for _, a in items) or 50:.2f}")
+    for line in lines:
+        pdf.cell(0, 10, txt=line, ln=1)
+    pdf.output(str(path))
+
+
+def read(backend, path):
+    return "\n".join(backend.iter_pages(str(path)))
+
+
+def test_a_learned_template_reads_only_the_field_boxes(tmp_path):
+    backend = TemplateBackend(TemplateRegistry(str(tmp_path / "templates.json")))
+    for n in (1, 2):
+        write_invoice(tmp_path / f"{n}.pdf", f"INV-{n}")
+    read(backend, tmp_path / "1.pdf")
+    fields = IngestionAgent().extract_fields(read(backend, tmp_path / "2.pdf"))
+    assert backend.stats == {"template": 1, "fallback": 1, "learned": 1}
+    assert (fields["invoice_id"], fields["total"]) == ("INV-2", 50.0)
+
+
+def test_invoices_with_priced_line_items_are_read_in_full(tmp_path):
+    backend = TemplateBackend(TemplateRegistry(str(tmp_path / "templates.json")))
+    write_invoice(tmp_path / "plain.pdf", "INV-1")
+    write_invoice(tmp_path / "items.pdf", "INV-2", [("Paper", 30.0), ("Toner", 25.0)])
+    write_invoice(tmp_path / "wrong.pdf", "INV-3", [("Paper", 30.0), ("Toner", 25.0)], total=65.0)
+
+    read(backend, tmp_path / "plain.pdf")  # learns a template without items
+    items = IngestionAgent().extract_fields(read(backend, tmp_path / "items.pdf"))
+    assert [i["amount"] for i in items["line_items"] if i["amount"] is not None] == [30.0, 25.0]
+    assert backend.registry.get("acme supplies")["priced_items"]
+
+    # Items that do not add up to the total still reach the check
+    assert IngestionAgent().extract_fields(read(backend, tmp_path / "wrong.pdf"))["confidence"] == 0.5
+    assert backend.stats["template"] == 0
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import main
+from fake_llm import oracle_responder
+from ingestion import IngestionAgent
+from match_engine import (MATCH_FAILURES, MATCHED, MISMATCHED, MISSING_INVOICE, ORPHAN_INVOICE, UNREADABLE,
+                          WITHIN_TOLERANCE, match_decision, mismatch_table, three_way_match)
+
+
+def ledger(*amounts):
+    return pd.DataFrame({"TransactionID": [f"TXN-{i}" for i in range(len(amounts))], "Amount": list(amounts)})
+
+
+def invoices(*amounts):
+    return [{"TransactionID": f"TXN-{i}", "invoice_id": f"INV-{i}", "extracted_amount": a}
+            for i, a in enumerate(amounts) if a is not None]
+
+
+def test_every_status_in_one_pass():
+    match = three_way_match(ledger(100.0, 100.0, 100.0, 100.0, 100.0),
+                            invoices(100.0, 100.01, 150.0, None, np.nan) + [
+                                {"TransactionID": "TXN-9", "invoice_id": "INV-9", "extracted_amount": 5.0}])
+    assert list(match["Match_Status"]) == [MATCHED, WITHIN_TOLERANCE, MISMATCHED, MISSING_INVOICE, UNREADABLE,
+                                           ORPHAN_INVOICE]
+    assert list(match["Variance_Cents"][:3]) == [0, 1, 5000]
+    assert list(mismatch_table(match)["TransactionID"]) == ["TXN-2", "TXN-3", "TXN-4", "TXN-9"]
+
+
+def test_money_is_compared_in_cents():
+    # 0.1 + 0.2 != 0.3 as floats, but it is the same amount of money
+    assert three_way_match(ledger(0.1 + 0.2), invoices(0.3))["Match_Status"][0] == MATCHED
+
+
+def test_an_invoice_without_a_readable_total_is_not_a_zero_dollar_invoice():
+    parsed = IngestionAgent().parse_invoice("INVOICE - Acme\nInvoice ID: INV-0\nAmount due: see attached", "TXN-0.pdf")
+    assert np.isnan(parsed["extracted_amount"])
+
+    match = three_way_match(ledger(4500.0), [dict(parsed, TransactionID="TXN-0")], include_orphans=False)
+    row = next(match.itertuples(index=False))
+    assert row.Match_Status == UNREADABLE and UNREADABLE not in MATCH_FAILURES  # decided by the LLM, not prescreen
+    assert pd.isna(row.Invoice_Amount) and pd.isna(row.Variance_Cents)
+    assert "$0.00" not in match_decision(row)
+
+
+def test_mismatch_decision_cites_both_amounts():
+    row = next(three_way_match(ledger(200.0), invoices(250.0)).itertuples(index=False))
+    assert match_decision(row) == ("VIOLATION: Section 3.1 - invoice INV-0 total $250.00 does not match the ledger "
+                                   "amount $200.00 (variance +$50.00).")
+
+
+def write_invoice_without_total(path: str):
+    """An invoice PDF whose total cannot be read."""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    for line in ("INVOICE - Acme Supplies", "Invoice ID: INV-9999", "Amount due: see attached"):
+        pdf.cell(0, 10, txt=line, ln=1)
+    pdf.output(path)
+
+
+def test_unreadable_total_goes_to_the_model(corpus, make_agent):
+    txn_id = corpus[corpus["Expected"] == "PASS"]["TransactionID"].iloc[0]
+    write_invoice_without_total(os.path.join("data", "invoices", f"{txn_id}.pdf"))
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return oracle_responder(prompt)
+
+    main.main(agent=make_agent(responder))
+    sent = [p for p in prompts if txn_id in p]
+    assert sent and "Amount due: see attached" in sent[0]  # the raw text, not a $0.00 total
+    report = pd.read_csv(main.REPORT_FILE).set_index("TransactionID")
+    assert "$0.00" not in report.loc[txn_id, "AI_Decision"]
@@ -0,0 +1,44 @@
+import pytest
+
+from model_cascade import DEFAULT_MODEL_TIERS, build_tiers, coerce_confidence, needs_escalation, parse_confidence
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("CONFIDENCE: 0.93", 0.93),
+    ("CONFIDENCE: 1", 1.0),
+    ("CONFIDENCE: 1.5", 1.0),  # overshoots the 0-1 scale, it is not 1.5%
+    ("CONFIDENCE: 85%", 0.85),
+    ("CONFIDENCE: 85", 0.85),
+    ("confidence = 92.5", 0.925),
+    ("CONFIDENCE: 5%", 0.05),
+    ("CONFIDENCE: 150%", None),
+    ("CONFIDENCE: 250", None),
+])
+def test_parse_confidence(line, expected):
+    answer, confidence = parse_confidence(f"COMPLIANT: within limits.\n{line}")
+    assert answer == "COMPLIANT: within limits."
+    assert confidence == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_the_last_confidence_line_wins_and_a_missing_one_is_none():
+    assert parse_confidence("VIOLATION\nCONFIDENCE: 0.2\nCONFIDENCE: 0.9") == ("VIOLATION\nCONFIDENCE: 0.2", 0.9)
+    assert parse_confidence("COMPLIANT") == ("COMPLIANT", None)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.93, 0.93), ("0.93", 0.93), ("93%", 0.93), (93, 0.93), (1.5, 1.0), ("150%", None), ("high", None), (None, None),
+])
+def test_coerce_confidence(value, expected):
+    result = coerce_confidence(value)
+    assert result == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_confident_answers_are_not_escalated():
+    assert not needs_escalation(*parse_confidence("COMPLIANT\nCONFIDENCE: 1.5"), min_confidence=0.8)
+    assert needs_escalation("COMPLIANT", 0.5, min_confidence=0.8)
+    assert needs_escalation("I am not sure", 0.99, min_confidence=0.8)
+    assert needs_escalation("COMPLIANT", None, min_confidence=0.8)
+
+
+def test_the_default_is_the_single_model_audits_always_used():
+    assert [tier.name for tier in build_tiers(names=DEFAULT_MODEL_TIERS.split(","))] == ["gemini-2.0-flash"]
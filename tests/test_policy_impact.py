@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+
+import main
+from audit_history import AuditHistory
+from conftest import POLICY_TEXT
+from fake_llm import oracle_responder
+from policy_impact import impact, policy_version, relied_sections, WHOLE_POLICY
+
+# A new Section 3.4 that no DoA rule compiles from
+ADDED = POLICY_TEXT + "3.4 Invoices for travel must list every traveller.\n"
+
+
+def test_a_verdict_made_without_retrieval_relies_on_the_whole_policy():
+    assert relied_sections("COMPLIANT: Section 1.2 allows it.", retrieved=["1.2", "3.1"]) == "1.2,3.1"
+    assert relied_sections("COMPLIANT: Section 1.2 allows it.", retrieved=[WHOLE_POLICY]) == WHOLE_POLICY
+
+
+def test_an_added_section_reaches_model_verdicts_made_without_retrieval(corpus, make_agent):
+    main.main(agent=make_agent(oracle_responder))
+    report = pd.read_csv(main.REPORT_FILE, dtype=str, keep_default_na=False)
+    by_model = report["Policy_Sections"] == WHOLE_POLICY
+    assert by_model.any() and not by_model.all()  # DoA violations keep the clause they broke
+
+    affected = impact(os.path.join("data", "general_ledger.csv"), policy_version(POLICY_TEXT, "old"),
+                      policy_version(ADDED, "new"), history=AuditHistory())
+    assert set(affected["TransactionID"]) == set(report.loc[by_model, "TransactionID"])
+    assert set(affected["Reason"]) == {"relied on the whole policy"}
@@ -0,0 +1,45 @@
+from conftest import POLICY_TEXT
+from main import build_audit_query, build_batch_record
+from policy_index import PolicyIndex, search_text
+
+POLICY = POLICY_TEXT + """
+2. Travel and Entertainment
+2.1 Economy class airfare is required for flights under 6 hours.
+2.2 Client entertainment above $500 USD requires a guest list.
+4. Software and Subscriptions
+4.1 Software licenses must be purchased through IT procurement.
+4.2 Annual subscriptions require a signed order form.
+"""
+
+
+def test_search_text_is_the_ledger_fields_only():
+    query = build_audit_query("TXN-1", "Vic VP", 12000.0, "Annual software licenses", "INVOICE ... Total Amount: $12,000.00")
+    assert search_text(query) == "Vic VP 12000.0 Annual software licenses"
+    assert search_text(build_batch_record("TXN-1", "Vic VP", 12000.0, "Annual software licenses", "...")) == \
+        search_text(query)
+    assert search_text("free text") == "free text"
+
+
+def test_the_approval_limit_chapter_is_always_retrieved(make_agent, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = make_agent(lambda prompt: "COMPLIANT")
+    agent.policy_text, agent.policy_hash, agent.top_k = POLICY, "retrieval-test", 2
+
+    for approver, amount, description in [("Vic VP", 12000.0, "Annual software licenses"),
+                                          ("Cat CFO", 50000.0, "Client dinner"), ("Ann Manager", 40.0, "Taxi")]:
+        single = build_audit_query("TXN-1", approver, amount, description, "Total Amount: $1.00", "Invoice Fields")
+        batch = build_batch_record("TXN-1", approver, amount, description, "Total Amount: $1.00")
+        sections = agent.retrieved_sections(single)
+        assert {"1.1", "1.2", "1.3", "1.4"} <= set(sections)  # 1.4 governs the VP and CFO rows
+        assert sections == agent.retrieved_sections(batch)  # batch mode searches the same text
+
+    # The boilerplate no longer pins the invoice clauses: the description picks the chapter
+    software = agent.retrieved_sections(build_audit_query("TXN-2", "Vic VP", 900.0, "Annual software subscription", ""))
+    assert "4.2" in software and "3.1" not in software
+    assert "4. Software and Subscriptions" in agent.policy_context(
+        build_audit_query("TXN-2", "Vic VP", 900.0, "Annual software subscription", ""))
+
+
+def test_chapter_sections():
+    index = PolicyIndex.build(POLICY, "h")
+    assert [index.sections[i]["section"] for i in index.chapter_sections(["2.2"])] == ["2.1", "2.2"]
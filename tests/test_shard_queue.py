@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+
+import main
+import shard_queue
+from conftest import CORPUS_ROWS
+from fake_llm import oracle_responder
+from shard_queue import WorkQueue, PENDING, LEASED, DONE, FAILED
+
+
+def queue_with_units(tmp_path, shards=2, max_attempts=3):
+    queue = WorkQueue(str(tmp_path / "shards"), max_attempts=max_attempts)
+    queue.reset({"run_id": "r1"}, [(shard, f"shard-{shard}.csv", 10) for shard in range(shards)])
+    return queue
+
+
+def test_a_claimed_unit_is_not_handed_out_twice(tmp_path):
+    queue = queue_with_units(tmp_path)
+    first, second = queue.claim("w1"), queue.claim("w2")
+    assert (first["shard"], second["shard"]) == (0, 1)
+    assert queue.claim("w3") is None
+    assert queue.counts() == {PENDING: 0, LEASED: 2, DONE: 0, FAILED: 0}
+
+
+def test_an_expired_lease_is_requeued_and_the_old_owner_loses_it(tmp_path):
+    queue = queue_with_units(tmp_path, shards=1)
+    queue.claim("w1", lease_seconds=-1)  # already expired
+    unit = queue.claim("w2")
+    assert (unit["shard"], unit["worker"], unit["attempts"]) == (0, "w2", 2)
+    assert not queue.heartbeat(0, "w1")
+    assert not queue.complete(0, "w1", "r.csv", "m.csv")
+    assert queue.heartbeat(0, "w2")
+    assert queue.complete(0, "w2", "r.csv", "m.csv")
+    assert queue.counts()[DONE] == 1
+
+
+def test_a_renewed_lease_is_not_requeued(tmp_path):
+    queue = queue_with_units(tmp_path, shards=1)
+    queue.claim("w1", lease_seconds=-1)
+    assert queue.heartbeat(0, "w1", lease_seconds=60)
+    assert queue.claim("w2") is None
+
+
+def test_a_unit_is_parked_as_failed_after_max_attempts(tmp_path):
+    queue = queue_with_units(tmp_path, shards=1, max_attempts=3)
+    for attempt in (1, 2):
+        assert queue.claim("w1")["attempts"] == attempt
+        assert queue.fail(0, "w1", "boom")
+        assert queue.counts()[PENDING] == 1
+    queue.claim("w1", lease_seconds=-1)  # the third claim expires instead of failing
+    assert queue.claim("w2") is None
+    unit = queue.units()[0]
+    assert (unit["status"], unit["attempts"], unit["error"]) == (FAILED, 3, "lease expired")
+
+    assert queue.retry_failed() == 1
+    assert queue.claim("w2")["attempts"] == 1
+
+
+def test_shard_queue_merge_matches_a_single_run(corpus, make_agent):
+    main.main(agent=make_agent(oracle_responder))
+    single = pd.read_csv(main.REPORT_FILE)
+
+    shard_dir, report_file = os.path.join("data", "shards"), os.path.join("data", "sharded_report.csv")
+    shard_queue.plan(shards=4, shard_dir=shard_dir, chunk_size=9)
+    shard_queue.run_worker(agent=make_agent(oracle_responder), worker_id="w1", shard_dir=shard_dir, wait=False)
+    counts = shard_queue.merge(shard_dir, report_file)
+
+    merged = pd.read_csv(report_file)
+    assert counts["rows"] == CORPUS_ROWS
+    assert list(merged["TransactionID"]) == list(single["TransactionID"])  # ledger order, not shard order
+    assert list(merged["Status"]) == list(single["Status"])
+
+
+def test_workers_split_the_rate_limits(corpus, make_agent, monkeypatch):
+    runs = []
+
+    def recording_run(*args, **kwargs):
+        runs.append(main.AuditRun(*args, **kwargs))
+        return runs[-1]
+
+    monkeypatch.setattr(shard_queue, "AuditRun", recording_run)
+    shard_dir = os.path.join("data", "shards")
+    shard_queue.plan(shards=2, shard_dir=shard_dir, workers=4)
+    shard_queue.run_worker(agent=make_agent(oracle_responder), worker_id="w1", shard_dir=shard_dir, wait=False)
+
+    assert runs
+    for run in runs:
+        assert run.executor.requests_per_minute == main.REQUESTS_PER_MINUTE / 4
+        assert run.executor.tokens_per_minute == main.TOKENS_PER_MINUTE / 4
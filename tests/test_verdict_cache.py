@@ -0,0 +1,76 @@
+import pytest
+
+import verdict_cache
+from verdict_cache import VerdictCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(verdict_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = VerdictCache(str(tmp_path / "v.sqlite"), ttl_seconds=60)
+    cache.put("k", "COMPLIANT")
+    clock[0] += 59
+    assert cache.get("k") == "COMPLIANT"  # a hit does not extend the lifetime
+    clock[0] += 2
+    assert cache.get("k") is None
+    cache.evict()
+    assert cache.evictions == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 1, "hit_rate": 0.5}
+
+
+def test_the_least_recently_used_entries_go_first(tmp_path, clock):
+    cache = VerdictCache(str(tmp_path / "v.sqlite"), max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+        clock[0] += 1
+    assert cache.get("a") == "A"  # 'b' is now the least recently used
+    cache.evict()
+    assert [cache.get(k) for k in ("a", "b", "c")] == ["A", None, "C"]
+
+
+def test_the_size_bound_is_applied_while_writing(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(verdict_cache, "EVICT_EVERY", 3)
+    cache = VerdictCache(str(tmp_path / "v.sqlite"), max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+        clock[0] += 1
+    assert cache.evictions == 1 and cache.get("a") is None
+
+
+def test_entries_are_shared_between_instances_and_a_disabled_cache_is_inert(tmp_path):
+    path = str(tmp_path / "v.sqlite")
+    VerdictCache(path).put("k", "VIOLATION")
+    assert VerdictCache(path).get("k") == "VIOLATION"
+    off = VerdictCache(path, enabled=False)
+    off.put("other", "x")
+    assert off.get("k") is None and VerdictCache(path).get("other") is None
+
+
+def test_every_part_of_the_key_matters():
+    parts = ("policy", "template", "model", "query")
+    key = VerdictCache.make_key(*parts)
+    for i in range(len(parts)):
+        changed = list(parts)
+        changed[i] += "!"
+        assert VerdictCache.make_key(*changed) != key
+    # Parts cannot run into each other
+    assert VerdictCache.make_key("ab", "c", "m", "q") != VerdictCache.make_key("a", "bc", "m", "q")
+
+
+def test_agent_answers_a_repeated_query_from_the_cache(tmp_path, make_agent):
+    agent = make_agent(lambda prompt: "COMPLIANT: ok")
+    agent.cache = VerdictCache(str(tmp_path / "v.sqlite"))
+    assert agent.check_policy("Audit: ID TXN-1") == agent.check_policy("Audit: ID TXN-1") == "COMPLIANT: ok"
+    assert agent.llm.calls == 1
+
+    # The same query under another policy or with retrieval on is a different question
+    key = agent._cache_key("Audit: ID TXN-1")
+    agent.top_k = 2
+    assert agent._cache_key("Audit: ID TXN-1") != key
+    agent.top_k, agent.policy_text = 0, agent.policy_text + "\n4.1 New clause."
+    assert agent._cache_key("Audit: ID TXN-1") != key
@@ -0,0 +1,68 @@
+import pandas as pd
+
+from conftest import LedgerRow
+from doa_rules import prescreen
+from match_engine import three_way_match
+from verdict_reuse import VerdictClasses, description_category
+
+
+def invoice_fields(invoice_id, vendor, date, description, total):
+    return {"invoice_id": invoice_id, "vendor": vendor, "date": date, "total": total, "confidence": 1.0,
+            "line_items": [{"description": description, "amount": None}]}
+
+
+def keyed(classes, rules, row, fields):
+    """The row's class key, from the same pre-screen and match rows the audit computes."""
+    ledger = pd.DataFrame([row._asdict()])
+    screen = next(prescreen(ledger, rules).itertuples(index=False))
+    invoices = [{"TransactionID": row.TransactionID, "invoice_id": fields["invoice_id"], "extracted_amount": fields["total"]}]
+    match = next(three_way_match(ledger, invoices, include_orphans=False).itertuples(index=False))
+    return classes.key(row, screen, match, fields, 0.75)
+
+
+def test_description_category_ignores_numbers_and_punctuation():
+    assert description_category("Server Maintenance - March 2026") == description_category("server maintenance, march 2025")
+
+
+def test_fan_out_swaps_every_row_specific_field(doa_rules):
+    classes = VerdictClasses(doa_rules)
+    rep = LedgerRow("TXN-1", "2026-02-27", "TechCorp Solutions", 4500.0, "USD", "Bob Director", "Server Maintenance")
+    rep_fields = invoice_fields("INV-9", "TechCorp Solutions, Inc.", "2026-03-01", "Server Maintenance", 4500.0)
+    member = LedgerRow("TXN-2", "2026-04-10", "Globex", 4800.0, "USD", "Dana Director", "Server maintenance")
+    member_fields = invoice_fields("INV-31", "Globex Corp", "2026-04-12", "Server maintenance", 4800.0)
+
+    key = keyed(classes, doa_rules, rep, rep_fields)
+    assert key is not None and key == keyed(classes, doa_rules, member, member_fields)
+
+    classes.store(key, rep, rep_fields, "COMPLIANT: TXN-1 approved by Bob Director: $4,500.00 to TechCorp Solutions "
+                  "(invoice: TechCorp Solutions, Inc.) for Server Maintenance on 2026-02-27, per INV-9 dated 2026-03-01.",
+                  "COMPLIANT", ["1.2"])
+    answer = classes.fan_out(key, member, member_fields)
+
+    assert answer == ("COMPLIANT: TXN-2 approved by Dana Director: $4,800.00 to Globex (invoice: Globex Corp) "
+                      "for Server maintenance on 2026-04-10, per INV-31 dated 2026-04-12.")
+    for value in ("TXN-1", "Bob", "4,500", "TechCorp", "INV-9", "2026-02-27", "2026-03-01"):
+        assert value not in answer
+
+
+def test_rows_that_differ_in_a_keyed_dimension_are_not_one_class(doa_rules):
+    classes = VerdictClasses(doa_rules)
+    row = LedgerRow("TXN-1", "2026-02-27", "TechCorp", 4500.0, "USD", "Bob Director", "Server Maintenance")
+    fields = invoice_fields("INV-9", "TechCorp", "2026-03-01", "Server Maintenance", 4500.0)
+    late = invoice_fields("INV-9", "TechCorp", "2026-06-01", "Server Maintenance", 4500.0)
+    manager = row._replace(Approver="Carol Manager", Amount=900.0)
+    manager_fields = dict(fields, total=900.0)
+    assert keyed(classes, doa_rules, row, fields) != keyed(classes, doa_rules, row, late)
+    assert keyed(classes, doa_rules, row, fields) != keyed(classes, doa_rules, manager, manager_fields)
+
+
+def test_rows_without_vendor_or_date_columns_are_not_keyed(doa_rules):
+    classes = VerdictClasses(doa_rules)
+    row = LedgerRow("TXN-1", "2026-02-27", "TechCorp", 4500.0, "USD", "Bob Director", "Server Maintenance")
+    fields = invoice_fields("INV-9", "TechCorp", "2026-03-01", "Server Maintenance", 4500.0)
+    ledger = pd.DataFrame([row._asdict()]).drop(columns=["Vendor", "Date"])
+    bare = next(ledger.itertuples(index=False))
+    screen = next(prescreen(ledger, doa_rules).itertuples(index=False))
+    invoices = [{"TransactionID": "TXN-1", "invoice_id": "INV-9", "extracted_amount": 4500.0}]
+    match = next(three_way_match(ledger, invoices, include_orphans=False).itertuples(index=False))
+    assert classes.key(bare, screen, match, fields, 0.75) is None
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+
+import watch_mode
+from fake_llm import oracle_responder
+from watch_mode import LedgerTail, WatchState, Watcher
+
+HEADER = "TransactionID,Date,Vendor,Amount,Currency,Approver,Description"
+
+
+def row(n):
+    return f"TXN-{n},2026-03-01,Globex,{100 + n}.00,USD,Ann Manager,Paper"
+
+
+def test_only_complete_lines_are_read_and_a_restart_resumes_at_the_offset(tmp_path):
+    path = tmp_path / "ledger.csv"
+    path.write_bytes(f"{HEADER}\n{row(1)}\n{row(2)}".encode())  # the last row is still being written
+    tail = LedgerTail(str(path))
+    assert [txn for txn, _, _ in tail.lines()] == ["TXN-1"]
+    assert tail.offset == len(f"{HEADER}\n{row(1)}\n")
+
+    with open(path, "ab") as f:
+        f.write(f"\n{row(3)}\n".encode())
+    restarted = LedgerTail(str(path), tail.offset, tail.header, tail.identity)
+    assert [(txn, line) for txn, line, _ in restarted.lines()] == [("TXN-2", row(2)), ("TXN-3", row(3))]
+    assert restarted.offset == os.path.getsize(path)
+    assert list(restarted.lines()) == []
+
+
+def test_a_replaced_or_truncated_ledger_is_read_from_the_top(tmp_path):
+    path = tmp_path / "ledger.csv"
+    path.write_text(f"{HEADER}\n{row(1)}\n{row(2)}\n")
+    tail = LedgerTail(str(path))
+    assert len(list(tail.lines())) == 2
+
+    path.write_text(f"{HEADER}\n{row(5)}\n")  # shorter than the offset
+    assert [txn for txn, _, _ in tail.lines()] == ["TXN-5"]
+
+    replacement = tmp_path / "new.csv"
+    replacement.write_text(f"{HEADER}\n{row(5)}\n{row(6)}\n{row(7)}\n")
+    os.replace(replacement, path)  # a new file, longer than the offset
+    assert [txn for txn, _, _ in tail.lines()] == ["TXN-5", "TXN-6", "TXN-7"]
+
+
+def test_watch_state_keeps_the_offset_and_audited_lines(tmp_path):
+    state = WatchState(str(tmp_path / "state.sqlite"))
+    state.commit({"offset": 120, "header": HEADER}, {"TXN-1": (row(1), 80), "TXN-2": (row(2), 120)})
+    state.close()
+    state = WatchState(str(tmp_path / "state.sqlite"))
+    assert (state.get("offset"), state.get("header")) == ("120", HEADER)
+    assert state.lines(["TXN-2", "TXN-9"]) == {"TXN-2": (row(2), 120)}
+    state.close()
+
+
+def test_a_restarted_watcher_audits_only_the_new_rows(corpus, make_agent):
+    state_path = os.path.join("data", "watch_state.sqlite")
+    ledger = os.path.join("data", "general_ledger.csv")
+    lines = open(ledger, encoding="utf-8").read().splitlines(keepends=True)
+    open(ledger, "w", encoding="utf-8").writelines(lines[:11])  # header + 10 rows
+
+    Watcher(agent=make_agent(oracle_responder), state_path=state_path).run(once=True)
+
+    with open(ledger, "a", encoding="utf-8") as f:
+        f.writelines(lines[11:])
+    watcher = Watcher(agent=make_agent(oracle_responder), state_path=state_path)
+    watcher.run(once=True)
+    assert watcher.audited == len(lines) - 11
+
+    report = pd.read_csv(watch_mode.WATCH_REPORT_FILE)
+    assert list(report["TransactionID"]) == list(corpus["TransactionID"])  # each row audited once
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.path.join("data", ".cache")
+CACHE_PATH = os.path.join(CACHE_DIR, "verdicts.sqlite")
+MAX_ENTRIES = int(os.environ.get("AUDIT_CACHE_MAX_ENTRIES", 200_000))
+TTL_SECONDS = float(os.environ.get("AUDIT_CACHE_TTL_SECONDS", 90 * 24 * 3600))
+# Set AUDIT_CACHE_BYPASS=1 to always call the LLM (and not store anything)
+BYPASS = os.environ.get("AUDIT_CACHE_BYPASS", "0") == "1"
+EVICT_EVERY = 500  # check the size bound every N writes
+
+
+class VerdictCache:
+    """
+    On-disk cache of LLM verdicts, shared safely between processes (SQLite in WAL mode).
+    Keys are content hashes, so any change to the policy, prompt, model or query is a miss.
+    Entries expire after `ttl_seconds`; beyond `max_entries` the least recently used go first.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: float = TTL_SECONDS, enabled: bool = not BYPASS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(policy_text: str, prompt_template: str, model_name: str, query: str) -> str:
+        h = hashlib.sha256()
+        for part in (policy_text, prompt_template, model_name, query):
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")  # field separator so parts can't run into each other
+        return h.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                " key TEXT PRIMARY KEY, verdict TEXT NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_access ON verdicts(last_access)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT verdict, created FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE verdicts SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, verdict: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, verdict, now, now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute("DELETE FROM verdicts WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            conn.execute(
+                "DELETE FROM verdicts WHERE key IN "
+                "(SELECT key FROM verdicts ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            )
+        self.evictions += expired + overflow
+
+    def evict(self):
+        """Applies the TTL and size bound now (normally done every EVICT_EVERY writes)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM verdicts")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
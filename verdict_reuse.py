@@ -0,0 +1,138 @@
+import os
+import re
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+
+from doa_rules import DoARules, DOA_COMPLIANT
+from duplicate_detector import normalize_vendor
+from report_writer import ReportWriter
+
+# --- CONFIGURATION ---
+CLASS_REPORT_FILE = os.path.join("data", "verdict_classes.csv")
+# An invoice dated further than this from its ledger row is a question of its own (Section 3.3)
+DATE_GAP_DAYS = 30
+CLASS_COLUMNS = ["Class_Key", "Representative", "Members", "LLM_Calls", "Reused", "Status", "AI_Decision"]
+
+_NON_ALNUM = re.compile(r"[^a-z0-9#]+")
+
+
+def description_category(text) -> str:
+    """'Server Maintenance - March 2026' and 'server maintenance, march 2025' are one category."""
+    return " ".join(_NON_ALNUM.sub(" ", re.sub(r"\d+", "#", str(text).lower())).split())
+
+
+def parse_day(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def first_item(fields: dict) -> Optional[str]:
+    return fields["line_items"][0]["description"] if fields.get("line_items") else None
+
+
+def amount_swaps(old, new) -> Dict[str, str]:
+    """old -> new for each way an answer may spell an amount ('4,500.00', '4500.00', '4500.0')."""
+    swaps = {str(old): str(new), f"{float(old):.2f}": f"{float(new):.2f}"}
+    swaps[f"{float(old):,.2f}"] = f"{float(new):,.2f}"  # formatted spellings win when they coincide with the raw one
+    return swaps
+
+
+class VerdictClasses:
+    """
+    Rows that put the same question to the model share one answer. A row's
+    class key is its canonical DoA role, the band of the amount between the
+    policy's approval limits, the three-way match status, the description
+    category, and whether the invoice agrees with the ledger on vendor,
+    description and date. Only rows with a clear answer to all of those are
+    keyed: unknown roles, borderline amounts and unconfident invoice
+    extraction always get their own call.
+    """
+
+    def __init__(self, rules: DoARules):
+        self.thresholds = np.unique([v for v in rules.limits.values() if np.isfinite(v)]) if rules else np.array([])
+        self.classes: Dict[str, dict] = {}
+        self.keyed = 0  # rows that had a class key (each one either asked or re-used)
+
+    def key(self, row, screen_row, match_row, fields: Optional[dict], min_confidence: float) -> Optional[str]:
+        if screen_row is None or screen_row.DoA_Status != DOA_COMPLIANT or not screen_row.DoA_Role:
+            return None
+        if fields is None or fields["confidence"] < min_confidence:
+            return None
+        if not hasattr(row, "Vendor") or not hasattr(row, "Date"):  # nothing to compare the invoice with
+            return None
+        amount = float(row.Amount)
+        band = int(np.searchsorted(self.thresholds, amount))
+        category = description_category(row.Description)
+        described = any(description_category(item["description"]) == category for item in fields["line_items"])
+        same_vendor = normalize_vendor(fields["vendor"] or "") == normalize_vendor(row.Vendor)
+        ledger_day, invoice_day = parse_day(row.Date), parse_day(fields["date"])
+        if ledger_day is None or invoice_day is None:
+            return None
+        on_time = abs((invoice_day - ledger_day).days) <= DATE_GAP_DAYS
+        self.keyed += 1
+        return (f"{screen_row.DoA_Role}|band{band}|{match_row.Match_Status}|{category}"
+                f"|desc={'same' if described else 'diff'}|vendor={'same' if same_vendor else 'diff'}"
+                f"|date={'ok' if on_time else 'gap'}")
+
+    def store(self, key: str, row, fields: Optional[dict], response: str, verdict_status, retrieved, failed: bool = False):
+        """The representative's answer. A failed call is counted but not kept, so the class asks again later."""
+        found = self.classes.setdefault(key, {"row": None, "response": None, "members": 0, "calls": 0})
+        found["calls"] += 1
+        if not failed:
+            found.update(row=row, fields=fields or {}, response=response, verdict_status=verdict_status,
+                         retrieved=retrieved)
+            found["members"] += 1
+
+    def answer(self, key: str) -> Optional[dict]:
+        """The class's stored answer (response, verdict_status, retrieved), or None if it has none yet."""
+        found = self.classes.get(key)
+        return found if found is not None and found["response"] is not None else None
+
+    def fan_out(self, key: str, row, fields: Optional[dict]) -> str:
+        """
+        The class answer with every row-specific value of the representative
+        (ID, approver, amount, vendor, description, dates and invoice ID, as
+        spelled in the ledger and on the invoice) swapped for this row's.
+        """
+        found = self.classes[key]
+        found["members"] += 1
+        rep, rep_fields, fields = found["row"], found["fields"], fields or {}
+        # Invoice spellings first: where the ledger spells a value the same way, the ledger's replacement wins
+        pairs = [(rep_fields.get(name), fields.get(name)) for name in ("invoice_id", "vendor", "date")]
+        pairs.append((first_item(rep_fields), first_item(fields)))
+        pairs += [(getattr(rep, name), getattr(row, name))
+                  for name in ("Vendor", "Description", "Date", "Approver", "TransactionID")]
+        swaps = {str(old): str(new) for old, new in pairs if old is not None and new is not None}
+        if float(rep.Amount) != float(row.Amount):
+            swaps.update(amount_swaps(rep.Amount, row.Amount))
+        swaps = {old: new for old, new in swaps.items() if old and old != new}
+        if not swaps:
+            return found["response"]
+        # One pass, longest spelling first, so a swapped value is never swapped again
+        pattern = re.compile(r"(?<![\w.,])(" + "|".join(re.escape(old) for old in sorted(swaps, key=len, reverse=True))
+                             + r")(?!\w|[.,]\d)")
+        return pattern.sub(lambda m: swaps[m.group(1)], found["response"])
+
+    def summary(self) -> dict:
+        calls = sum(c["calls"] for c in self.classes.values())
+        reused = sum(max(0, c["members"] - 1) for c in self.classes.values())
+        return {"classes": len(self.classes), "keyed_rows": self.keyed, "llm_calls": calls, "reused": reused,
+                "hit_rate": round(reused / self.keyed, 3) if self.keyed else 0.0}
+
+    def write_report(self, path: str = CLASS_REPORT_FILE):
+        """One row per class, largest first."""
+        ordered = sorted(self.classes.items(), key=lambda kv: -kv[1]["members"])
+        with ReportWriter(path, columns=CLASS_COLUMNS) as writer:
+            writer.write_rows([{
+                "Class_Key": key,
+                "Representative": c["row"].TransactionID if c["row"] is not None else "",
+                "Members": c["members"],
+                "LLM_Calls": c["calls"],
+                "Reused": max(0, c["members"] - 1),
+                "Status": c.get("verdict_status") or "",
+                "AI_Decision": (c["response"] or "").strip().replace("\n", " "),
+            } for key, c in ordered])
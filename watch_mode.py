@@ -0,0 +1,356 @@
+import argparse
+import csv
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from audit_history import AuditHistory
+from audit_journal import AuditJournal
+from doa_rules import compile_doa_rules
+from main import AuditRun, open_invoice_store, DOA_PRESCREEN, HISTORY_ENABLED, LEDGER_FILE
+from metrics import METRICS
+from policy_engine import PolicyAgent
+from policy_impact import record_policy_version
+from report_writer import REPORT_COLUMNS
+from verdict_cache import CACHE_DIR
+
+# --- CONFIGURATION ---
+WATCH_STATE_PATH = os.path.join(CACHE_DIR, "watch_state.sqlite")
+WATCH_REPORT_FILE = os.path.join("data", "watch_report.csv")
+# How often the ledger and the invoice folder are checked (a fallback only when watchdog is installed)
+POLL_SECONDS = float(os.environ.get("AUDIT_WATCH_POLL_SECONDS", 2.0))
+# Items waiting for the auditor; the watcher blocks when it is full, so a burst cannot exhaust memory
+QUEUE_SIZE = int(os.environ.get("AUDIT_WATCH_QUEUE_SIZE", 1000))
+# The auditor takes up to BATCH_ROWS items, waiting at most BATCH_WAIT_SECONDS for more to arrive
+BATCH_ROWS = int(os.environ.get("AUDIT_WATCH_BATCH_ROWS", 200))
+BATCH_WAIT_SECONDS = float(os.environ.get("AUDIT_WATCH_BATCH_WAIT", 0.25))
+
+LEDGER_ITEM, INVOICE_ITEM = "ledger", "invoice"
+
+
+class WatchState:
+    """
+    What a restarted watcher needs, in SQLite: the ledger byte offset up to
+    which every row has been audited (with the header and file identity, to
+    notice a replaced ledger), and the raw line and end offset of each audited
+    row, so that a later or corrected invoice can re-audit its row without
+    re-reading the ledger.
+    """
+
+    def __init__(self, path: str = WATCH_STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows"
+                           " (txn_id TEXT PRIMARY KEY, line TEXT NOT NULL, offset INTEGER NOT NULL) WITHOUT ROWID")
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def commit(self, meta: Dict[str, str], rows: Dict[str, Tuple[str, int]] = None):
+        """Stores audited rows (TransactionID -> (line, offset)) and the new offset in one transaction."""
+        self._conn.execute("BEGIN")
+        self._conn.executemany("INSERT OR REPLACE INTO rows (txn_id, line, offset) VALUES (?, ?, ?)",
+                               [(txn_id, line, offset) for txn_id, (line, offset) in (rows or {}).items()])
+        self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [(k, str(v)) for k, v in meta.items()])
+        self._conn.execute("COMMIT")
+
+    def lines(self, txn_ids: List[str]) -> Dict[str, Tuple[str, int]]:
+        found = {}
+        for start in range(0, len(txn_ids), 500):
+            part = txn_ids[start:start + 500]
+            found.update((txn_id, (line, offset)) for txn_id, line, offset in self._conn.execute(
+                f"SELECT txn_id, line, offset FROM rows WHERE txn_id IN ({', '.join('?' * len(part))})", part))
+        return found
+
+    def reset(self):
+        self._conn.execute("DELETE FROM meta")
+        self._conn.execute("DELETE FROM rows")
+
+    def close(self):
+        self._conn.close()
+
+
+class LedgerTail:
+    """
+    Follows rows appended to the ledger CSV by byte offset. Only complete lines
+    are returned (a row still being written is picked up on the next poll); a
+    ledger that shrinks or is replaced by a new file is read again from the top.
+    """
+
+    def __init__(self, path: str, offset: int = 0, header: Optional[str] = None, identity: str = ""):
+        self.path = path
+        self.offset = offset
+        self.header = header
+        self.identity = identity
+        self._id_col = None
+
+    def _file_identity(self, st) -> str:
+        return f"{st.st_dev}:{st.st_ino}"
+
+    def lines(self) -> Iterator[Tuple[str, str, int]]:
+        """(TransactionID, raw line, offset after the line) for every new complete row."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = self._file_identity(st)
+        if (self.identity and identity != self.identity) or st.st_size < self.offset:
+            print(f"[!] {self.path} was replaced or truncated, reading it from the top")
+            self.offset, self.header = 0, None
+        self.identity = identity
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while True:
+                raw = f.readline()
+                if not raw.endswith(b"\n"):
+                    return  # end of file, or a partial row
+                self.offset += len(raw)
+                line = raw.decode("utf-8").rstrip("\r\n")
+                if self.header is None:
+                    self.header = line
+                    continue
+                if line.strip():
+                    yield self.transaction_id(line), line, self.offset
+
+    def transaction_id(self, line: str) -> str:
+        if self._id_col is None:
+            self._id_col = [c.strip() for c in next(csv.reader([self.header]))].index("TransactionID")
+        return next(csv.reader([line]))[self._id_col].strip()
+
+    def frame(self, lines: List[str]) -> pd.DataFrame:
+        """Ledger rows parsed exactly like a chunk of the full file."""
+        df = pd.read_csv(io.StringIO("\n".join([self.header] + lines)))
+        df.columns = [c.strip() for c in df.columns]
+        return df
+
+
+class Watcher:
+    """
+    Two stages joined by a bounded queue. The watcher thread tails the ledger
+    and refreshes the invoice store (only new or changed PDFs are extracted),
+    queueing every new row and every changed invoice. The auditor (the calling
+    thread) takes small batches off the queue and runs them through the normal
+    AuditRun: DoA pre-screen, three-way match and the policy check.
+    """
+
+    def __init__(self, agent=None, ledger_path: str = LEDGER_FILE, state_path: str = WATCH_STATE_PATH,
+                 report_path: str = WATCH_REPORT_FILE, poll_seconds: float = POLL_SECONDS,
+                 queue_size: int = QUEUE_SIZE, batch_rows: int = BATCH_ROWS, batch_wait: float = BATCH_WAIT_SECONDS):
+        self.agent = agent or PolicyAgent()
+        self.ledger_path = ledger_path
+        self.report_path = report_path
+        self.poll_seconds = poll_seconds
+        self.batch_rows = batch_rows
+        self.batch_wait = batch_wait
+        self.state = WatchState(state_path)
+        self.tail = LedgerTail(ledger_path, int(self.state.get("offset", 0)), self.state.get("header"),
+                               self.state.get("identity", ""))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.wake = threading.Event()  # set by file system events to poll early
+        self.invoices = open_invoice_store()
+        self.audited = 0
+        self.latencies: List[float] = []
+
+    # --- Watcher stage ---
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def poll(self):
+        """One pass over the ledger and the invoice folder."""
+        for txn_id, line, offset in self.tail.lines():
+            if not self._put((LEDGER_ITEM, txn_id, line, offset, time.monotonic())):
+                return
+        with METRICS.timer("invoice_refresh"):
+            self.invoices.refresh()
+        for txn_id in sorted(self.invoices.changed):
+            if not self._put((INVOICE_ITEM, txn_id, None, None, time.monotonic())):
+                return
+
+    def watch(self, once: bool = False):
+        try:
+            while not self.stop.is_set():
+                self.poll()
+                if once:
+                    break
+                self.wake.wait(self.poll_seconds)
+                self.wake.clear()
+        finally:
+            self._put(None)  # tells the auditor there is nothing more
+
+    def start_observer(self):
+        """inotify (or the platform equivalent) through watchdog, if installed; polling otherwise."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+        wake = self.wake
+
+        class Wake(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        for folder in {os.path.dirname(os.path.abspath(self.ledger_path)), os.path.abspath(self.invoices.invoice_dir)}:
+            if os.path.isdir(folder):
+                observer.schedule(Wake(), folder, recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    # --- Auditor stage ---
+
+    def next_batch(self) -> Optional[list]:
+        """Up to batch_rows items (blocks for the first one). None once the watcher has stopped."""
+        while True:
+            try:
+                item = self.queue.get(timeout=0.5)
+                break
+            except queue.Empty:
+                if self.stop.is_set():
+                    return None
+        if item is None:
+            return None
+        items = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(items) < self.batch_rows:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)  # end the next call, after this batch
+                break
+            items.append(item)
+        return items
+
+    def audit_batch(self, run: AuditRun, items: list, history: Optional[AuditHistory]):
+        lines: Dict[str, Tuple[str, int]] = {}
+        offset = None
+        for kind, txn_id, line, item_offset, _ in items:
+            if kind == LEDGER_ITEM:
+                lines[txn_id] = (line, item_offset)
+                offset = item_offset
+        # A new or corrected invoice re-audits its row (if the ledger has it yet)
+        changed = [txn_id for kind, txn_id, *_ in items if kind == INVOICE_ITEM and txn_id not in lines]
+        if any(kind == INVOICE_ITEM for kind, *_ in items):
+            run.invoice_table = self.invoices.to_frame()
+        rows = {**lines, **self.state.lines(changed)} if changed else lines
+
+        if rows:
+            df = self.tail.frame([line for line, _ in rows.values()])
+            results = run.audit_chunk(df)
+            self.write_report(results)
+            if history is not None:
+                # The line's offset places it in the ledger; a re-audited row replaces its verdict
+                history.record(run.run_id, df, results, positions=[pos for _, pos in rows.values()])
+            self.audited += len(results)
+
+        meta = {"header": self.tail.header, "identity": self.tail.identity}
+        if offset is not None:
+            meta["offset"] = offset
+        self.state.commit(meta, lines)
+        now = time.monotonic()
+        for *_, queued in items:
+            self.latencies.append(now - queued)
+            METRICS.observe("watch_latency", now - queued)
+
+    def write_report(self, results: List[dict]):
+        """Appends verdicts as they are decided (the batch report is rewritten per run instead)."""
+        new = not os.path.exists(self.report_path)
+        os.makedirs(os.path.dirname(self.report_path) or ".", exist_ok=True)
+        with open(self.report_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, lineterminator="\n", extrasaction="ignore")
+            if new:
+                writer.writeheader()
+            writer.writerows(results)
+
+    def run(self, once: bool = False, from_end: bool = False):
+        if not self.agent.policy_text:
+            print(f"[*] {self.agent.ingest_policy()}")
+        doa_rules = compile_doa_rules(self.agent.policy_text) if DOA_PRESCREEN else None
+        record_policy_version(self.agent.policy_text, self.agent.policy_hash)
+        print(f"[*] Invoice store: {self.invoices.refresh()}")
+        self.invoices.changed = set()  # invoices present at start-up come with their ledger rows
+        if from_end and self.tail.header is None and os.path.exists(self.ledger_path):
+            for _ in self.tail.lines():
+                pass
+            self.state.commit({"offset": self.tail.offset, "header": self.tail.header, "identity": self.tail.identity})
+            print(f"[*] Skipping the {self.tail.offset:,} bytes already in {self.ledger_path}")
+
+        # Re-use every journaled verdict whose inputs are unchanged, as an incremental run does
+        journal = AuditJournal()
+        run_id, _ = journal.start_run(incremental=True, policy_hash=self.agent.policy_hash)
+        run = AuditRun(self.agent, journal, run_id, journal.verdicts(policy_hash=self.agent.policy_hash),
+                       self.invoices, doa_rules)
+        history = AuditHistory() if HISTORY_ENABLED else None
+        if history is not None:
+            history.start_run(run_id, source="watch", ledger_path=self.ledger_path)
+
+        observer = None if once else self.start_observer()
+        print(f"[*] Watch run {run_id}: {self.ledger_path} from byte {self.tail.offset:,} and "
+              f"{self.invoices.invoice_dir} ({'file system events' if observer else f'polling every {self.poll_seconds}s'})")
+        watcher = threading.Thread(target=self.watch, args=(once,), name="watcher", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                items = self.next_batch()
+                if items is None:
+                    break
+                self.audit_batch(run, items, history)
+        except KeyboardInterrupt:
+            print("\n[*] Stopping (state saved; a restart continues from here)")
+        finally:
+            self.stop.set()
+            if observer is not None:
+                observer.stop()
+            journal.finish_run(run_id)
+            journal.close()
+            if history is not None:
+                history.finish_run(run_id)
+                history.close()
+            self.state.close()
+
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            print(f"[*] Audited {self.audited:,} rows | detection to verdict p50 "
+                  f"{latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+        print(f"[SUCCESS] Watch verdicts appended to: {self.report_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit ledger appends and new invoices as they arrive.")
+    parser.add_argument("--once", action="store_true", help="audit what is new since the last run, then exit")
+    parser.add_argument("--from-end", action="store_true", help="on the first start, skip the rows already in the ledger")
+    parser.add_argument("--reset", action="store_true", help="forget the saved offset and read the ledger from the top")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between checks")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        state = WatchState()
+        state.reset()
+        state.close()
+    Watcher(poll_seconds=args.poll).run(once=args.once, from_end=args.from_end)
+
+
+if __name__ == "__main__":
+    main()